@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from bland import fetch_call_analysis
+from rate_limit import BATCH, priority
+
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '4'))
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv('ANALYSIS_MAX_ATTEMPTS', '3'))
+# Failed analyses are retried after this many seconds, doubling each attempt
+ANALYSIS_RETRY_DELAY = float(os.getenv('ANALYSIS_RETRY_DELAY', '10'))
+# A claimed job is held this long and renewed while it runs; a dead process's jobs are taken over once it lapses
+ANALYSIS_LEASE_SECONDS = float(os.getenv('ANALYSIS_LEASE_SECONDS', '120'))
+
+
+class AnalysisQueue:
+    """Durable queue of finished calls waiting for their analysis.
+
+    Call IDs are written to the lead store before anything else happens, so
+    a call that ends while no browser tab is open, or while the server
+    restarts, is still analysed. A bounded pool of workers fetches analyses
+    concurrently and persists every answer and the raw payload by call ID.
+    Calls whose analysis is already stored are never sent to the API again.
+    Every process sharing the store runs its own queue; a claimed job is
+    leased to one queue and renewed while it runs, so only jobs abandoned by
+    a process that died are picked up by another.
+    """
+
+    def __init__(self, store, analyze=fetch_call_analysis, workers=ANALYSIS_WORKERS,
+                 max_attempts=ANALYSIS_MAX_ATTEMPTS, retry_delay=ANALYSIS_RETRY_DELAY, lease=ANALYSIS_LEASE_SECONDS):
+        self._store = store
+        self._analyze = analyze
+        self._workers = workers
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self._lease = lease
+        self._owner = uuid.uuid4().hex
+        self._running = set()
+        self._callbacks = {}
+        self._in_flight = 0
+        self._signalled = True
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='call-analysis')
+        self._thread = threading.Thread(target=self._dispatch_loop, name='analysis-queue', daemon=True)
+        self._thread.start()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name='analysis-lease', daemon=True)
+        self._heartbeat.start()
+
+    def enqueue(self, call_id, details=None, on_complete=None):
+        """Queue a finished call; ``on_complete(call_id, analysis)`` runs once it is stored."""
+        call = self._store.get_call(call_id)
+        analysis = None if call is None or call['analysis'] is None else json.loads(call['analysis'])
+        # A stored error is a failed analysis, not a result; it is queued again below
+        if analysis is not None and 'error' not in analysis:
+            if on_complete is not None:
+                on_complete(call_id, analysis)
+            return
+        with self._cond:
+            if on_complete is not None:
+                self._callbacks.setdefault(call_id, []).append(on_complete)
+            self._store.enqueue_analysis(call_id, details)
+            self._signalled = True
+            self._cond.notify_all()
+
+    def depth(self):
+        """Calls waiting for or undergoing analysis, across every process sharing the store."""
+        return self._store.analysis_queue_depth()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._pool.shutdown(wait=False)
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    if self._in_flight >= self._workers:
+                        self._cond.wait()
+                        continue
+                    if self._signalled:
+                        break
+                    # Sleep until a retry or an abandoned lease falls due, or a new call is queued; jobs
+                    # queued by other processes are noticed within one lease
+                    due = self._store.next_analysis_due()
+                    if due is not None and due <= time.time():
+                        break
+                    self._cond.wait(self._lease if due is None else min(due - time.time(), self._lease))
+                self._signalled = False
+                free = self._workers - self._in_flight
+            jobs = self._store.claim_analysis_jobs(free, self._owner, self._lease)
+            with self._cond:
+                self._in_flight += len(jobs)
+                self._running.update(job['call_id'] for job in jobs)
+            for job in jobs:
+                self._pool.submit(self._run, job)
+
+    def _run(self, job):
+        call_id = job['call_id']
+        try:
+            try:
+                # Nobody is waiting on a queued analysis, so it yields to interactive calls
+                with priority(BATCH):
+                    analysis = self._analyze(call_id)
+                error = analysis.get('error')
+            except Exception as e:
+                analysis = {'error': f"Failed to analyze call: {e}", 'details': ''}
+                error = analysis['error']
+            if error and job['attempts'] < self._max_attempts:
+                self._store.retry_analysis_job(call_id, error, self._retry_delay * 2 ** (job['attempts'] - 1), self._owner)
+                return
+            if not self._store.renew_analysis_leases([call_id], self._owner, self._lease):
+                # The lease lapsed and another process took the job over; its result wins
+                return
+            self._store.save_analysis(call_id, analysis, job['details'].get('status', 'completed'))
+            self._store.finish_analysis_job(call_id, self._owner, 'failed' if error else 'done', error or '')
+            with self._cond:
+                callbacks = self._callbacks.pop(call_id, [])
+            for callback in callbacks:
+                callback(call_id, analysis)
+        finally:
+            with self._cond:
+                self._running.discard(call_id)
+                self._in_flight -= 1
+                self._signalled = True
+                self._cond.notify_all()
+
+    def _heartbeat_loop(self):
+        # Renew well before the lease runs out so a slow analysis is never taken over
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped, timeout=self._lease / 3)
+                if self._stopped:
+                    return
+                running = list(self._running)
+            if running:
+                self._store.renew_analysis_leases(running, self._owner, self._lease)
@@ -1,264 +1,162 @@
+import json
 import os
 import streamlit as st
-import json
-import pandas as pd
 from dotenv import load_dotenv
-from together import Together
-import requests
-import time
-import pickle
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-import re
+from knowledge_base import stream_knowledge_base
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Get environment variables
-together_api_key = os.getenv("TOGETHER_API_KEY")
 google_credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-BLAND_API_KEY = os.getenv('BLAND_API_KEY')
+CALL_WEBHOOK_URL = os.getenv('CALL_WEBHOOK_URL')
+CALL_WEBHOOK_PORT = int(os.getenv('CALL_WEBHOOK_PORT', '8765'))
+CALL_REFRESH_INTERVAL = float(os.getenv('CALL_REFRESH_INTERVAL', '2'))
+# "bland" uses Bland's /analyze endpoint, "local" the resident summarization model
+CALL_NOTES_BACKEND = os.getenv('CALL_NOTES_BACKEND', 'bland')
 
 # Set the path for Google Cloud credentials
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = google_credentials_path
 
-# Set up Together API client
-client = Together(api_key=together_api_key)
-
 # Set page configuration to wide
 st.set_page_config(layout="wide")
 
-# Define the function to create a knowledge base
-def create_knowledge_base(company_url):
-    prompt = f"Create a detailed knowledge base for the company with the URL {company_url}. Include the company name, year founded, headquarters, relevant information, products and solutions, use cases, key features, and any other pertinent details."
-
-    response = client.chat.completions.create(
-        model="meta-llama/Llama-3-8b-chat-hf",
-        messages=[{"role": "user", "content": prompt}]
-    )
-
-    knowledge_base = response.choices[0].message.content.strip()
-    return knowledge_base
-
-# Define the function to fetch company details
-def fetch_company_details(prompt):
-    response1 = client.chat.completions.create(
-        model="meta-llama/Llama-3-8b-chat-hf",
-        messages=[{"role": "user", "content": prompt}]
-    )
-
-    company_list = response1.choices[0].message.content.strip()
-
-    detailed_info_prompt = f"{company_list}. Return me the company name, LinkedIn link (only link), company URL (only link), company size (only approximate number), funding (only dollar amount in approx like $260K or $57M or $1.4B), year founded (only year), and head office location (in city/state/country format). Return me contact of their sales dept (email and phone). Return in JSON format for each company and nothing else besides the JSON text."
-    
-    response2 = client.chat.completions.create(
-        model="meta-llama/Llama-3-8b-chat-hf",
-        messages=[{"role": "user", "content": detailed_info_prompt}]
-    )
-    
-    detailed_info = response2.choices[0].message.content.strip()
-
-    if not detailed_info:
-        raise ValueError("Received empty response for detailed info.")
-
-    try:
-        # Extract the JSON part from the response
-        start_index = detailed_info.find('[')
-        end_index = detailed_info.rfind(']') + 1
-        if start_index == -1 or end_index == -1:
-            raise ValueError("No valid JSON found in the response")
-
-        json_str = detailed_info[start_index:end_index]
-        company_details = json.loads(json_str)
-    except json.JSONDecodeError:
-        st.error("Failed to parse JSON. The response might not be in valid JSON format.")
-        st.write(f"Raw response: {detailed_info}")
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"An unexpected error occurred: {e}")
-        st.write(f"Raw response: {detailed_info}")
-        return pd.DataFrame()
-
-    data = []
-    for company in company_details:
-        company_name = company.get("name", "")
-        if not company_name:
-            st.write(f"Missing company name in: {company}")  # Debugging line
-        formatted_funding = company.get("funding", "")
-        data.append([
-            company_name,
-            company.get("size", ""),
-            formatted_funding,
-            company.get("founded", ""),
-            company.get("head_office", ""),
-            company.get("sales_dept", {}).get("email", ""),
-            company.get("sales_dept", {}).get("phone", ""),
-            ""  # Empty Notes column
-        ])
-
-    df = pd.DataFrame(data, columns=[
-        "Name", "Size", "Funding", "Year Founded", "Head Office Location", "Sales Email", "Sales Phone", "Notes"
-    ])
-
-    return df
-
-def make_ai_call(phone_number, task, knowledge_base, voice='mason', language='eng'):
-    headers = {
-        'authorization': BLAND_API_KEY,
-        'Content-Type': 'application/json'
-    }
-    data = {
-        'phone_number': phone_number,
-        'task': task,
-        'voice': voice,
-        'language': language,
-        'request_data': {
-            'knowledge_base': knowledge_base
-        },
-        'record': True,
-        'reduce_latency': True,
-        'amd': True
-    }
-    response = requests.post('https://api.bland.ai/v1/calls', json=data, headers=headers)
-    return response.json()
-
-def fetch_call_analysis(call_id):
-    url = f"https://api.bland.ai/v1/calls/{call_id}/analyze"
-    headers = {
-        "authorization": BLAND_API_KEY,
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "goal": "Extract the contact name, email address, meeting time, buying intent, and provide a summary of the call.",
-        "questions": [
-            ["What is the contact name?", "string"],
-            ["What is the email address?", "string"],
-            ["What is the meeting time?", "string"],
-            ["What is the buying intent?", "string"],
-            ["Provide a summary of the call that includes name, email of the callee, and scheduled meeting time and date.", "string"]
-        ]
-    }
-
-    response = requests.post(url, json=payload, headers=headers)
-
-    if response.status_code == 200:
-        return response.json()
+# One call tracker per server process, shared by every session
+@st.cache_resource
+def get_call_tracker():
+    from analysis_queue import AnalysisQueue
+    from call_tracker import CallTracker
+    from lead_store import get_lead_store
+    if CALL_NOTES_BACKEND == 'local':
+        from call_notes import analyze_call_locally
+        analysis_queue = AnalysisQueue(get_lead_store(), analyze=analyze_call_locally)
     else:
-        return {
-            'error': f"Failed to analyze call. Status code: {response.status_code}",
-            'details': response.text
-        }
-
-def extract_event_details_with_ai(summary):
-    api_url = "https://api.together.ai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {together_api_key}",
-        "Content-Type": "application/json"
-    }
-    prompt = f"Extract event details from the following summary and generate a JSON in the exact format as specified below, return nothing but the JSON. :\n\nSummary: {summary} + Assume it is July 2024.\n\n" \
-             "JSON Format:\n" \
-             "{{\n" \
-             "  \"summary\": \"Event Title\",\n" \
-             "  \"location\": \"Event Location\",\n" \
-             "  \"description\": \"Event Description\",\n" \
-             "  \"start\": {{\n" \
-             "    \"dateTime\": \"YYYY-MM-DDTHH:MM:SS-07:00\",\n" \
-             "    \"timeZone\": \"America/Los_Angeles\"\n" \
-             "  }},\n" \
-             "  \"end\": {{\n" \
-             "    \"dateTime\": \"YYYY-MM-DDTHH:MM:SS-07:00\",\n" \
-             "    \"timeZone\": \"America/Los_Angeles\"\n" \
-             "  }},\n" \
-             "  \"attendees\": [\n" \
-             "    {{\n" \
-             "      \"email\": \"attendee@example.com\"\n" \
-             "    }}\n" \
-             "  ],\n" \
-             "  \"reminders\": {{\n" \
-             "    \"useDefault\": False,\n" \
-             "    \"overrides\": [\n" \
-             "      {{\n" \
-             "        \"method\": \"email\",\n" \
-             "        \"minutes\": 24 * 60\n" \
-             "      }},\n" \
-             "      {{\n" \
-             "        \"method\": \"popup\",\n" \
-             "        \"minutes\": 10\n" \
-             "      }}\n" \
-             "    ]\n" \
-             "  }}\n" \
-             "}}\n Ensure again you are returning only the JSON and nothing else."
-
-    data = {
-        "model": "meta-llama/Llama-3-8b-chat-hf",
-        "messages": [{"role": "user", "content": prompt}]
-    }
-
-    response = requests.post(api_url, headers=headers, json=data)
-    
-    # Debugging output
-    print(f"API response status code: {response.status_code}")
-    print(f"API response text: {response.text}")
-
-    if response.status_code != 200:
-        raise Exception(f"API request failed with status code {response.status_code}: {response.text}")
-
-    try:
-        response_data = response.json()
-        event_details_message = response_data['choices'][0]['message']['content'].strip()
-
-        # Debugging output to see the exact message content
-        print(f"Event details message: {event_details_message}")
-
-        # Extract JSON from the message content by finding the first and last curly brackets
-        json_start = event_details_message.find('{')
-        json_end = event_details_message.rfind('}') + 1
-        if json_start == -1 or json_end == -1:
-            raise ValueError("No JSON content found in the response message")
-        
-        event_details_json = event_details_message[json_start:json_end]
-        event_details_json = event_details_json.replace('```', '').strip()  # Remove backticks if any
-        print(f"Event details JSON: {event_details_json}")  # Debugging output to see the extracted JSON string
-
-        # Additional cleanup for any unexpected characters
-        event_details_json = re.sub(r'\\n', '', event_details_json)
-        event_details_json = re.sub(r'\\', '', event_details_json)
-        event_details_json = re.sub(r'\s+', ' ', event_details_json)
-        
-        # Remove trailing commas if present
-        event_details_json = re.sub(r',\s*}', '}', event_details_json)
-        event_details_json = re.sub(r',\s*]', ']', event_details_json)
-
-        event_details = json.loads(event_details_json)
-    except (json.JSONDecodeError, KeyError, ValueError) as e:
-        raise Exception(f"Error parsing JSON response: {e}")
-
-    print(event_details)
-    return event_details
-
-def authenticate_google_calendar():
-    creds = None
-    SCOPES = ['https://www.googleapis.com/auth/calendar']
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
-            creds = pickle.load(token)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+        analysis_queue = AnalysisQueue(get_lead_store())
+    tracker = CallTracker(analysis_queue=analysis_queue, store=get_lead_store())
+    if CALL_WEBHOOK_URL:
+        tracker.start_webhook_server(port=CALL_WEBHOOK_PORT)
+    return tracker
+
+# Background work for this session, started while the rep is still in Step 2
+def get_prefetcher():
+    if 'prefetcher' not in st.session_state:
+        from prefetch import Prefetcher
+        st.session_state['prefetcher'] = Prefetcher()
+    return st.session_state['prefetcher']
+
+# Show the stored analysis of every finished call in the Notes of the company that was called
+def apply_finished_calls(table):
+    tracker = get_call_tracker()
+    store = get_lead_store()
+    pending_calls = st.session_state['pending_calls']
+    for call_id, company_name in list(pending_calls.items()):
+        call = store.get_call(call_id)
+        if call is None or call['finished_at'] is None:
+            continue
+        tracker.pop_result(call_id)
+        del pending_calls[call_id]
+        if call['status'] != 'failed':
+            table.set_notes(company_name, call['summary'])
+            st.success(f"Call with {company_name} completed and summary updated in notes.")
         else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json', SCOPES)
-            creds = flow.run_local_server(port=8080)
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
-    return creds
-
-def create_event(service, event_details):
-    print("starting")
-    event = service.events().insert(calendarId='primary', body=event_details).execute()
-    print('Event created: %s' % (event.get('htmlLink')))
+            analysis_response = json.loads(call['analysis'] or '{}')
+            st.error(f"Failed to analyze call with {company_name}: {analysis_response.get('error')}")
+            st.write(analysis_response.get('details', ''))
+
+    campaign = st.session_state.get('campaign')
+    if campaign is not None:
+        for company_name, call_summary in campaign.pop_notes().items():
+            table.set_notes(company_name, call_summary)
+
+# Persist Notes typed into the visible page so they survive refreshes and are shared with other reps
+def save_edited_notes(table, page, edited_page):
+    store = get_lead_store()
+    before = dict(zip(page["Name"], page["Notes"]))
+    for name, notes in zip(edited_page["Name"], edited_page["Notes"]):
+        if name in before and notes != before[name]:
+            store.update_notes(name, notes)
+            table.set_notes(name, notes)
+
+# Rerun the page as soon as any call in flight finishes, without blocking the rest of the UI
+@st.fragment(run_every=CALL_REFRESH_INTERVAL)
+def show_call_progress():
+    pending_calls = st.session_state.get('pending_calls', {})
+    if not pending_calls:
+        return
+    store = get_lead_store()
+    if any((store.get_call(call_id) or {}).get('finished_at') is not None for call_id in pending_calls):
+        st.rerun()
+    st.info(f"{len(pending_calls)} call(s) in progress: {', '.join(pending_calls.values())}")
+
+# Live progress of a running dial campaign; reruns the page whenever new notes are ready
+@st.fragment(run_every=CALL_REFRESH_INTERVAL)
+def show_campaign_progress():
+    campaign = st.session_state.get('campaign')
+    if campaign is None:
+        return
+    if campaign.has_notes():
+        st.rerun()
+    done, total = campaign.progress()
+    st.progress(done / total if total else 1.0, text=f"{done}/{total} leads called")
+    statuses = campaign.statuses()
+    release_times = campaign.release_times()
+    st.dataframe({"Name": list(statuses), "Call Status": list(statuses.values()),
+                  "Dials at (local)": [release_times.get(name, "") for name in statuses]}, use_container_width=True)
+    if campaign.is_running() and st.button("Stop campaign", key="stop_campaign"):
+        campaign.cancel()
+
+# Latency histograms and cache hit rates of the external calls made by this server process
+@st.fragment(run_every=5)
+def show_performance_panel():
+    import altair as alt
+    from llm import get_cache, get_dispatcher
+    from rate_limit import metrics as rate_limit_metrics
+    from tracing import get_tracer
+    tracer = get_tracer()
+    cache = get_cache()
+    if cache is not None:
+        stats = cache.stats()
+        st.metric("LLM cache hit rate", f"{stats['hit_rate']:.0%}", help=f"{stats['hits']} hits, {stats['misses']} misses")
+    hedging = get_dispatcher().stats()
+    if hedging['completions']:
+        st.caption(f"{hedging['hedges']} of {hedging['completions']} completions hedged ({hedging['hedge_wins']} won by the hedge, "
+                   f"{hedging['hedges_denied']} held back by the budget), {hedging['failovers']} failovers, {hedging['failures']} failures")
+    limits = rate_limit_metrics()
+    if limits:
+        st.dataframe({
+            "Provider": list(limits),
+            "Queued (interactive)": [s['queued']['interactive'] for s in limits.values()],
+            "Queued (batch)": [s['queued']['batch'] for s in limits.values()],
+            "In flight": [s['in_flight'] for s in limits.values()],
+            "Mean wait ms": [round(s['mean_wait'] * 1000) for s in limits.values()],
+            "Max wait ms": [round(s['max_wait'] * 1000) for s in limits.values()],
+            "429s": [s['rate_limited'] for s in limits.values()],
+        }, hide_index=True, use_container_width=True)
+    summary = tracer.summary()
+    if not summary:
+        st.caption("No external calls yet.")
+        return
+    st.dataframe({
+        "Stage": list(summary),
+        "Calls": [s['count'] for s in summary.values()],
+        "Errors": [s['errors'] for s in summary.values()],
+        "p50 ms": [round(s['p50'] * 1000) for s in summary.values()],
+        "p95 ms": [round(s['p95'] * 1000) for s in summary.values()],
+        "Retries": [s['retries'] for s in summary.values()],
+        "Tokens": [s['prompt_tokens'] + s['completion_tokens'] for s in summary.values()],
+        "Cache hits": [None if s['cache_hit_rate'] is None else f"{s['cache_hit_rate']:.0%}" for s in summary.values()],
+    }, hide_index=True, use_container_width=True)
+    stage = st.selectbox("Latency histogram", list(summary), key="performance_stage")
+    labels = ["> 60 s" if bound == float('inf') else f"≤ {bound * 1000:g} ms" if bound < 1 else f"≤ {bound:g} s"
+              for bound, _ in tracer.histogram(stage)]
+    data = alt.Data(values=[{"latency": label, "calls": count}
+                            for label, (_, count) in zip(labels, tracer.histogram(stage))])
+    chart = alt.Chart(data).mark_bar().encode(x=alt.X("latency:N", sort=None, title=None), y=alt.Y("calls:Q", title="calls"))
+    st.altair_chart(chart, use_container_width=True)
+
+with st.sidebar:
+    if st.toggle("Performance panel"):
+        show_performance_panel()
 
 # Navigation control
 if 'step' not in st.session_state:
@@ -271,13 +169,17 @@ if st.session_state['step'] == 1:
     company_url = st.text_input("What's your company URL?", key="company_url", help="Enter the company's website URL.")
     
     if st.button("Create Knowledge Base") and company_url:
-        with st.spinner("Creating knowledge base...✨"):
-            try:
-                knowledge_base = create_knowledge_base(company_url)
-                st.session_state['company_info'] = knowledge_base.replace("**", "").replace("###", "")
-                st.session_state['step'] = 2
-            except Exception as e:
-                st.error(f"Error creating knowledge base: {e}")
+        preview = st.empty()
+        try:
+            knowledge_base = ""
+            for piece in stream_knowledge_base(company_url):
+                knowledge_base += piece
+                preview.markdown(knowledge_base)
+            preview.empty()
+            st.session_state['company_info'] = knowledge_base.strip().replace("**", "").replace("###", "")
+            st.session_state['step'] = 2
+        except Exception as e:
+            st.error(f"Error creating knowledge base: {e}")
 
 # Step 2: Edit and Save Company Knowledge Base
 if st.session_state['step'] == 2:
@@ -289,88 +191,181 @@ if st.session_state['step'] == 2:
         edited_info = st.text_area("Edit your company info below and click save:", knowledge_base, height=400, key="edited_info")
         
         if st.button("Save"):
+            from knowledge_index import get_knowledge_index
             st.session_state['company_info'] = edited_info
+            # Index the sections now so the first call does not pay for it
+            get_knowledge_index(edited_info)
             st.success("Company information saved!")
             
         if st.button("Next"):
             st.session_state['step'] = 3
+            # Open Step 3 on the rep's latest search if it has already been run in the background
+            ready = get_prefetcher().ready_search()
+            if ready is not None and 'lead_table' not in st.session_state:
+                from lead_store import get_lead_store
+                from lead_table import LeadTable
+                st.session_state['input_prompt'], names = ready
+                st.session_state['lead_table'] = LeadTable(get_lead_store().query_leads(names=names))
+        else:
+            # Keyed on the saved knowledge base, so saving an edit discards what was prefetched for the old one
+            get_prefetcher().start(st.session_state['company_info'])
 
 # Step 3: Fetch Company Details
 if st.session_state['step'] == 3:
+    # Step 3 dependencies are only imported once a session gets here
+    from bland import place_call
+    from dial_queue import is_calling_hours
+    from dialer import BLAND_MAX_CONCURRENT_CALLS, CampaignDialer
+    from lead_store import get_lead_store
+    from lead_table import LeadTable, lead_companies, lead_notes, read_lead_file, write_lead_file
+    from leads import iter_company_details, leads_dataframe
+
     st.title("Salesbuddy.ai 🔮💹")
 
     input_prompt = st.text_input("Find your next leads here:", key="input_prompt", help="Enter a prompt to fetch company details.")
 
     if st.button("Find leads ✨"):
-        if input_prompt:
+        prefetched = get_prefetcher().search_result(input_prompt) if input_prompt else None
+        if prefetched:
+            st.session_state['lead_table'] = LeadTable(get_lead_store().query_leads(names=prefetched))
+            get_lead_store().record_search(input_prompt)
+        elif input_prompt:
+            research = st.empty()
+            table = st.empty()
+            rows = []
             try:
-                df = fetch_company_details(input_prompt)
-                st.session_state['company_df'] = df
+                for row in iter_company_details(input_prompt, on_research=research.caption):
+                    rows.append(row)
+                    table.dataframe(leads_dataframe(rows), use_container_width=True)
+                research.empty()
+                table.empty()
+                st.session_state['lead_table'] = LeadTable(get_lead_store().query_leads(names=[row[0] for row in rows]))
+                get_lead_store().record_search(input_prompt)
             except Exception as e:
                 st.error(f"Error fetching company details: {e}")
         else:
             st.warning("Please enter a prompt to fetch company details.")
 
-    if 'company_df' in st.session_state:
-        df = st.session_state['company_df']
+    if st.button("Load saved leads 📇"):
+        st.session_state['lead_table'] = LeadTable(get_lead_store().query_leads())
 
-        if "Notes" not in df.columns:
-            df["Notes"] = ""
+    with st.expander("Import / export lead list"):
+        upload = st.file_uploader("Parquet or Arrow lead list", type=["parquet", "arrow", "feather"])
+        if upload is not None and st.button("Import leads 📥"):
+            try:
+                imported = read_lead_file(upload)
+                get_lead_store().upsert_companies(lead_companies(imported), notes=lead_notes(imported))
+                st.session_state['lead_table'] = LeadTable(imported)
+                st.success(f"Imported {imported.num_rows} leads.")
+            except Exception as e:
+                st.error(f"Error importing leads: {e}")
+        if 'lead_table' in st.session_state:
+            export_format = st.radio("Export format", ["parquet", "arrow"], horizontal=True)
+            # Serialized on request only; building the file on every rerun would defeat the paging
+            if st.button("Prepare export 📤"):
+                st.session_state['lead_export'] = (export_format, write_lead_file(st.session_state['lead_table'].to_arrow(), export_format))
+            if st.session_state.get('lead_export'):
+                fmt, data = st.session_state['lead_export']
+                st.download_button("Download leads", data, file_name=f"leads.{fmt}", mime="application/octet-stream")
+
+    if 'pending_calls' not in st.session_state:
+        st.session_state['pending_calls'] = {}
+
+    if 'lead_table' in st.session_state:
+        table = st.session_state['lead_table']
+
+        apply_finished_calls(table)
 
         st.write("#### Prospective sales/customers:")
 
+        # Jump straight to a company's page through the name index
+        jump_to = st.text_input("Go to company", key="lead_jump", help="Exact company name")
+        if jump_to and jump_to in table and st.session_state.get('lead_jumped') != jump_to:
+            st.session_state['lead_page'] = table.page_of(jump_to) + 1
+            st.session_state['lead_jumped'] = jump_to
+        # A freshly loaded, shorter list would otherwise keep a page number past its end
+        if st.session_state.get('lead_page', 1) > table.page_count():
+            st.session_state['lead_page'] = 1
+        page_number = st.number_input(f"Page (of {table.page_count()})", min_value=1, max_value=table.page_count(),
+                                      step=1, key="lead_page")
+        page = table.page(int(page_number) - 1)
+
         col1, col2 = st.columns([3, 1])
         with col1:
-            selected_company = st.selectbox("Select a company to call:", df["Name"])
+            names = list(page["Name"])
+            selected_company = st.selectbox("Select a company to call:", names,
+                                            index=names.index(jump_to) if jump_to in names else 0)
         with col2:
             if selected_company:
-                selected_row = df[df["Name"] == selected_company].iloc[0]
+                selected_row = table.row(selected_company)
                 phone_number = selected_row["Sales Phone"]
                 knowledge_base = st.session_state['company_info']
-                task = f"""
-                You are calling a salesperson at {selected_company}. Your goal is introduce your company and schedule a follow-up conversation.
-                Use the following knowledge base for reference: {knowledge_base}
-                Call Flow:
-                    Introduce yourself as Oliver and say you are calling from the company mentioned in knowledge base.
-                    Introduce in 1 line about your company's offerings.
-                    Ask who you are talking to and what their company needs are.
-                    Say you are trying to schedule a follow-up conversation with your head of sales.
-                    If they need to reschedule, offer some alternate time slots later in the week.
-                    Get their name, and email id in order to send a calendar invite.
-                    Once the new time and date is confirmed or the original time and date is reconfirmed, thank him and provide your email if he needs to get in touch.
-                    Be polite, respectful, and try not to speak too much.
-                """
+                in_hours, local_time = is_calling_hours(selected_row["Head Office Location"])
+                if not in_hours:
+                    st.warning(f"It is {local_time:%a %H:%M} at {selected_company}'s head office, outside calling hours.")
                 if st.button("📞", key="make_call"):
                     with st.spinner("Making AI call...🪄"):
-                        call_response = make_ai_call(phone_number, task, knowledge_base)
-                        if call_response.get('status') == 'success':
-                            call_id = call_response.get('call_id')
-                            time.sleep(200)
-                            analysis_response = fetch_call_analysis(call_id)
-                            if 'error' not in analysis_response:
-                                call_summary = analysis_response['answers'][-1]
-                                df.loc[df['Name'] == selected_company, 'Notes'] = call_summary
-                                st.session_state['company_df'] = df
-                                st.success("Call completed and summary updated in notes.")
-                            else:
-                                st.error(f"Failed to analyze call: {analysis_response['error']}")
-                                st.write(analysis_response['details'])
-                        else:
-                            st.error("Failed to make the call.")
-
-        edited_df = st.data_editor(df, num_rows="dynamic", use_container_width=True, disabled=["Name", "Size", "Funding", "Year Founded", "Head Office Location", "Sales Email"])
-
-        st.session_state['company_df'] = edited_df
+                        task = get_prefetcher().call_task(selected_company, knowledge_base, selected_row)
+                        # Waits for a live-call slot if campaigns or batch runs are using all of them
+                        call_response = place_call(get_lead_store(), selected_company, phone_number, task,
+                                                   webhook=CALL_WEBHOOK_URL)
+                    if call_response.get('status') == 'success':
+                        call_id = call_response.get('call_id')
+                        get_call_tracker().track(call_id)
+                        st.session_state['pending_calls'][call_id] = selected_company
+                        st.info("Call started. Notes will update as soon as the call ends.")
+                    else:
+                        st.error("Failed to make the call.")
+
+        # Only the visible page goes to the browser; edits are written back by name
+        edited_page = st.data_editor(page, use_container_width=True, key=f"lead_editor_{page_number}",
+                                     disabled=["Name", "Size", "Funding", "Year Founded", "Head Office Location", "Sales Email", "Sales Phone"])
+
+        save_edited_notes(table, page, edited_page)
 
         if st.button("Schedule Meeting 📆"):
-            summary = df.loc[df['Name'] == selected_company, 'Notes'].values[0]
+            summary = table.row(selected_company)['Notes']
             if summary:
                 with st.spinner("Scheduling meeting...🪄"):
                     try:
-                        creds = authenticate_google_calendar()
-                        service = build('calendar', 'v3', credentials=creds)
-                        event_details = extract_event_details_with_ai(summary)
-                        create_event(service, event_details)
+                        from google_calendar import get_calendar_service
+                        from meeting_extraction import meeting_for_lead
+                        from scheduling import create_event
+                        from timezones import timezone_for_location
+                        time_zone = timezone_for_location(selected_row["Head Office Location"])
+                        # Prefer the structured answers of the latest analysed call, anchored to when it happened
+                        event_details, call_id = meeting_for_lead(get_lead_store(), selected_company, summary, time_zone)
+                        service = get_calendar_service()
+                        event = create_event(service, event_details)
+                        get_lead_store().record_meeting(selected_company, event, call_id)
                         st.success("Meeting scheduled successfully! ✅")
                     except Exception as e:
                         st.error(f"Error scheduling meeting: {e}")
+
+        if st.button("Schedule all meetings 📆📆"):
+            with st.spinner("Scheduling meetings...🪄"):
+                try:
+                    from google_calendar import get_calendar_service
+                    from scheduling import schedule_meetings
+                    results = schedule_meetings(get_calendar_service(),
+                                                zip(table.column("Name"), table.column("Notes"), table.column("Head Office Location")),
+                                                store=get_lead_store())
+                    scheduled = sum(1 for result in results if result['status'] == 'scheduled')
+                    st.success(f"Scheduled {scheduled} of {len(results)} meetings ✅")
+                    st.dataframe([{'Company': result['company'], 'Status': result['status'], 'Details': result['error']}
+                                  for result in results], use_container_width=True)
+                except Exception as e:
+                    st.error(f"Error scheduling meetings: {e}")
+
+        st.write("#### Dial campaign:")
+        max_concurrent_calls = st.number_input("Max simultaneous calls", min_value=1, value=BLAND_MAX_CONCURRENT_CALLS, step=1)
+        campaign = st.session_state.get('campaign')
+        if st.button("Call all leads 📞📞", disabled=campaign is not None and campaign.is_running()):
+            campaign = CampaignDialer(get_call_tracker(), st.session_state['company_info'],
+                                      max_concurrent_calls=int(max_concurrent_calls), webhook=CALL_WEBHOOK_URL,
+                                      store=get_lead_store(), build_task=get_prefetcher().call_task)
+            campaign.start(zip(table.column("Name"), table.column("Sales Phone"), table.column("Head Office Location")))
+            st.session_state['campaign'] = campaign
+        show_campaign_progress()
+
+    show_call_progress()
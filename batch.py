@@ -0,0 +1,365 @@
+"""Headless prospecting run: lead search -> dialing -> analysis -> scheduling.
+
+Reads one search prompt per line and streams every lead through the same
+functions the Streamlit app uses, with a bounded number of workers per
+stage. Progress is checkpointed to SQLite after every item, so a crashed or
+interrupted run picks up exactly where it stopped when started again with
+the same checkpoint file:
+
+    python batch.py --prompts prompts.txt --knowledge-base kb.md
+    python batch.py --prompts prompts.txt --knowledge-base kb.md --no-schedule --dial-workers 3
+"""
+import argparse
+import contextvars
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from itertools import chain
+
+from dotenv import load_dotenv
+
+from lead_store import LEAD_COLUMNS, normalize_name
+from rate_limit import BATCH, priority
+
+load_dotenv()
+
+BATCH_CHECKPOINT_PATH = os.getenv('BATCH_CHECKPOINT_PATH', os.path.join('.cache', 'batch_checkpoint.sqlite'))
+
+# Lead states before the final ones (scheduled, done, skipped, failed)
+FOUND, DIALING, CALLED, ANALYSED = 'found', 'dialing', 'called', 'analysed'
+
+
+class Checkpoint:
+    """Per-item progress of a batch run, committed to SQLite after every step."""
+
+    def __init__(self, path=BATCH_CHECKPOINT_PATH):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS prompts (
+                    prompt TEXT PRIMARY KEY,
+                    leads INTEGER NOT NULL,
+                    error TEXT NOT NULL DEFAULT '',
+                    finished_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS leads (
+                    name_key TEXT PRIMARY KEY,
+                    row TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    call_id TEXT,
+                    detail TEXT NOT NULL DEFAULT '',
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS leads_state ON leads (state);
+            """)
+
+    def _connect(self):
+        # sqlite3 connections cannot be shared between threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def prompt_done(self, prompt):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM prompts WHERE prompt = ?", (prompt,)).fetchone() is not None
+
+    def finish_prompt(self, prompt, leads, error=''):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO prompts (prompt, leads, error, finished_at) VALUES (?, ?, ?, ?)",
+                         (prompt, leads, error, time.time()))
+
+    def add_lead(self, row):
+        """Record a newly found lead; returns False if this run has seen it before."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO leads (name_key, row, state, updated_at) VALUES (?, ?, ?, ?)",
+                (normalize_name(row['Name']), json.dumps(row), FOUND, time.time())
+            )
+        return cursor.rowcount > 0
+
+    def set_state(self, row, state, call_id=None, detail=''):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE leads SET state = ?, call_id = COALESCE(?, call_id), detail = ?, updated_at = ? WHERE name_key = ?",
+                (state, call_id, detail, time.time(), normalize_name(row['Name']))
+            )
+
+    def leads_in(self, state):
+        """Leads left in ``state`` by an earlier run, with the call ID where there is one."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT row, call_id FROM leads WHERE state = ? ORDER BY updated_at",
+                                (state,)).fetchall()
+        return [(json.loads(row), call_id) for row, call_id in rows]
+
+    def counts(self):
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT state, COUNT(*) FROM leads GROUP BY state").fetchall())
+
+
+def bounded_map(fn, items, workers):
+    """Yield ``(item, result, error)`` for every item as ``fn`` finishes it.
+
+    At most ``workers`` items are in flight and the next one is only pulled
+    from ``items`` when a slot frees up, so chained stages stream with
+    constant memory however long the input is.
+    """
+    def call(item):
+        try:
+            return item, fn(item), None
+        except Exception as e:
+            return item, None, e
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for item in items:
+            pending.add(pool.submit(contextvars.copy_context().run, call, item))
+            if len(pending) >= workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+
+def read_prompts(path):
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+
+def report(row, message):
+    print(f"[{time.strftime('%H:%M:%S')}] {row['Name']}: {message}", flush=True)
+
+
+class BatchPipeline:
+    """The four pipeline stages as chained generators over one checkpoint."""
+
+    def __init__(self, knowledge_base, checkpoint, search_workers=2, dial_workers=None, analysis_workers=4,
+                 schedule_workers=2, call_timeout=None, schedule=True):
+        from dialer import BLAND_MAX_CONCURRENT_CALLS, CAMPAIGN_CALL_TIMEOUT
+        from lead_store import get_lead_store
+
+        self.knowledge_base = knowledge_base
+        self.checkpoint = checkpoint
+        self.store = get_lead_store()
+        self.search_workers = search_workers
+        self.dial_workers = dial_workers or BLAND_MAX_CONCURRENT_CALLS
+        self.analysis_workers = analysis_workers
+        self.schedule_workers = schedule_workers
+        self.call_timeout = call_timeout or CAMPAIGN_CALL_TIMEOUT
+        self.schedule = schedule
+
+    def run(self, prompts):
+        # A call placed before a crash is waited on again; one that may or may not
+        # have gone out is given up rather than risk dialing the lead twice
+        placed = []
+        for row, call_id in self.checkpoint.leads_in(DIALING):
+            if call_id:
+                placed.append((row, call_id))
+            else:
+                self.checkpoint.set_state(row, 'failed', detail='interrupted while dialing')
+                report(row, "failed: interrupted while dialing")
+
+        found = chain(placed, ((row, None) for row in chain(self._resume(FOUND), self.search(prompts))))
+        called = chain(self._resume(CALLED), self.dial(found))
+        analysed = chain(self._resume(ANALYSED), self.analyse(called))
+        finished = self.schedule_meetings(analysed) if self.schedule else self._finish(analysed)
+        # Headless runs share provider quotas with the app and give way to it
+        with priority(BATCH):
+            for _ in finished:
+                pass
+        return self.checkpoint.counts()
+
+    def _resume(self, state):
+        for row, call_id in self.checkpoint.leads_in(state):
+            yield (row, call_id) if state != FOUND else row
+
+    def search(self, prompts):
+        from leads import iter_company_details
+
+        def find(prompt):
+            try:
+                rows = list(iter_company_details(prompt))
+            except ValueError:
+                # The search found no usable companies; that is a result, not a failure
+                rows = []
+            return [dict(zip(LEAD_COLUMNS, row)) for row in rows]
+
+        todo = (prompt for prompt in prompts if not self.checkpoint.prompt_done(prompt))
+        for prompt, rows, error in bounded_map(find, todo, self.search_workers):
+            new = [row for row in rows or [] if self.checkpoint.add_lead(row)]
+            self.checkpoint.finish_prompt(prompt, len(new), '' if error is None else str(error))
+            print(f"[{time.strftime('%H:%M:%S')}] search {prompt!r}: {len(new)} new leads"
+                  + (f" ({error})" if error else ''), flush=True)
+            yield from new
+
+    def dial(self, leads):
+        """Call every ``(row, call_id)`` lead without a call ID, then wait for each call to end."""
+        from bland import build_call_task, place_call
+
+        def dial_lead(lead):
+            row, call_id = lead
+            if call_id:
+                self._wait_for_call_end(call_id)
+                return call_id
+            if not row.get('Sales Phone'):
+                raise ValueError("no phone number")
+            self.checkpoint.set_state(row, DIALING)
+            # Shares the account's live-call slots with the app and any other batch run
+            response = place_call(self.store, row['Name'], row['Sales Phone'],
+                                  build_call_task(row['Name'], self.knowledge_base, row))
+            if response.get('status') != 'success':
+                raise RuntimeError(f"call was not placed: {response.get('message') or response}")
+            call_id = response['call_id']
+            self.checkpoint.set_state(row, DIALING, call_id=call_id)
+            self._wait_for_call_end(call_id)
+            return call_id
+
+        for (row, _), call_id, error in bounded_map(dial_lead, leads, self.dial_workers):
+            if error is not None:
+                self.checkpoint.set_state(row, 'skipped' if 'no phone' in str(error) else 'failed', detail=str(error))
+                report(row, f"call failed: {error}")
+                continue
+            self.checkpoint.set_state(row, CALLED, call_id=call_id)
+            report(row, "call finished")
+            yield row, call_id
+
+    def _wait_for_call_end(self, call_id):
+        from bland import get_call_details, is_call_finished
+        from call_tracker import CALL_POLL_BACKOFF, CALL_POLL_INTERVAL, CALL_POLL_MAX_ERRORS, CALL_POLL_MAX_INTERVAL
+
+        deadline = time.monotonic() + self.call_timeout
+        interval, errors = CALL_POLL_INTERVAL, 0
+        while time.monotonic() < deadline:
+            time.sleep(interval)
+            try:
+                if is_call_finished(get_call_details(call_id)):
+                    self.store.release_call_slot(call_id=call_id)
+                    return
+            except Exception:
+                errors += 1
+                if errors >= CALL_POLL_MAX_ERRORS:
+                    raise
+            interval = min(interval * CALL_POLL_BACKOFF, CALL_POLL_MAX_INTERVAL)
+        raise TimeoutError("timed out waiting for the call to end")
+
+    def analyse(self, calls):
+        from bland import fetch_call_analysis
+
+        def analyse_call(call):
+            row, call_id = call
+            stored = self.store.get_call(call_id)
+            if stored is not None and stored['analysis'] is not None:
+                return json.loads(stored['analysis'])
+            analysis = fetch_call_analysis(call_id)
+            self.store.save_analysis(call_id, analysis)
+            return analysis
+
+        for (row, call_id), analysis, error in bounded_map(analyse_call, calls, self.analysis_workers):
+            error = error or (analysis or {}).get('error')
+            if error:
+                self.checkpoint.set_state(row, 'failed', detail=f"analysis failed: {error}")
+                report(row, f"analysis failed: {error}")
+                continue
+            self.checkpoint.set_state(row, ANALYSED)
+            report(row, "analysis stored")
+            yield row, call_id
+
+    def schedule_meetings(self, calls):
+        """Book the meetings agreed on the calls through the app's conflict-checked batch scheduler.
+
+        Leads are booked in groups of up to a Calendar batch. Booking is
+        idempotent, so a run that stopped between booking a meeting and
+        checkpointing it does not book it again on resume.
+        """
+        from meeting_extraction import MEETING_TIME
+        from scheduling import CALENDAR_BATCH_SIZE
+
+        agreed = []
+        for row, call_id in calls:
+            answers = json.loads(self.store.get_call(call_id)['analysis']).get('answers') or []
+            if len(answers) <= MEETING_TIME or not str(answers[MEETING_TIME] or '').strip():
+                self.checkpoint.set_state(row, 'done', detail='no meeting agreed')
+                report(row, "no meeting agreed")
+                yield row
+                continue
+            agreed.append(row)
+            if len(agreed) >= CALENDAR_BATCH_SIZE:
+                yield from self._book(agreed)
+                agreed = []
+        if agreed:
+            yield from self._book(agreed)
+
+    def _book(self, rows):
+        from google_calendar import get_calendar_service
+        from scheduling import schedule_meetings
+
+        leads = [(row['Name'], row.get('Notes', ''), row.get('Head Office Location')) for row in rows]
+        try:
+            results = schedule_meetings(get_calendar_service(), leads, store=self.store, max_workers=self.schedule_workers)
+        except Exception as e:
+            results = [{'status': 'failed', 'event': None, 'error': str(e)} for _ in rows]
+        for row, result in zip(rows, results):
+            if result['status'] == 'scheduled':
+                link = (result['event'] or {}).get('htmlLink', '')
+                self.checkpoint.set_state(row, 'scheduled', detail=link)
+                report(row, f"meeting scheduled {link}")
+            elif result['status'] == 'failed':
+                self.checkpoint.set_state(row, 'failed', detail=f"scheduling failed: {result['error']}")
+                report(row, f"scheduling failed: {result['error']}")
+            else:
+                # A conflicting slot is left for a rep to rebook rather than retried
+                self.checkpoint.set_state(row, 'skipped', detail=f"{result['status']}: {result['error']}")
+                report(row, f"meeting {result['status']}: {result['error']}")
+            yield row
+
+    def _finish(self, calls):
+        for row, _ in calls:
+            self.checkpoint.set_state(row, 'done')
+            yield row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--prompts', required=True, help='file with one lead search prompt per line')
+    parser.add_argument('--knowledge-base', required=True, help='file with the company knowledge base')
+    parser.add_argument('--checkpoint', default=BATCH_CHECKPOINT_PATH, help='progress file; reuse it to resume a run')
+    parser.add_argument('--search-workers', type=int, default=2)
+    parser.add_argument('--dial-workers', type=int, help='simultaneous calls (default BLAND_MAX_CONCURRENT_CALLS)')
+    parser.add_argument('--analysis-workers', type=int, default=4)
+    parser.add_argument('--schedule-workers', type=int, default=2)
+    parser.add_argument('--call-timeout', type=float, help='seconds to wait for a single call to end')
+    parser.add_argument('--no-schedule', action='store_true', help='stop after the call analysis')
+    args = parser.parse_args()
+
+    with open(args.knowledge_base) as f:
+        knowledge_base = f.read()
+    pipeline = BatchPipeline(
+        knowledge_base, Checkpoint(args.checkpoint), search_workers=args.search_workers,
+        dial_workers=args.dial_workers, analysis_workers=args.analysis_workers,
+        schedule_workers=args.schedule_workers, call_timeout=args.call_timeout, schedule=not args.no_schedule,
+    )
+    try:
+        counts = pipeline.run(read_prompts(args.prompts))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume.", file=sys.stderr)
+        sys.exit(130)
+    print("Leads by state: " + ", ".join(f"{state} {count}" for state, count in sorted(counts.items())))
+
+
+if __name__ == '__main__':
+    main()
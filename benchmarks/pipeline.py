@@ -0,0 +1,207 @@
+"""End-to-end latency of the knowledge base -> lead search -> call -> analysis -> meeting flow.
+
+The real pipeline functions run against local stand-ins for Together, Bland
+and Google Calendar (see stubs.py), so every stage can be measured without
+credentials or network access. Latency, error rate and payload size of each
+stand-in are configurable, e.g.:
+
+    python benchmarks/pipeline.py --latency together=0.4 --latency bland=0.1 --error-rate bland=0.05
+    python benchmarks/pipeline.py --save-baseline benchmarks/pipeline_baseline.json
+    python benchmarks/pipeline.py --baseline benchmarks/pipeline_baseline.json
+
+With ``--baseline`` the run exits non-zero when a stage's p95 is slower, or
+its throughput lower, than the stored baseline by more than the tolerance.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stubs import SERVICES, StubConfig, StubServer  # noqa: E402
+
+STAGES = ['knowledge_base', 'lead_search', 'call', 'analysis', 'event_extraction', 'calendar_insert']
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of ``values`` for ``q`` in [0, 100]."""
+    ordered = sorted(values)
+    if not ordered:
+        return float('nan')
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_stage(fn, inputs, concurrency):
+    """Call ``fn`` on every input with ``concurrency`` workers; returns the outputs and timings."""
+    latencies, outputs, errors = [], [], []
+
+    def timed(arg):
+        start = time.perf_counter()
+        try:
+            result = fn(arg)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            return
+        latencies.append(time.perf_counter() - start)
+        outputs.append(result)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, inputs))
+    wall = time.perf_counter() - start
+    return outputs, {
+        'n': len(latencies),
+        'errors': len(errors),
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'throughput': len(latencies) / wall if wall else 0.0,
+        'first_error': errors[0] if errors else '',
+    }
+
+
+def _succeeded(response):
+    # Bland helpers report failures in the response body instead of raising
+    if response.get('status') != 'success':
+        raise RuntimeError(response.get('error') or response.get('message') or f"unsuccessful response {response}")
+    return response
+
+
+def _configure_environment(stub_url, tmp):
+    # Must happen before the app modules are imported; they read their settings at import time
+    os.environ.update({
+        'TOGETHER_API_KEY': 'benchmark',
+        'TOGETHER_API_URL': f"{stub_url}/v1",
+        'BLAND_API_KEY': 'benchmark',
+        'BLAND_API_URL': f"{stub_url}/v1",
+        'GOOGLE_CALENDAR_API_ENDPOINT': f"{stub_url}/calendar/v3/",
+        'GOOGLE_TOKEN_PATH': os.path.join(tmp, 'token.json'),
+        'LEAD_DB_PATH': os.path.join(tmp, 'salesbuddy.db'),
+        'LLM_CACHE_PATH': os.path.join(tmp, 'llm_cache.sqlite'),
+        'LLM_CACHE_DISABLED': '1',
+        'CRAWL_CACHE_PATH': os.path.join(tmp, 'page_cache.sqlite'),
+    })
+    # A token valid for the whole run, so no OAuth flow or refresh is attempted
+    expiry = datetime.now(timezone.utc) + timedelta(days=1)
+    with open(os.environ['GOOGLE_TOKEN_PATH'], 'w') as token:
+        json.dump({'token': 'benchmark', 'refresh_token': 'benchmark', 'client_id': 'benchmark',
+                   'client_secret': 'benchmark', 'expiry': expiry.strftime('%Y-%m-%dT%H:%M:%SZ')}, token)
+
+
+def measure(iterations, concurrency, stub_configs, companies_per_search):
+    with tempfile.TemporaryDirectory() as tmp, StubServer(stub_configs, companies_per_search) as stubs:
+        _configure_environment(stubs.url, tmp)
+
+        from bland import build_call_task, fetch_call_analysis, make_ai_call
+        from google_calendar import get_calendar_service
+        from knowledge_base import create_knowledge_base
+        from leads import fetch_company_details
+        from llm import get_client
+        from scheduling import create_event, extract_event_details_with_ai
+
+        # One-off client construction is startup cost, not stage latency
+        get_client()
+        service = get_calendar_service()
+        results = {}
+
+        def cycle(outputs):
+            # Later stages consume what the earlier ones produced, reusing items if some failed
+            return list(itertools.islice(itertools.cycle(outputs), iterations)) if outputs else []
+
+        knowledge_bases, results['knowledge_base'] = run_stage(
+            create_knowledge_base, [f"{stubs.url}/site/company-{i % 5}/" for i in range(iterations)], concurrency)
+        _, results['lead_search'] = run_stage(
+            fetch_company_details, [f"B2B SaaS companies hiring sales reps, batch {i}" for i in range(iterations)],
+            concurrency)
+        knowledge_base = knowledge_bases[0] if knowledge_bases else "Stub knowledge base"
+        calls, results['call'] = run_stage(
+            lambda i: _succeeded(make_ai_call("+14155550100", build_call_task(f"Stub Company {i}", knowledge_base))),
+            range(iterations), concurrency)
+        analyses, results['analysis'] = run_stage(
+            lambda call: _succeeded(fetch_call_analysis(call['call_id'])), cycle(calls), concurrency)
+        events, results['event_extraction'] = run_stage(
+            lambda analysis: extract_event_details_with_ai(analysis['answers'][-1]), cycle(analyses), concurrency)
+        _, results['calendar_insert'] = run_stage(
+            lambda event: create_event(service, event), cycle(events), concurrency)
+        for name, value in stubs.requests.items():
+            results.setdefault('requests', {})[name] = value
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for stage in STAGES:
+        current, expected = results.get(stage), baseline.get(stage)
+        if not current or not expected:
+            continue
+        if expected.get('p95') and current['p95'] > expected['p95'] * (1 + tolerance):
+            regressions.append(f"{stage}: p95 {current['p95'] * 1000:.1f} ms vs baseline {expected['p95'] * 1000:.1f} ms")
+        if expected.get('throughput') and current['throughput'] < expected['throughput'] / (1 + tolerance):
+            regressions.append(f"{stage}: {current['throughput']:.2f}/s vs baseline {expected['throughput']:.2f}/s")
+    return regressions
+
+
+def _per_service(values, cast, default):
+    """Parse repeated ``service=value`` (or bare ``value`` for every service) options."""
+    settings = {service: default for service in SERVICES}
+    for value in values or []:
+        service, _, amount = value.rpartition('=')
+        if service and service not in SERVICES:
+            raise SystemExit(f"Unknown service {service!r}; expected one of {', '.join(SERVICES)}")
+        for name in ([service] if service else SERVICES):
+            settings[name] = cast(amount)
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--companies', type=int, default=5, help='companies returned by each lead search')
+    parser.add_argument('--latency', action='append', help='mean stub latency in seconds, [service=]value')
+    parser.add_argument('--error-rate', action='append', help='fraction of stub requests failing with 503, [service=]value')
+    parser.add_argument('--payload-bytes', action='append', help='size of free text in stub responses, [service=]value')
+    parser.add_argument('--baseline', help='fail if slower than the results stored in this file')
+    parser.add_argument('--save-baseline', help='store the results in this file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown as a fraction of the baseline')
+    args = parser.parse_args()
+
+    latency = _per_service(args.latency, float, 0.05)
+    error_rate = _per_service(args.error_rate, float, 0.0)
+    payload_bytes = _per_service(args.payload_bytes, int, 2000)
+    configs = {service: StubConfig(latency[service], error_rate=error_rate[service], payload_bytes=payload_bytes[service])
+               for service in SERVICES}
+
+    results = measure(args.iterations, args.concurrency, configs, args.companies)
+    print(f"{'stage':18s} {'n':>4s} {'errors':>6s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'per s':>8s}")
+    for stage in STAGES:
+        r = results[stage]
+        print(f"{stage:18s} {r['n']:4d} {r['errors']:6d} {r['p50'] * 1000:9.1f} {r['p95'] * 1000:9.1f} "
+              f"{r['p99'] * 1000:9.1f} {r['throughput']:8.2f}")
+        if r['first_error']:
+            print(f"{'':18s} first error: {r['first_error']}")
+    print("stub requests: " + ", ".join(f"{name} {count}" for name, count in results['requests'].items()))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({stage: results[stage] for stage in STAGES}, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Pipeline regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
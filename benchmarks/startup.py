@@ -0,0 +1,125 @@
+"""Cold-start and rerun timings for app.py.
+
+Each cold measurement runs in a fresh interpreter so module imports are
+paid again, and the app is driven with Streamlit's AppTest harness so no
+server or browser is needed. Typical use:
+
+    python benchmarks/startup.py --save-baseline benchmarks/startup_baseline.json
+    python benchmarks/startup.py --baseline benchmarks/startup_baseline.json
+
+The second form exits non-zero when a median is slower than the baseline
+by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencies app.py used to import at module top
+HEAVY_MODULES = ['pandas', 'together', 'googleapiclient.discovery', 'google_auth_oauthlib.flow', 'requests']
+
+_APP_RUN = """
+import json, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file('app.py', default_timeout=120)
+at.run()
+t2 = time.perf_counter()
+at.run()
+t3 = time.perf_counter()
+at.session_state['step'] = 3
+at.run()
+t4 = time.perf_counter()
+at.run()
+t5 = time.perf_counter()
+errors = [e.value for e in at.exception]
+print(json.dumps({
+    'streamlit_import_s': t1 - t0,
+    'step1_first_run_s': t2 - t1,
+    'step1_rerun_s': t3 - t2,
+    'step3_first_run_s': t4 - t3,
+    'step3_rerun_s': t5 - t4,
+    'errors': errors,
+}))
+"""
+
+_IMPORT_RUN = """
+import time
+t = time.perf_counter()
+import {module}
+print(time.perf_counter() - t)
+"""
+
+
+def _env(tmp):
+    env = dict(os.environ)
+    # Placeholders so the app starts without real credentials; nothing is called
+    env.setdefault('TOGETHER_API_KEY', 'benchmark')
+    env.setdefault('GOOGLE_APPLICATION_CREDENTIALS', os.path.join(ROOT, 'credentials.json'))
+    env['LEAD_DB_PATH'] = os.path.join(tmp, 'salesbuddy.db')
+    env['LLM_CACHE_PATH'] = os.path.join(tmp, 'llm_cache.sqlite')
+    return env
+
+
+def _python(code, env):
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def measure(runs):
+    samples = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(tmp)
+        for _ in range(runs):
+            result = json.loads(_python(_APP_RUN, env))
+            if result.pop('errors'):
+                raise RuntimeError(f"app.py raised while benchmarking: {result}")
+            for name, value in result.items():
+                samples.setdefault(name, []).append(value)
+            for module in HEAVY_MODULES:
+                value = float(_python(_IMPORT_RUN.format(module=module), env))
+                samples.setdefault(f'import {module}_s', []).append(value)
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, value in results.items():
+        expected = baseline.get(name)
+        if expected and name.startswith('step') and value > expected * (1 + tolerance):
+            regressions.append(f"{name}: {value:.3f}s vs baseline {expected:.3f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--baseline', help='fail if slower than the timings stored in this file')
+    parser.add_argument('--save-baseline', help='store the timings in this file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown as a fraction of the baseline')
+    args = parser.parse_args()
+
+    results = measure(args.runs)
+    for name, value in results.items():
+        print(f"{name:40s} {value * 1000:9.1f} ms")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Startup regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
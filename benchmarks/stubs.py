@@ -0,0 +1,251 @@
+"""Local stand-ins for the Together, Bland and Google Calendar HTTP APIs and company websites.
+
+Only the endpoints the app uses are implemented, with response bodies shaped
+like the real ones. Company sites live under ``/site/<name>/`` and answer
+conditional GETs with 304 like a real web server. Every service has its own latency, error rate and
+payload size so a benchmark can model a slow LLM or a flaky telephony API.
+"""
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SERVICES = ('together', 'bland', 'calendar', 'web')
+SITE_PAGES = ('', 'about', 'product', 'pricing', 'customers')
+
+
+class StubConfig:
+    """Behaviour of one stubbed service.
+
+    ``latency`` is the mean response time in seconds, jittered by
+    ``jitter`` either way; ``error_rate`` is the fraction of requests
+    answered with a retryable 503; ``payload_bytes`` sizes the free text in
+    responses (knowledge bases, call summaries).
+    """
+
+    def __init__(self, latency=0.05, jitter=0.5, error_rate=0.0, payload_bytes=2000):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.payload_bytes = payload_bytes
+
+    def delay(self):
+        return max(0.0, self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+def filler(size):
+    words = itertools.cycle("our platform helps revenue teams automate outreach qualify leads and book meetings".split())
+    text = []
+    length = 0
+    while length < size:
+        word = next(words)
+        text.append(word)
+        length += len(word) + 1
+    return " ".join(text)
+
+
+class StubServer:
+    """Threaded HTTP server answering for all three services on one port."""
+
+    def __init__(self, configs=None, companies_per_search=5, host='127.0.0.1', port=0):
+        self.configs = {service: StubConfig() for service in SERVICES}
+        self.configs.update(configs or {})
+        self.companies_per_search = companies_per_search
+        self.requests = {service: 0 for service in SERVICES}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='benchmark-stubs', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _next(self):
+        with self._lock:
+            return next(self._counter)
+
+    def _count(self, service):
+        with self._lock:
+            self.requests[service] += 1
+
+    # Responses
+
+    def completion_text(self, prompt):
+        config = self.configs['together']
+        if "Return only a JSON array with one object per company" in prompt:
+            batch = self._next()
+            # Fresh names every search so the lead store never short-circuits enrichment
+            return json.dumps([{"name": f"Stub Company {batch}-{i}"} for i in range(self.companies_per_search)])
+        match = re.match(r"The company (.+?) came up in a search", prompt)
+        if match:
+            n = self._next()
+            return json.dumps({
+                "name": match.group(1),
+                "linkedin": f"https://www.linkedin.com/company/stub-{n}",
+                "url": f"https://stub-{n}.example.com",
+                "size": "250",
+                "funding": "$57M",
+                "founded": "2015",
+                "head_office": "San Francisco, CA, USA",
+                "sales_dept": {"email": f"sales@stub-{n}.example.com", "phone": f"+1 415 555 {n % 10000:04d}"},
+            })
+        if "Extract event details" in prompt:
+            return json.dumps({
+                "summary": "Product demo",
+                "location": "Video call",
+                "description": filler(min(config.payload_bytes, 500)),
+                "start": {"dateTime": "2030-07-12T14:00:00-07:00", "timeZone": "America/Los_Angeles"},
+                "end": {"dateTime": "2030-07-12T14:30:00-07:00", "timeZone": "America/Los_Angeles"},
+                "attendees": [{"email": "jane@example.com"}],
+                "reminders": {"useDefault": False, "overrides": [{"method": "email", "minutes": 1440},
+                                                                 {"method": "popup", "minutes": 10}]},
+            })
+        return filler(config.payload_bytes)
+
+    def analysis(self, call_id):
+        summary = filler(self.configs['bland'].payload_bytes)
+        return {
+            "status": "success",
+            "call_id": call_id,
+            "answers": ["Jane Doe", "jane@example.com", "July 12 at 2pm", "High",
+                        f"Jane Doe (jane@example.com) agreed to a demo on July 12 at 2pm. {summary}"],
+        }
+
+    def site_page(self, site, page):
+        """HTML of one page of a stub company site, linking to the others."""
+        links = ''.join(f'<a href="/site/{site}/{name}">{name or "home"}</a>' for name in SITE_PAGES)
+        text = filler(self.configs['web'].payload_bytes)
+        return (f"<html><head><title>{site} {page or 'home'}</title></head><body><nav>{links}</nav>"
+                f"<main><h1>{site} {page}</h1><p>{text}</p></main><footer>Copyright {site}</footer></body></html>")
+
+    def calendar_event(self, body):
+        event_id = uuid.uuid4().hex
+        return dict(body, id=event_id, status="confirmed", htmlLink=f"https://calendar.example.com/event?eid={event_id}")
+
+    # HTTP plumbing
+
+    def _handler(self):
+        stubs = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def handle(self):
+                try:
+                    super().handle()
+                except ConnectionResetError:
+                    # Clients drop idle keep-alive connections when their pool closes
+                    pass
+
+            def do_GET(self):
+                self._dispatch()
+
+            def do_POST(self):
+                self._dispatch()
+
+            def log_message(self, format, *args):
+                pass
+
+            def _dispatch(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                path = self.path.split('?', 1)[0]
+                service = ('together' if path.endswith('/chat/completions')
+                           else 'calendar' if path.startswith('/calendar/')
+                           else 'web' if path.startswith('/site/') or path == '/robots.txt' else 'bland')
+                stubs._count(service)
+                config = stubs.configs[service]
+                time.sleep(config.delay())
+                if random.random() < config.error_rate:
+                    return self._json(503, {"error": "stub failure"})
+
+                if service == 'together':
+                    return self._completion(body)
+                if service == 'calendar':
+                    return self._json(200, stubs.calendar_event(body))
+                if service == 'web':
+                    return self._page(path)
+                match = re.fullmatch(r"/v1/calls/([^/]+)/analyze", path)
+                if match:
+                    return self._json(200, stubs.analysis(match.group(1)))
+                match = re.fullmatch(r"/v1/calls/([^/]+)", path)
+                if match:
+                    return self._json(200, {"call_id": match.group(1), "status": "completed", "completed": True})
+                if path == '/v1/calls':
+                    return self._json(200, {"status": "success", "call_id": uuid.uuid4().hex})
+                self._json(404, {"error": f"no stub for {path}"})
+
+            def _completion(self, body):
+                prompt = body['messages'][-1]['content']
+                text = stubs.completion_text(prompt)
+                model = body.get('model', 'stub')
+                usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4,
+                         "total_tokens": (len(prompt) + len(text)) // 4}
+                if not body.get('stream'):
+                    return self._json(200, {
+                        "id": uuid.uuid4().hex, "object": "chat.completion", "created": int(time.time()), "model": model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                        "usage": usage,
+                    })
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                for start in range(0, len(text), 64):
+                    chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                             "choices": [{"index": 0, "delta": {"content": text[start:start + 64]}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def _page(self, path):
+                match = re.fullmatch(r"/site/([^/]+)/([^/]*)", path)
+                if not match or match.group(2) not in SITE_PAGES:
+                    return self._json(404, {"error": f"no page {path}"})
+                # Pages never change, so one ETag per URL is enough to exercise revalidation
+                etag = f'"{abs(hash(path))}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                data = stubs.site_page(*match.groups()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _json(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
@@ -0,0 +1,66 @@
+"""Throughput of the resident call-transcript summarizer on CPU.
+
+Reports transcripts per second for each batch size, with and without int8
+quantization. Transcripts come from a JSON-lines file with a "transcript"
+field per line, or are generated when no file is given:
+
+    python benchmarks/summarizer.py --transcripts calls.jsonl --batch-sizes 1 8 16 --quantize
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from experiments.summarization_utils import SUMMARIZER_MODEL, SUMMARIZER_THREADS, Summarizer
+
+_LINES = [
+    "Hi, this is Oliver calling from Salesbuddy.",
+    "Who am I speaking with today?",
+    "This is Priya, I run operations here.",
+    "We are looking at tools to automate our outbound calls.",
+    "Would Thursday at 2pm work for a follow-up with our head of sales?",
+    "Thursday works, send the invite to priya@example.com.",
+    "Great, I have booked Thursday at 2pm. Thanks for your time.",
+]
+
+
+def synthetic_transcripts(count, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(_LINES) for _ in range(rng.randint(8, 40))) for _ in range(count)]
+
+
+def load_transcripts(path):
+    with open(path) as f:
+        return [json.loads(line)["transcript"] for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--transcripts', help='JSON-lines file of transcripts')
+    parser.add_argument('--count', type=int, default=64, help='number of synthetic transcripts')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--threads', type=int, default=SUMMARIZER_THREADS)
+    parser.add_argument('--model', default=SUMMARIZER_MODEL)
+    parser.add_argument('--quantize', action='store_true', help='also measure the int8 quantized model')
+    args = parser.parse_args()
+
+    texts = load_transcripts(args.transcripts) if args.transcripts else synthetic_transcripts(args.count)
+    for quantize in ([False, True] if args.quantize else [False]):
+        started = time.perf_counter()
+        summarizer = Summarizer(args.model, num_threads=args.threads, quantize=quantize)
+        print(f"model={args.model} threads={args.threads} int8={quantize} load={time.perf_counter() - started:.1f}s")
+        summarizer.summarize_batch(texts[:2])  # warm up
+        for batch_size in args.batch_sizes:
+            summarizer.batch_size = batch_size
+            started = time.perf_counter()
+            summarizer.summarize_batch(texts)
+            elapsed = time.perf_counter() - started
+            print(f"  batch={batch_size:3d}  {len(texts) / elapsed:7.2f} transcripts/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import os
+from dotenv import load_dotenv
+
+import http_client
+from knowledge_index import relevant_knowledge
+from rate_limit import acquire_call_slot
+from tracing import traced
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Get environment variables
+BLAND_API_KEY = os.getenv('BLAND_API_KEY')
+BLAND_API_URL = os.getenv('BLAND_API_URL', 'https://api.bland.ai/v1')
+
+# Call statuses after which Bland will not update the call any further
+FINISHED_CALL_STATUSES = {'completed', 'failed', 'no-answer', 'busy', 'canceled', 'error'}
+
+def _headers():
+    return {
+        'authorization': BLAND_API_KEY,
+        'Content-Type': 'application/json'
+    }
+
+def build_call_task(company_name, knowledge_base, lead=None):
+    # Only the sections relevant to this lead go into the prompt, not the whole knowledge base
+    knowledge_base = relevant_knowledge(knowledge_base, company_name, lead)
+    return f"""
+                You are calling a salesperson at {company_name}. Your goal is introduce your company and schedule a follow-up conversation.
+                Use the following knowledge base for reference: {knowledge_base}
+                Call Flow:
+                    Introduce yourself as Oliver and say you are calling from the company mentioned in knowledge base.
+                    Introduce in 1 line about your company's offerings.
+                    Ask who you are talking to and what their company needs are.
+                    Say you are trying to schedule a follow-up conversation with your head of sales.
+                    If they need to reschedule, offer some alternate time slots later in the week.
+                    Get their name, and email id in order to send a calendar invite.
+                    Once the new time and date is confirmed or the original time and date is reconfirmed, thank him and provide your email if he needs to get in touch.
+                    Be polite, respectful, and try not to speak too much.
+                """
+
+@traced('bland.call', 'bland')
+def make_ai_call(phone_number, task, knowledge_base=None, voice='mason', language='eng', webhook=None):
+    data = {
+        'phone_number': phone_number,
+        'task': task,
+        'voice': voice,
+        'language': language,
+        'record': True,
+        'reduce_latency': True,
+        'amd': True
+    }
+    if knowledge_base:
+        # The task already carries the relevant sections; only send the text again when asked to
+        data['request_data'] = {'knowledge_base': knowledge_base}
+    if webhook:
+        # Bland POSTs the finished call to this URL as soon as it ends
+        data['webhook'] = webhook
+    # Retrying a call that Bland may already have placed would dial the lead twice
+    response = http_client.post(f'{BLAND_API_URL}/calls', json=data, headers=_headers(), idempotent=False, provider='bland')
+    return response.json()
+
+def place_call(store, company_name, phone_number, task, cancelled=None, **kwargs):
+    """Place a call with :func:`make_ai_call` while holding one of the account's live-call slots.
+
+    The call is recorded in ``store`` and keeps the slot until the store
+    marks it finished; a call that is not placed frees the slot at once.
+    Returns Bland's response, or None if ``cancelled`` was set while waiting.
+    """
+    slot_id = acquire_call_slot(store, cancelled=cancelled)
+    if slot_id is None:
+        return None
+    try:
+        response = make_ai_call(phone_number, task, **kwargs)
+    except BaseException:
+        store.release_call_slot(slot_id)
+        raise
+    if response.get('status') != 'success' or not response.get('call_id'):
+        store.release_call_slot(slot_id)
+        return response
+    store.record_call(response['call_id'], company_name)
+    store.bind_call_slot(slot_id, response['call_id'])
+    return response
+
+@traced('bland.call_details', 'bland')
+def get_call_details(call_id):
+    response = http_client.get(f'{BLAND_API_URL}/calls/{call_id}', headers=_headers(), provider='bland')
+    response.raise_for_status()
+    return response.json()
+
+def is_call_finished(call_details):
+    if call_details.get('completed'):
+        return True
+    return str(call_details.get('status', '')).lower() in FINISHED_CALL_STATUSES
+
+@traced('bland.analyze', 'bland')
+def fetch_call_analysis(call_id):
+    url = f"{BLAND_API_URL}/calls/{call_id}/analyze"
+
+    payload = {
+        "goal": "Extract the contact name, email address, meeting time, buying intent, and provide a summary of the call.",
+        "questions": [
+            ["What is the contact name?", "string"],
+            ["What is the email address?", "string"],
+            ["What is the meeting time?", "string"],
+            ["What is the buying intent?", "string"],
+            ["Provide a summary of the call that includes name, email of the callee, and scheduled meeting time and date.", "string"]
+        ]
+    }
+
+    response = http_client.post(url, json=payload, headers=_headers(), provider='bland')
+
+    if response.status_code == 200:
+        return response.json()
+    else:
+        return {
+            'error': f"Failed to analyze call. Status code: {response.status_code}",
+            'details': response.text
+        }
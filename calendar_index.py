@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from http_client import HTTP_MAX_RETRIES
+from rate_limit import throttle
+from tracing import span
+
+CALENDAR_INDEX_PATH = os.getenv('CALENDAR_INDEX_PATH', os.path.join('.cache', 'calendar_index.sqlite'))
+# A full sync only pulls events from this many days back; older ones cannot conflict
+CALENDAR_SYNC_LOOKBACK_DAYS = int(os.getenv('CALENDAR_SYNC_LOOKBACK_DAYS', '1'))
+
+
+def event_timestamp(when):
+    """Epoch seconds for a Calendar ``start``/``end`` object, all-day dates included."""
+    if 'dateTime' in when:
+        return datetime.fromisoformat(when['dateTime'].replace('Z', '+00:00')).timestamp()
+    # All-day events are stored as local-midnight dates; treat them as UTC days
+    return datetime.fromisoformat(when['date']).replace(tzinfo=timezone.utc).timestamp()
+
+
+class CalendarIndex:
+    """Local free/busy index of a Google Calendar, kept current with sync tokens.
+
+    The first ``sync`` lists upcoming events once; every later one fetches
+    only the events changed since the stored sync token, usually a single
+    small page. Conflict checks are then answered from SQLite without any
+    Calendar reads.
+    """
+
+    def __init__(self, path=CALENDAR_INDEX_PATH, calendar_id='primary'):
+        self.path = path
+        self.calendar_id = calendar_id
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS busy (
+                    calendar_id TEXT NOT NULL,
+                    event_id TEXT NOT NULL,
+                    start_ts REAL NOT NULL,
+                    end_ts REAL NOT NULL,
+                    summary TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (calendar_id, event_id)
+                );
+                CREATE INDEX IF NOT EXISTS busy_start ON busy (calendar_id, start_ts);
+
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    calendar_id TEXT PRIMARY KEY,
+                    sync_token TEXT,
+                    synced_at REAL NOT NULL
+                );
+            """)
+
+    def _connect(self):
+        # sqlite3 connections cannot be shared between threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def sync_token(self):
+        with self._connect() as conn:
+            row = conn.execute("SELECT sync_token FROM sync_state WHERE calendar_id = ?", (self.calendar_id,)).fetchone()
+        return row[0] if row else None
+
+    def sync(self, service, http=None):
+        """Apply the changes since the last sync; returns the number of events received."""
+        from googleapiclient.errors import HttpError
+
+        with self._sync_lock:
+            token = self.sync_token()
+            try:
+                return self._sync(service, http, token)
+            except HttpError as e:
+                # 410 Gone: the token expired, start over with a full sync
+                if token is None or e.resp.status != 410:
+                    raise
+                self.clear()
+                return self._sync(service, http, None)
+
+    def _sync(self, service, http, token):
+        params = {'calendarId': self.calendar_id, 'singleEvents': True, 'showDeleted': True, 'maxResults': 2500}
+        if token:
+            params['syncToken'] = token
+        else:
+            since = datetime.now(timezone.utc) - timedelta(days=CALENDAR_SYNC_LOOKBACK_DAYS)
+            params['timeMin'] = since.isoformat()
+        received = 0
+        page_token = None
+        while True:
+            if page_token:
+                params['pageToken'] = page_token
+            with span('google.events.list', 'google', incremental=bool(token)), throttle('google'):
+                response = service.events().list(**params).execute(http=http, num_retries=HTTP_MAX_RETRIES)
+            items = response.get('items', [])
+            received += len(items)
+            self.apply(items)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO sync_state (calendar_id, sync_token, synced_at) VALUES (?, ?, ?)
+                ON CONFLICT(calendar_id) DO UPDATE SET sync_token = excluded.sync_token, synced_at = excluded.synced_at
+            """, (self.calendar_id, response.get('nextSyncToken'), time.time()))
+        return received
+
+    def apply(self, events):
+        """Fold changed events into the index; cancelled and free events are removed."""
+        upserts, deletes = [], []
+        for event in events:
+            busy = (event.get('status') != 'cancelled' and event.get('transparency') != 'transparent'
+                    and 'start' in event and 'end' in event)
+            if busy:
+                upserts.append((self.calendar_id, event['id'], event_timestamp(event['start']), event_timestamp(event['end']),
+                                event.get('summary', '')))
+            else:
+                deletes.append((self.calendar_id, event['id']))
+        with self._connect() as conn:
+            conn.executemany("""
+                INSERT INTO busy (calendar_id, event_id, start_ts, end_ts, summary) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(calendar_id, event_id) DO UPDATE SET
+                    start_ts = excluded.start_ts, end_ts = excluded.end_ts, summary = excluded.summary
+            """, upserts)
+            conn.executemany("DELETE FROM busy WHERE calendar_id = ? AND event_id = ?", deletes)
+
+    def conflicts(self, start, end):
+        """Busy events overlapping ``[start, end)``, given as aware datetimes or Calendar time objects."""
+        start_ts = start.timestamp() if isinstance(start, datetime) else event_timestamp(start)
+        end_ts = end.timestamp() if isinstance(end, datetime) else event_timestamp(end)
+        with self._connect() as conn:
+            rows = conn.execute("""
+                SELECT event_id, start_ts, end_ts, summary FROM busy
+                WHERE calendar_id = ? AND start_ts < ? AND end_ts > ?
+                ORDER BY start_ts
+            """, (self.calendar_id, end_ts, start_ts)).fetchall()
+        return [{'id': row[0], 'start': row[1], 'end': row[2], 'summary': row[3]} for row in rows]
+
+    def is_free(self, start, end):
+        return not self.conflicts(start, end)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM busy WHERE calendar_id = ?", (self.calendar_id,))
+            conn.execute("DELETE FROM sync_state WHERE calendar_id = ?", (self.calendar_id,))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_calendar_index(calendar_id='primary'):
+    with _indexes_lock:
+        if calendar_id not in _indexes:
+            _indexes[calendar_id] = CalendarIndex(calendar_id=calendar_id)
+        return _indexes[calendar_id]
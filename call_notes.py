@@ -0,0 +1,26 @@
+import re
+
+from bland import get_call_details
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+def analyze_call_locally(call_id):
+    """Summarize a finished call with the resident local model instead of Bland's /analyze.
+
+    Returns the same shape as ``fetch_call_analysis``; only the email address
+    and the summary can be answered without an LLM, the other answers are empty.
+    """
+    from experiments.summarization_utils import get_summarizer
+
+    transcript = get_call_details(call_id).get('concatenated_transcript') or ''
+    if not transcript.strip():
+        return {'error': "Failed to analyze call. No transcript available.", 'details': ''}
+
+    # Queued so calls that end together are summarized in one batch
+    summary = get_summarizer().submit(transcript).result()
+    emails = EMAIL_PATTERN.findall(transcript)
+    return {
+        'status': 'success',
+        'answers': ['', emails[-1] if emails else '', '', '', summary],
+        'source': 'local',
+    }
@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bland import fetch_call_analysis, get_call_details, is_call_finished
+
+# Polling starts quickly so short calls are picked up fast, then backs off for long calls
+CALL_POLL_INTERVAL = float(os.getenv('CALL_POLL_INTERVAL', '5'))
+CALL_POLL_MAX_INTERVAL = float(os.getenv('CALL_POLL_MAX_INTERVAL', '30'))
+CALL_POLL_BACKOFF = float(os.getenv('CALL_POLL_BACKOFF', '1.5'))
+CALL_POLL_MAX_ERRORS = int(os.getenv('CALL_POLL_MAX_ERRORS', '10'))
+
+
+class _TrackedCall:
+    def __init__(self, call_id, on_complete):
+        self.call_id = call_id
+        self.on_complete = on_complete
+        self.interval = CALL_POLL_INTERVAL
+        self.next_poll = time.monotonic() + self.interval
+        self.errors = 0
+        self.started = time.time()
+
+
+class CallTracker:
+    """Tracks in-flight Bland calls and fetches their analysis as soon as they end.
+
+    Completion is detected either by polling the call status with an adaptive
+    backoff or by a Bland webhook hitting the optional local webhook server.
+    Results are kept by call ID until the session collects them. With an
+    ``analysis_queue`` finished calls go through the durable queue instead
+    of the in-memory pool, so their analyses are persisted even if nobody
+    collects them. A call whose status cannot be polled any more is
+    recorded as failed in the lead ``store``, so it does not stay in
+    progress there forever.
+    """
+
+    def __init__(self, get_details=get_call_details, analyze=fetch_call_analysis, analysis_workers=4,
+                 analysis_queue=None, store=None):
+        self._get_details = get_details
+        self._analyze = analyze
+        self._analysis_queue = analysis_queue
+        self._lead_store = store
+        self._calls = {}
+        self._results = {}
+        self._cond = threading.Condition()
+        self._analysis_pool = ThreadPoolExecutor(max_workers=analysis_workers, thread_name_prefix='call-analysis')
+        self._webhook_server = None
+        self._stopped = False
+        self._thread = threading.Thread(target=self._poll_loop, name='call-tracker', daemon=True)
+        self._thread.start()
+
+    def track(self, call_id, on_complete=None):
+        with self._cond:
+            if call_id not in self._calls and call_id not in self._results:
+                self._calls[call_id] = _TrackedCall(call_id, on_complete)
+            self._cond.notify_all()
+
+    def pending(self):
+        with self._cond:
+            return list(self._calls)
+
+    def result(self, call_id):
+        with self._cond:
+            return self._results.get(call_id)
+
+    def pop_result(self, call_id):
+        with self._cond:
+            return self._results.pop(call_id, None)
+
+    def wait(self, call_ids, timeout=None):
+        """Block until any of the given calls has a result or the timeout expires."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not any(call_id in self._results for call_id in call_ids):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return {call_id: self._results[call_id] for call_id in call_ids if call_id in self._results}
+
+    def wait_for(self, call_id, timeout=None):
+        return self.wait([call_id], timeout).get(call_id)
+
+    def mark_finished(self, call_id, details=None):
+        """Hand a finished call straight to analysis, e.g. from a completion webhook."""
+        with self._cond:
+            call = self._calls.pop(call_id, None)
+        if call is None:
+            return
+        if self._lead_store is not None:
+            # The call has ended, so its live-call slot is free even while the analysis is pending
+            self._lead_store.release_call_slot(call_id=call_id)
+        details = details or {}
+        if self._analysis_queue is not None:
+            self._analysis_queue.enqueue(
+                call_id, details, on_complete=lambda call_id, analysis: self._store(call, self._result(call, details, analysis))
+            )
+        else:
+            self._analysis_pool.submit(self._finish, call, details)
+
+    def start_webhook_server(self, host='0.0.0.0', port=8765):
+        if self._webhook_server is not None:
+            return self._webhook_server
+        tracker = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except json.JSONDecodeError:
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                call_id = payload.get('call_id')
+                if call_id:
+                    tracker.mark_finished(call_id, payload)
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._webhook_server = ThreadingHTTPServer((host, port), WebhookHandler)
+        threading.Thread(target=self._webhook_server.serve_forever, name='call-webhook', daemon=True).start()
+        return self._webhook_server
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._webhook_server is not None:
+            self._webhook_server.shutdown()
+        self._analysis_pool.shutdown(wait=False)
+
+    def _poll_loop(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                now = time.monotonic()
+                due = [call for call in self._calls.values() if call.next_poll <= now]
+                if not due:
+                    next_poll = min((call.next_poll for call in self._calls.values()), default=None)
+                    self._cond.wait(None if next_poll is None else next_poll - now)
+                    continue
+            for call in due:
+                self._poll(call)
+
+    def _poll(self, call):
+        try:
+            details = self._get_details(call.call_id)
+        except Exception as e:
+            call.errors += 1
+            if call.errors >= CALL_POLL_MAX_ERRORS:
+                with self._cond:
+                    self._calls.pop(call.call_id, None)
+                analysis = {'error': f"Failed to poll call status: {e}", 'details': ''}
+                if self._lead_store is not None:
+                    # Nothing else will ever finish this call in the store
+                    self._lead_store.save_analysis(call.call_id, analysis, 'failed')
+                self._store(call, {
+                    'status': 'failed',
+                    'details': {},
+                    'analysis': analysis,
+                    'duration': time.time() - call.started,
+                })
+                return
+            details = None
+        if details is not None and is_call_finished(details):
+            self.mark_finished(call.call_id, details)
+            return
+        call.interval = min(call.interval * CALL_POLL_BACKOFF, CALL_POLL_MAX_INTERVAL)
+        call.next_poll = time.monotonic() + call.interval
+
+    def _finish(self, call, details):
+        try:
+            analysis = self._analyze(call.call_id)
+        except Exception as e:
+            analysis = {'error': f"Failed to analyze call: {e}", 'details': ''}
+        self._store(call, self._result(call, details, analysis))
+
+    def _result(self, call, details, analysis):
+        return {
+            'status': details.get('status', 'completed'),
+            'details': details,
+            'analysis': analysis,
+            'duration': time.time() - call.started,
+        }
+
+    def _store(self, call, result):
+        with self._cond:
+            self._results[call.call_id] = result
+            self._cond.notify_all()
+        if call.on_complete is not None:
+            call.on_complete(call.call_id, result)
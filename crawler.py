@@ -0,0 +1,318 @@
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urldefrag, urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from http_client import AsyncHttpClient
+from tracing import span
+
+CRAWL_CACHE_PATH = os.getenv('CRAWL_CACHE_PATH', os.path.join('.cache', 'page_cache.sqlite'))
+# Pages fetched per knowledge base, the home page included
+CRAWL_MAX_PAGES = int(os.getenv('CRAWL_MAX_PAGES', '12'))
+# Simultaneous requests to any one host
+CRAWL_PER_HOST = int(os.getenv('CRAWL_PER_HOST', '4'))
+# Larger responses are cut off; marketing pages rarely need more
+CRAWL_MAX_PAGE_BYTES = int(os.getenv('CRAWL_MAX_PAGE_BYTES', str(2 * 1024 * 1024)))
+# A page that still fails after this many retries is left out of the crawl
+CRAWL_RETRIES = int(os.getenv('CRAWL_RETRIES', '1'))
+# Characters of site text handed to the knowledge base prompt
+CRAWL_CONTEXT_CHARS = int(os.getenv('CRAWL_CONTEXT_CHARS', '6000'))
+CRAWL_USER_AGENT = os.getenv('CRAWL_USER_AGENT', 'SalesbuddyBot/1.0 (+knowledge base builder)')
+
+# Links whose path mentions one of these are crawled first, in this order
+PRIORITY_TERMS = ('about', 'product', 'solution', 'platform', 'feature', 'pricing', 'customer', 'use-case',
+                  'case-stud', 'industr', 'company', 'integration', 'security', 'service')
+# Paths that never describe the company
+SKIP_PATHS = re.compile(r"/(login|signin|sign-in|signup|sign-up|register|cart|checkout|account|privacy|terms|legal|cookie)"
+                        r"|\.(pdf|jpe?g|png|gif|svg|webp|zip|mp4|mp3|css|js|xml|json)$", re.I)
+# Elements that hold navigation or chrome rather than content
+BOILERPLATE_TAGS = ('script', 'style', 'noscript', 'template', 'svg', 'iframe', 'form', 'nav', 'header', 'footer',
+                    'aside', 'button', 'select')
+BLOCK_TAGS = ('p', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'td', 'th', 'dd', 'dt', 'blockquote', 'figcaption', 'pre')
+
+
+class PageCache:
+    """Extracted page content with its validators, so recrawls are mostly 304s.
+
+    Only the condensed text, title and links are stored, not the raw HTML,
+    together with the ETag and Last-Modified the server sent for the page.
+    """
+
+    def __init__(self, path=CRAWL_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT NOT NULL DEFAULT '',
+                    last_modified TEXT NOT NULL DEFAULT '',
+                    title TEXT NOT NULL DEFAULT '',
+                    text TEXT NOT NULL DEFAULT '',
+                    links TEXT NOT NULL DEFAULT '[]',
+                    fetched_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        # sqlite3 connections cannot be shared between threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, url):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        page = dict(row)
+        page['links'] = json.loads(page['links'])
+        return page
+
+    def set(self, url, page, etag='', last_modified=''):
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO pages (url, etag, last_modified, title, text, links, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (url, etag or '', last_modified or '', page['title'], page['text'], json.dumps(page['links']),
+                  time.time()))
+
+    def touch(self, url):
+        with self._connect() as conn:
+            conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pages")
+
+
+def _host(url):
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+def normalize_url(url, base=None):
+    url = urldefrag(urljoin(base, url) if base else url)[0].strip()
+    if '//' not in url:
+        url = 'https://' + url
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        return None
+    path = parts.path or '/'
+    return f"{parts.scheme}://{parts.netloc.lower()}{path}" + (f"?{parts.query}" if parts.query else '')
+
+def extract_page(html, url):
+    """Title, main-content text and same-site links of an HTML page.
+
+    Navigation, headers, footers and scripts are dropped; if the page marks
+    its main content (``<main>``, ``<article>``, ``role="main"``) only that
+    is kept. Text is gathered per block element so paragraphs stay apart.
+    """
+    import lxml.html
+
+    try:
+        doc = lxml.html.document_fromstring(html)
+    except Exception:
+        return {'title': '', 'text': '', 'links': []}
+
+    links = []
+    site = _host(url)
+    for href in doc.xpath('//a/@href'):
+        link = normalize_url(href, url)
+        if link and _host(link) == site and not SKIP_PATHS.search(urlsplit(link).path):
+            links.append(link)
+
+    title = ' '.join(doc.xpath('string(//title)').split())
+    description = doc.xpath('//meta[@name="description"]/@content')
+    for element in doc.xpath('//' + ' | //'.join(BOILERPLATE_TAGS)):
+        element.drop_tree()
+    roots = doc.xpath('//main | //article | //*[@role="main"]') or doc.xpath('//body') or [doc]
+    # Nested matches (an article inside main) would repeat their text
+    roots = [root for root in roots if not any(other is not root and root in other.iterdescendants() for other in roots)]
+
+    blocks = [' '.join(description[0].split())] if description else []
+    for root in roots:
+        elements = root.xpath('.//' + ' | .//'.join(BLOCK_TAGS))
+        if not elements:
+            elements = [root]
+        for element in elements:
+            # Only the innermost blocks, so a list item's paragraph is not read twice
+            if any(child.tag in BLOCK_TAGS for child in element.iterdescendants()):
+                continue
+            text = ' '.join(element.text_content().split())
+            if len(text) > 2:
+                blocks.append(text)
+    return {'title': title, 'text': '\n'.join(dict.fromkeys(blocks)), 'links': list(dict.fromkeys(links))}
+
+def _priority(url):
+    path = urlsplit(url).path.lower()
+    for rank, term in enumerate(PRIORITY_TERMS):
+        if term in path:
+            return rank
+    return len(PRIORITY_TERMS) + path.count('/')
+
+
+class SiteCrawler:
+    """Fetches the most informative pages of one website concurrently.
+
+    The home page is fetched first, then its same-site links in order of
+    how likely they describe the company (about, products, pricing, ...),
+    at most ``per_host`` at a time and ``max_pages`` in total. Every page is
+    revalidated against :class:`PageCache` with If-None-Match and
+    If-Modified-Since, so an unchanged site costs only 304 responses.
+    robots.txt is honoured.
+    """
+
+    def __init__(self, cache=None, max_pages=CRAWL_MAX_PAGES, per_host=CRAWL_PER_HOST):
+        self.cache = cache or get_page_cache()
+        self.max_pages = max_pages
+        self.per_host = per_host
+        self.fetched = 0
+        self.not_modified = 0
+        self.failed = 0
+
+    async def _fetch(self, client, url):
+        import aiohttp
+
+        cached = self.cache.get(url)
+        headers = {}
+        if cached is not None:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        try:
+            response = await client.get(url, headers=headers, allow_redirects=True, max_bytes=CRAWL_MAX_PAGE_BYTES)
+            if response.status_code == 304 and cached is not None:
+                self.not_modified += 1
+                self.cache.touch(url)
+                return cached
+            if response.status_code != 200 or 'html' not in response.headers.get('Content-Type', 'text/html'):
+                self.failed += 1
+                return None
+            html = response.text
+            etag, last_modified = response.headers.get('ETag', ''), response.headers.get('Last-Modified', '')
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeError, LookupError):
+            self.failed += 1
+            return None
+        self.fetched += 1
+        page = await asyncio.to_thread(extract_page, html, url)
+        self.cache.set(url, page, etag, last_modified)
+        return page
+
+    async def _robots(self, client, root):
+        import aiohttp
+
+        parser = RobotFileParser()
+        try:
+            response = await client.get(urljoin(root, '/robots.txt'))
+            lines = response.text.splitlines() if response.status_code == 200 else []
+        except (aiohttp.ClientError, asyncio.TimeoutError, LookupError):
+            lines = []
+        parser.parse(lines)
+        return parser
+
+    async def crawl(self, url):
+        """Return ``[(url, page)]`` for the crawled pages, home page first."""
+        root = normalize_url(url)
+        if root is None:
+            return []
+        async with AsyncHttpClient(limit_per_host=self.per_host, retries=CRAWL_RETRIES,
+                                   headers={'User-Agent': CRAWL_USER_AGENT}) as client:
+            robots = await self._robots(client, root)
+            home = await self._fetch(client, root)
+            if home is None:
+                return []
+            pages = [(root, home)]
+            seen = {root}
+            frontier = sorted((link for link in home['links'] if link not in seen), key=_priority)
+            semaphore = asyncio.Semaphore(self.per_host)
+
+            async def fetch(link):
+                async with semaphore:
+                    return link, await self._fetch(client, link)
+
+            # Breadth-first by level; each level is fetched concurrently, best links first
+            while frontier and len(pages) < self.max_pages:
+                batch = []
+                for link in frontier:
+                    if link not in seen and robots.can_fetch(CRAWL_USER_AGENT, link):
+                        seen.add(link)
+                        batch.append(link)
+                    if len(batch) >= self.max_pages - len(pages):
+                        break
+                results = await asyncio.gather(*(fetch(link) for link in batch))
+                pages += [(link, page) for link, page in results if page is not None]
+                frontier = sorted({link for _, page in results if page for link in page['links']} - seen, key=_priority)
+        return pages[:self.max_pages]
+
+
+def condense(pages, max_chars=CRAWL_CONTEXT_CHARS):
+    """Join crawled pages into one compact context of at most ``max_chars``.
+
+    Lines repeated across pages (menus, cookie banners, footers that
+    escaped extraction) are kept only once, and every page gets an equal
+    share of the budget that smaller pages leave unused.
+    """
+    seen = set()
+    bodies = []
+    for url, page in pages:
+        lines = []
+        for line in page['text'].splitlines():
+            key = line.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            lines.append(line)
+        if lines:
+            bodies.append((f"## {page['title'] or url}\nSource: {url}", '\n'.join(lines)))
+
+    sections = []
+    remaining = max_chars
+    for i, (heading, body) in enumerate(bodies):
+        share = remaining // (len(bodies) - i) - len(heading) - 2
+        if share <= 0:
+            break
+        if len(body) > share:
+            body = body[:share - 4].rsplit(' ', 1)[0] + ' ...'
+        section = f"{heading}\n{body}"
+        sections.append(section)
+        remaining -= len(section) + 2
+    return '\n\n'.join(sections)
+
+def crawl_site(url, max_pages=CRAWL_MAX_PAGES, per_host=CRAWL_PER_HOST, cache=None):
+    crawler = SiteCrawler(cache, max_pages, per_host)
+    with span('web.crawl', 'web', url=url) as crawl:
+        pages = asyncio.run(crawler.crawl(url))
+        crawl.set(pages=len(pages), fetched=crawler.fetched, not_modified=crawler.not_modified, failed=crawler.failed)
+    return pages
+
+def site_context(url, max_chars=CRAWL_CONTEXT_CHARS):
+    """Condensed text of the company's website, or an empty string if it cannot be crawled."""
+    try:
+        return condense(crawl_site(url), max_chars)
+    except Exception:
+        return ''
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_page_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PageCache()
+        return _cache
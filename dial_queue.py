@@ -0,0 +1,131 @@
+import heapq
+import itertools
+import os
+import re
+from datetime import datetime, time as dtime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from timezones import timezone_for_location
+
+# Local hours in which prospects are called, as comma-separated HH:MM-HH:MM ranges
+DIAL_WINDOWS = os.getenv('DIAL_WINDOWS', '09:00-12:00,13:30-17:00')
+# Local weekdays on which prospects are called, Monday = 0
+DIAL_WEEKDAYS = frozenset(int(day) for day in os.getenv('DIAL_WEEKDAYS', '0,1,2,3,4').split(',') if day.strip())
+
+
+def parse_windows(spec):
+    """Parse ``"09:00-12:00,13:30-17:00"`` into sorted ``(start, end)`` time pairs."""
+    windows = []
+    for part in spec.split(','):
+        match = re.fullmatch(r"\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*", part)
+        if not match:
+            raise ValueError(f"Invalid calling window {part!r}; expected HH:MM-HH:MM")
+        h1, m1, h2, m2 = (int(group) for group in match.groups())
+        start, end = dtime(h1, m1), dtime(h2, m2) if (h2, m2) != (24, 0) else dtime.max
+        if end <= start:
+            raise ValueError(f"Calling window {part!r} ends before it starts")
+        windows.append((start, end))
+    return sorted(windows)
+
+def next_window(now, time_zone, windows, weekdays=DIAL_WEEKDAYS):
+    """The first calling window open at or after ``now`` in ``time_zone``, as UTC ``(opens, closes)``.
+
+    ``opens`` is ``now`` itself when a window is open already. Returns None
+    if no window opens within the next week (e.g. no weekdays allowed).
+    """
+    zone = ZoneInfo(time_zone)
+    local_now = now.astimezone(zone)
+    for days in range(8):
+        day = local_now.date() + timedelta(days=days)
+        if day.weekday() not in weekdays:
+            continue
+        for start, end in windows:
+            opens = datetime.combine(day, start, zone)
+            closes = datetime.combine(day, end, zone)
+            if closes <= local_now:
+                continue
+            return max(opens, local_now).astimezone(timezone.utc), closes.astimezone(timezone.utc)
+    return None
+
+
+class DialQueue:
+    """Leads waiting to be dialed, released only inside their local calling hours.
+
+    Each lead's ``Head Office Location`` is resolved to a timezone offline.
+    Leads sit in a heap ordered by when their next window opens; once open
+    they move to a second heap ordered by when that window closes, so the
+    lead about to drop out of business hours is dialed first and the calls
+    spread across the day as the windows roll from east to west.
+    """
+
+    def __init__(self, windows=DIAL_WINDOWS, weekdays=DIAL_WEEKDAYS):
+        self.windows = parse_windows(windows) if isinstance(windows, str) else list(windows)
+        self.weekdays = frozenset(weekdays)
+        self._waiting = []
+        self._ready = []
+        self._order = itertools.count()
+        self._release = {}
+        self._expired = []
+
+    def __len__(self):
+        return len(self._waiting) + len(self._ready)
+
+    def push(self, lead, location, now=None):
+        """Queue the hashable ``lead`` for the calling hours at ``location``; False if there are none."""
+        time_zone = timezone_for_location(location)
+        window = next_window(now or datetime.now(timezone.utc), time_zone, self.windows, self.weekdays)
+        if window is None:
+            return False
+        heapq.heappush(self._waiting, (window[0], next(self._order), window[1], time_zone, lead))
+        self._release[lead] = (window[0], time_zone)
+        return True
+
+    def pop_due(self, now=None):
+        """The queued lead whose calling window closes soonest among those open now, or None."""
+        now = now or datetime.now(timezone.utc)
+        while self._waiting and self._waiting[0][0] <= now:
+            opens, order, closes, time_zone, lead = heapq.heappop(self._waiting)
+            heapq.heappush(self._ready, (closes, order, time_zone, lead))
+        while self._ready:
+            closes, order, time_zone, lead = heapq.heappop(self._ready)
+            if closes > now:
+                self._release.pop(lead, None)
+                return lead
+            # Its window closed while it waited for a free line; try again in the next one
+            window = next_window(now, time_zone, self.windows, self.weekdays)
+            if window is None:
+                self._release.pop(lead, None)
+                self._expired.append(lead)
+            else:
+                heapq.heappush(self._waiting, (window[0], order, window[1], time_zone, lead))
+                self._release[lead] = (window[0], time_zone)
+        return None
+
+    def pop_expired(self):
+        """Return and forget the leads dropped because no calling window is left for them."""
+        expired, self._expired = self._expired, []
+        return expired
+
+    def next_release(self):
+        """When the next waiting lead's window opens, or None if none is waiting."""
+        if self._ready:
+            return datetime.now(timezone.utc)
+        return self._waiting[0][0] if self._waiting else None
+
+    def release_time(self, lead):
+        """``(opens, time_zone)`` of the window ``lead`` is waiting for, or None once released."""
+        return self._release.get(lead)
+
+    def clear(self):
+        leads = [entry[-1] for entry in self._waiting + self._ready]
+        self._waiting, self._ready, self._expired = [], [], []
+        self._release.clear()
+        return leads
+
+def is_calling_hours(location, now=None, windows=DIAL_WINDOWS, weekdays=DIAL_WEEKDAYS):
+    """Whether it is currently within calling hours at ``location``, and the local time there."""
+    time_zone = timezone_for_location(location)
+    now = now or datetime.now(timezone.utc)
+    windows = parse_windows(windows) if isinstance(windows, str) else windows
+    window = next_window(now, time_zone, windows, weekdays)
+    return window is not None and window[0] <= now, now.astimezone(ZoneInfo(time_zone))
@@ -0,0 +1,210 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from bland import build_call_task, make_ai_call, place_call
+from dial_queue import DialQueue
+from rate_limit import BATCH, BLAND_MAX_CONCURRENT_CALLS, priority
+
+# Give up waiting on a single call after this many seconds
+CAMPAIGN_CALL_TIMEOUT = float(os.getenv('CAMPAIGN_CALL_TIMEOUT', '1800'))
+
+
+class CampaignDialer:
+    """Dials a list of leads in parallel with a bounded number of simultaneous calls.
+
+    Leads wait in a :class:`DialQueue` until it is business hours at their
+    head office, and whenever a line is free the open lead whose calling
+    window closes soonest is dialed. Each worker holds its slot for the
+    whole call, from dialing until the tracker reports the analysis, so the
+    number of live calls never exceeds ``max_concurrent_calls``. With a
+    ``store`` every dial also takes one of the account's live-call slots, so
+    campaigns, single calls and batch runs together stay within Bland's cap.
+    Per-lead status and finished notes can be read at any time while the
+    campaign runs.
+    """
+
+    def __init__(self, tracker, knowledge_base, max_concurrent_calls=BLAND_MAX_CONCURRENT_CALLS,
+                 call_timeout=CAMPAIGN_CALL_TIMEOUT, webhook=None, store=None, dial_queue=None,
+                 build_task=build_call_task):
+        self._tracker = tracker
+        self._build_task = build_task
+        self._store = store
+        self._knowledge_base = knowledge_base
+        self._call_timeout = call_timeout
+        self._webhook = webhook
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._statuses = {}
+        self._notes = {}
+        self._phones = {}
+        # Leads handed to the pool whose dial has not finished, and the future running it
+        self._dialing = {}
+        self._queue = DialQueue() if dial_queue is None else dial_queue
+        self._free_lines = max_concurrent_calls
+        self._cancelled = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent_calls, thread_name_prefix='campaign-dialer')
+        self._dispatcher = None
+
+    def start(self, leads):
+        """Queue ``(company_name, phone_number, head_office_location)`` leads for dialing."""
+        with self._cond:
+            for company_name, phone_number, location in leads:
+                if company_name in self._statuses:
+                    continue
+                if not phone_number:
+                    self._statuses[company_name] = 'skipped: no phone number'
+                elif self._queue.push(company_name, location):
+                    self._phones[company_name] = phone_number
+                    self._statuses[company_name] = 'queued'
+                else:
+                    self._statuses[company_name] = 'skipped: no calling hours configured'
+            if self._dispatcher is None and len(self._queue):
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, name='campaign-dispatcher', daemon=True)
+                self._dispatcher.start()
+            self._cond.notify_all()
+
+    def cancel(self):
+        """Stop dialing queued leads; calls already in flight run to completion."""
+        self._cancelled.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        with self._cond:
+            self._queue.clear()
+            for company_name, future in self._dialing.items():
+                if future.cancelled():
+                    # Handed to the pool but never run, so it was never dialed and holds no line
+                    self._statuses[company_name] = 'cancelled'
+                    self._free_lines += 1
+            self._dialing = {k: f for k, f in self._dialing.items() if not f.cancelled()}
+            for company_name, status in self._statuses.items():
+                if status == 'queued':
+                    self._statuses[company_name] = 'cancelled'
+            self._cond.notify_all()
+
+    def statuses(self):
+        with self._lock:
+            return dict(self._statuses)
+
+    def release_times(self):
+        """Local time at which each lead still waiting for business hours will be dialed."""
+        with self._lock:
+            times = {}
+            for company_name, status in self._statuses.items():
+                release = self._queue.release_time(company_name) if status == 'queued' else None
+                if release is not None:
+                    opens, time_zone = release
+                    times[company_name] = f"{opens.astimezone(ZoneInfo(time_zone)):%a %H:%M} {time_zone}"
+            return times
+
+    def progress(self):
+        with self._lock:
+            done = sum(1 for status in self._statuses.values() if status not in ('queued', 'dialing', 'in call'))
+            return done, len(self._statuses)
+
+    def is_running(self):
+        done, total = self.progress()
+        return done < total
+
+    def has_notes(self):
+        with self._lock:
+            return bool(self._notes)
+
+    def pop_notes(self):
+        """Return and forget the call summaries finished since the last call."""
+        with self._lock:
+            notes, self._notes = self._notes, {}
+            return notes
+
+    def _set_status(self, company_name, status):
+        with self._lock:
+            self._statuses[company_name] = status
+
+    def _lead_details(self, company_name):
+        # Size and location pick the knowledge base sections that go into the call prompt
+        if self._store is None:
+            return None
+        leads = self._store.query_leads(names=[company_name])
+        return leads.iloc[0].to_dict() if len(leads) else None
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._cancelled.is_set() or not len(self._queue):
+                        self._dispatcher = None
+                        return
+                    company_name = self._queue.pop_due() if self._free_lines else None
+                    for expired in self._queue.pop_expired():
+                        self._phones.pop(expired, None)
+                        self._statuses[expired] = 'skipped: no calling window left'
+                    if company_name is not None:
+                        break
+                    if not len(self._queue):
+                        continue
+                    # Sleep until a line frees up, a lead is added or the next window opens
+                    release = self._queue.next_release() if self._free_lines else None
+                    timeout = None if release is None else (release - datetime.now(timezone.utc)).total_seconds()
+                    self._cond.wait(None if timeout is None else max(timeout, 0.01))
+                phone_number = self._phones.pop(company_name)
+                try:
+                    # Submitted under the lock so cancel() sees every future it may have cancelled
+                    self._dialing[company_name] = self._pool.submit(self._dial, company_name, phone_number)
+                except RuntimeError:
+                    # Cancelled between taking the lead and handing it to the pool
+                    self._statuses[company_name] = 'cancelled'
+                    self._dispatcher = None
+                    return
+                self._free_lines -= 1
+                self._statuses[company_name] = 'dialing'
+
+    def _dial(self, company_name, phone_number):
+        try:
+            with priority(BATCH):
+                self._dial_lead(company_name, phone_number)
+        finally:
+            with self._cond:
+                self._dialing.pop(company_name, None)
+                self._free_lines += 1
+                self._cond.notify_all()
+
+    def _dial_lead(self, company_name, phone_number):
+        if self._cancelled.is_set():
+            self._set_status(company_name, 'cancelled')
+            return
+        try:
+            task = self._build_task(company_name, self._knowledge_base, self._lead_details(company_name))
+            if self._store is not None:
+                call_response = place_call(self._store, company_name, phone_number, task,
+                                           cancelled=self._cancelled, webhook=self._webhook)
+            else:
+                call_response = make_ai_call(phone_number, task, webhook=self._webhook)
+            if call_response is None:
+                # Cancelled while waiting for a free call slot
+                self._set_status(company_name, 'cancelled')
+                return
+            if call_response.get('status') != 'success':
+                self._set_status(company_name, 'failed: call was not placed')
+                return
+
+            call_id = call_response.get('call_id')
+            self._set_status(company_name, 'in call')
+            self._tracker.track(call_id)
+            result = self._tracker.wait_for(call_id, timeout=self._call_timeout)
+            if result is None:
+                self._set_status(company_name, 'failed: timed out waiting for the call')
+                return
+            self._tracker.pop_result(call_id)
+
+            # The tracker's analysis queue has already persisted the answers and Notes
+            analysis_response = result['analysis']
+            if 'error' in analysis_response:
+                self._set_status(company_name, f"failed: {analysis_response['error']}")
+                return
+            call_summary = analysis_response['answers'][-1]
+            with self._lock:
+                self._notes[company_name] = call_summary
+                self._statuses[company_name] = 'done'
+        except Exception as e:
+            self._set_status(company_name, f"failed: {e}")
@@ -1,40 +1,10 @@
 import os
-import requests
-from dotenv import load_dotenv
+import sys
 
-# Load environment variables from .env file
-load_dotenv()
+# Reuse the app's Bland client from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Get environment variables
-BLAND_API_KEY = os.getenv('BLAND_API_KEY')
-
-def fetch_call_analysis(call_id):
-    url = f"https://api.bland.ai/v1/calls/{call_id}/analyze"
-    headers = {
-        "authorization": BLAND_API_KEY,
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "goal": "Extract the contact name, email address, meeting time, buying intent, and provide a summary of the call.",
-        "questions": [
-            ["What is the contact name?", "string"],
-            ["What is the email address?", "string"],
-            ["What is the meeting time?", "string"],
-            ["What is the buying intent?", "string"],
-            ["Provide a summary of the call.", "string"]
-        ]
-    }
-
-    response = requests.post(url, json=payload, headers=headers)
-
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return {
-            'error': f"Failed to analyze call. Status code: {response.status_code}",
-            'details': response.text
-        }
+from bland import fetch_call_analysis
 
 if __name__ == "__main__":
     call_id = "91e85302-f51d-423c-93a5-4cba46aab6d8"  # Replace with actual call ID
@@ -1,40 +1,10 @@
 import os
-import requests
-from dotenv import load_dotenv
+import sys
 
-# Load environment variables from .env file
-load_dotenv()
+# Reuse the app's Bland client from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Get environment variables
-BLAND_API_KEY = os.getenv('BLAND_API_KEY')
-
-def make_ai_call(phone_number, task, knowledge_base, voice='mason', language='eng'):
-    headers = {
-        'authorization': BLAND_API_KEY,
-        'Content-Type': 'application/json'
-    }
-    data = {
-        'phone_number': phone_number,
-        'task': task,
-        'voice': voice,
-        'language': language,
-        'request_data': {
-            'knowledge_base': knowledge_base
-        },
-        'record': True,
-        'reduce_latency': True,
-        'amd': True
-    }
-    response = requests.post('https://api.bland.ai/v1/calls', json=data, headers=headers)
-    return response.json()
-
-def analyze_call(call_id):
-    headers = {
-        'authorization': BLAND_API_KEY,
-        'Content-Type': 'application/json'
-    }
-    response = requests.post(f'https://api.bland.ai/v1/calls/{call_id}/analyze', headers=headers)
-    return response.json()
+from bland import fetch_call_analysis, make_ai_call
 
 if __name__ == "__main__":
     phone_number = "+1 7022660600"  # Example phone number
@@ -51,10 +21,10 @@ if __name__ == "__main__":
     Also, provide a summary of the call.
     """
 
-    call_response = make_ai_call(phone_number, task, knowledge_base)
+    call_response = make_ai_call(phone_number, task)
     print("Call Response:", call_response)
 
     if call_response['status'] == 'success':
         call_id = call_response['call_id']
-        analysis_response = analyze_call(call_id)
+        analysis_response = fetch_call_analysis(call_id)
         print("Analysis Response:", analysis_response)
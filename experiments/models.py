@@ -1,15 +1,89 @@
-from pydantic import BaseModel
-from typing import List
+import re
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional
 
 class SalesContact(BaseModel):
-    email: str
-    phone: str
+    email: str = ""
+    phone: str = ""
 
 class Company(BaseModel):
     name: str
-    linkedin: str
-    size: str
-    funding: int
-    founded: int
-    head_office: str
-    sales_dept: SalesContact
+    linkedin: str = ""
+    url: str = ""
+    size: str = ""
+    funding: Optional[int] = None
+    founded: Optional[int] = None
+    head_office: str = ""
+    sales_dept: SalesContact = SalesContact()
+
+# Other spellings LLMs use for the same fields
+COMPANY_FIELD_ALIASES = {
+    "name": ["name", "company_name", "company", "companyName"],
+    "linkedin": ["linkedin", "linkedin_link", "linkedin_url", "linkedIn"],
+    "url": ["url", "company_url", "website", "companyUrl"],
+    "size": ["size", "company_size", "employees", "companySize"],
+    "funding": ["funding", "total_funding", "funding_amount"],
+    "founded": ["founded", "year_founded", "founded_year", "yearFounded"],
+    "head_office": ["head_office", "head_office_location", "headquarters", "location", "headOffice"],
+    "sales_dept": ["sales_dept", "sales_contact", "sales", "contact", "salesDept", "sales_department"],
+}
+
+FUNDING_MULTIPLIERS = {"K": 10**3, "M": 10**6, "B": 10**9, "T": 10**12}
+
+def parse_funding(value):
+    """Turn amounts like "$260K", "$1.4B" or 57000000 into whole dollars."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.search(r"(\d[\d,]*(?:\.\d+)?)\s*(K|M|B|T|thousand|million|billion|trillion)?", str(value), re.IGNORECASE)
+    if not match:
+        return None
+    amount = float(match.group(1).replace(",", ""))
+    unit = (match.group(2) or "")[:1].upper()
+    return int(amount * FUNDING_MULTIPLIERS.get(unit, 1))
+
+def format_funding(amount):
+    if amount is None:
+        return ""
+    for unit in ("T", "B", "M", "K"):
+        if amount >= FUNDING_MULTIPLIERS[unit]:
+            return f"${amount / FUNDING_MULTIPLIERS[unit]:.1f}".rstrip("0").rstrip(".") + unit
+    return f"${amount}"
+
+def parse_year(value):
+    match = re.search(r"\b(1[89]\d\d|20\d\d)\b", str(value or ""))
+    return int(match.group(1)) if match else None
+
+def _first(data, keys):
+    for key in keys:
+        if data.get(key) not in (None, ""):
+            return data[key]
+    return None
+
+def normalize_company(data):
+    """Map the keys and value formats of an LLM company object onto the Company fields."""
+    normalized = {field: _first(data, keys) for field, keys in COMPANY_FIELD_ALIASES.items()}
+    sales = normalized["sales_dept"]
+    if not isinstance(sales, dict):
+        sales = {}
+    normalized["sales_dept"] = {
+        "email": str(sales.get("email") or data.get("sales_email") or data.get("email") or ""),
+        "phone": str(sales.get("phone") or data.get("sales_phone") or data.get("phone") or ""),
+    }
+    normalized["funding"] = parse_funding(normalized["funding"])
+    normalized["founded"] = parse_year(normalized["founded"])
+    for field in ("name", "linkedin", "url", "size", "head_office"):
+        value = normalized[field]
+        normalized[field] = "" if value is None else str(value).strip()
+    return normalized
+
+def validate_company(data):
+    """Return a Company for a raw JSON object, or None if it is not a usable company."""
+    if not isinstance(data, dict):
+        return None
+    try:
+        company = Company(**normalize_company(data))
+    except ValidationError:
+        return None
+    return company if company.name else None
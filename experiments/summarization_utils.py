@@ -1,6 +1,109 @@
-from transformers import pipeline
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+# Same checkpoint the transformers "summarization" pipeline picks by default
+SUMMARIZER_MODEL = os.getenv('SUMMARIZER_MODEL', 'sshleifer/distilbart-cnn-12-6')
+SUMMARIZER_THREADS = int(os.getenv('SUMMARIZER_THREADS', str(os.cpu_count() or 1)))
+SUMMARIZER_BATCH_SIZE = int(os.getenv('SUMMARIZER_BATCH_SIZE', '8'))
+# How long queued transcripts wait for others to fill a batch
+SUMMARIZER_BATCH_WAIT = float(os.getenv('SUMMARIZER_BATCH_WAIT', '0.05'))
+SUMMARIZER_QUANTIZE = os.getenv('SUMMARIZER_QUANTIZE', '').lower() in ('1', 'true', 'yes')
+
+
+class Summarizer:
+    """A summarization model loaded once and kept resident for the life of the process.
+
+    Texts are summarized in batches, one forward pass per batch, with inputs
+    sorted by length so little compute is spent on padding. ``quantize``
+    applies dynamic int8 quantization to the linear layers for faster CPU
+    inference. ``submit`` queues a single text and lets concurrent callers
+    share batches.
+    """
+
+    def __init__(self, model_name=SUMMARIZER_MODEL, num_threads=SUMMARIZER_THREADS,
+                 batch_size=SUMMARIZER_BATCH_SIZE, quantize=SUMMARIZER_QUANTIZE):
+        import torch
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+        torch.set_num_threads(num_threads)
+        self._torch = torch
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name).eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.max_input_length = min(self.tokenizer.model_max_length, 1024)
+        # torch already parallelises each forward pass; run one batch at a time
+        self._model_lock = threading.Lock()
+        self._queue = []
+        self._queue_cond = threading.Condition()
+        self._worker = None
+
+    def summarize_batch(self, texts, max_length=150, min_length=30):
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        summaries = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            batch = [texts[i] for i in indices]
+            for i, summary in zip(indices, self._generate(batch, max_length, min_length)):
+                summaries[i] = summary
+        return summaries
+
+    def summarize(self, text, max_length=150, min_length=30):
+        return self.summarize_batch([text], max_length, min_length)[0]
+
+    def submit(self, text):
+        """Queue ``text`` for the next batch and return a Future for its summary."""
+        future = Future()
+        with self._queue_cond:
+            self._queue.append((text, future))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._batch_loop, name='summarizer', daemon=True)
+                self._worker.start()
+            self._queue_cond.notify()
+        return future
+
+    def _generate(self, batch, max_length, min_length):
+        inputs = self.tokenizer(batch, truncation=True, padding=True, max_length=self.max_input_length, return_tensors='pt')
+        with self._model_lock, self._torch.inference_mode():
+            output = self.model.generate(**inputs, max_length=max_length, min_length=min_length, do_sample=False)
+        return self.tokenizer.batch_decode(output, skip_special_tokens=True)
+
+    def _batch_loop(self):
+        while True:
+            with self._queue_cond:
+                while not self._queue:
+                    self._queue_cond.wait()
+                deadline = time.monotonic() + SUMMARIZER_BATCH_WAIT
+                while len(self._queue) < self.batch_size and time.monotonic() < deadline:
+                    self._queue_cond.wait(deadline - time.monotonic())
+                batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+            texts = [text for text, _ in batch]
+            try:
+                summaries = self.summarize_batch(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), summary in zip(batch, summaries):
+                future.set_result(summary)
+
+
+_summarizer = None
+_summarizer_lock = threading.Lock()
+
+def get_summarizer():
+    global _summarizer
+    with _summarizer_lock:
+        if _summarizer is None:
+            _summarizer = Summarizer()
+        return _summarizer
 
 def summarize_text(text):
-    summarizer = pipeline("summarization")
-    summary = summarizer(text, max_length=150, min_length=30, do_sample=False)
-    return summary[0]['summary_text']
+    return get_summarizer().summarize(text)
+
+def summarize_texts(texts):
+    return get_summarizer().summarize_batch(texts)
@@ -0,0 +1,138 @@
+import os
+import pickle
+import threading
+from datetime import datetime, timezone
+
+import httplib2
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+
+import http_client
+from http_client import HTTP_READ_TIMEOUT
+from tracing import span
+
+# If modifying these SCOPES, delete the token file.
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+GOOGLE_CLIENT_SECRETS_PATH = os.getenv('GOOGLE_CLIENT_SECRETS_PATH', 'credentials.json')
+GOOGLE_TOKEN_PATH = os.getenv('GOOGLE_TOKEN_PATH', 'token.json')
+# Tokens written by older versions of the app; migrated to GOOGLE_TOKEN_PATH once
+LEGACY_TOKEN_PATH = 'token.pickle'
+# Overrides the Calendar API root, e.g. to point at a local stand-in for benchmarks
+GOOGLE_CALENDAR_API_ENDPOINT = os.getenv('GOOGLE_CALENDAR_API_ENDPOINT')
+# Refresh the access token this many seconds before it expires
+GOOGLE_TOKEN_REFRESH_MARGIN = float(os.getenv('GOOGLE_TOKEN_REFRESH_MARGIN', '300'))
+
+
+class GoogleCalendar:
+    """Process-wide Google Calendar credentials and service.
+
+    Credentials are loaded once from a JSON token file and refreshed in the
+    background shortly before they expire, so no request ever waits on a
+    token refresh. The Calendar service is built once; each thread gets its
+    own authorized transport because httplib2 connections are not thread-safe.
+    """
+
+    def __init__(self, token_path=GOOGLE_TOKEN_PATH, client_secrets_path=GOOGLE_CLIENT_SECRETS_PATH):
+        self.token_path = token_path
+        self.client_secrets_path = client_secrets_path
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._creds = None
+        self._service = None
+        self._refresh_timer = None
+
+    def credentials(self):
+        with self._lock:
+            if self._creds is None:
+                self._creds = self._load()
+            if not self._creds.valid:
+                self._refresh()
+            return self._creds
+
+    def service(self):
+        with self._lock:
+            if self._service is None:
+                # Requests are executed with a per-thread transport, see http()
+                client_options = {'api_endpoint': GOOGLE_CALENDAR_API_ENDPOINT} if GOOGLE_CALENDAR_API_ENDPOINT else None
+                self._service = build('calendar', 'v3', credentials=self.credentials(), cache_discovery=False,
+                                      client_options=client_options)
+            return self._service
+
+    def http(self):
+        """Authorized transport for the calling thread, bounded by the shared HTTP timeout."""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = AuthorizedHttp(self.credentials(), http=httplib2.Http(timeout=HTTP_READ_TIMEOUT))
+            self._local.http = http
+        return http
+
+    def _load(self):
+        creds = None
+        if os.path.exists(self.token_path):
+            creds = Credentials.from_authorized_user_file(self.token_path, SCOPES)
+        elif os.path.exists(LEGACY_TOKEN_PATH):
+            with open(LEGACY_TOKEN_PATH, 'rb') as token:
+                creds = pickle.load(token)
+            self._save(creds)
+            os.remove(LEGACY_TOKEN_PATH)
+        if creds is None or not (creds.valid or creds.refresh_token):
+            flow = InstalledAppFlow.from_client_secrets_file(self.client_secrets_path, SCOPES)
+            creds = flow.run_local_server(port=8080)
+            self._save(creds)
+        self._schedule_refresh(creds)
+        return creds
+
+    def _save(self, creds):
+        # Owner-only JSON instead of a pickle that would execute code when loaded
+        fd = os.open(self.token_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as token:
+            token.write(creds.to_json())
+
+    def _refresh(self):
+        with self._lock:
+            with span('google.token_refresh', 'google'):
+                self._creds.refresh(Request(session=http_client.get_session('https://oauth2.googleapis.com')))
+            self._save(self._creds)
+            self._schedule_refresh(self._creds)
+
+    def _schedule_refresh(self, creds):
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+        if not creds.refresh_token or creds.expiry is None:
+            return
+        expiry = creds.expiry.replace(tzinfo=timezone.utc)
+        delay = (expiry - datetime.now(timezone.utc)).total_seconds() - GOOGLE_TOKEN_REFRESH_MARGIN
+        self._refresh_timer = threading.Timer(max(delay, 0), self._background_refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _background_refresh(self):
+        try:
+            self._refresh()
+        except Exception:
+            # Try again later; a request that finds the token expired refreshes it inline
+            with self._lock:
+                self._refresh_timer = threading.Timer(60, self._background_refresh)
+                self._refresh_timer.daemon = True
+                self._refresh_timer.start()
+
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+def get_calendar():
+    global _calendar
+    with _calendar_lock:
+        if _calendar is None:
+            _calendar = GoogleCalendar()
+        return _calendar
+
+def authenticate_google_calendar():
+    return get_calendar().credentials()
+
+def get_calendar_service():
+    return get_calendar().service()
@@ -0,0 +1,228 @@
+import asyncio
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '60'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '4'))
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '30'))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '20'))
+
+HTTP_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_lock = threading.Lock()
+_sessions = {}
+
+def get_session(url):
+    """Return the keep-alive session for the host of ``url``, creating it on first use."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    host = urlsplit(url).netloc
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+        return session
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given retry attempt (0-based)."""
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+def retry_after_delay(headers):
+    """Seconds to wait according to a Retry-After header, or None if there is none."""
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), HTTP_BACKOFF_MAX)
+
+def request(method, url, retries=HTTP_MAX_RETRIES, retry_statuses=RETRY_STATUSES, timeout=HTTP_TIMEOUT,
+            idempotent=True, provider=None, tokens=0, **kwargs):
+    """Send a request over the pooled session for its host, retrying transient failures.
+
+    Connection errors, timeouts and ``retry_statuses`` responses are retried
+    up to ``retries`` times with jittered exponential backoff, honouring
+    Retry-After when the server sends it. Requests that must not be repeated
+    once the server may have acted on them (``idempotent=False``) are only
+    retried when the connection was never made or the server answered 429.
+    With a ``provider`` every attempt waits for that provider's rate limiter,
+    costing ``tokens`` against its token budget, and a 429 pauses the limiter.
+    """
+    import requests
+    from rate_limit import get_limiter, throttle
+    from tracing import current_span
+    session = get_session(url)
+    span = current_span()
+    retryable_errors = (requests.ConnectionError, requests.Timeout) if idempotent else (requests.ConnectTimeout,)
+    if not idempotent:
+        retry_statuses = retry_statuses & {429}
+    for attempt in range(retries + 1):
+        if span is not None and attempt:
+            span.add(retries=1)
+        try:
+            with throttle(provider, tokens=tokens) if provider else nullcontext():
+                response = session.request(method, url, timeout=timeout, **kwargs)
+        except retryable_errors:
+            if attempt == retries:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+        if response.status_code in retry_statuses and attempt < retries:
+            delay = retry_after_delay(response.headers)
+            delay = backoff_delay(attempt) if delay is None else delay
+            if provider and response.status_code == 429:
+                # Hold back every caller of this provider, not just this one
+                get_limiter(provider).pause(delay)
+            else:
+                time.sleep(delay)
+            continue
+        if span is not None:
+            # Annotate the caller's span with what went over the wire
+            span.set(status=response.status_code)
+            span.add(request_bytes=len(response.request.body or b''))
+            if not kwargs.get('stream'):
+                span.add(response_bytes=len(response.content))
+        return response
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+class AsyncResponse:
+    def __init__(self, status_code, headers, content, encoding=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncHttpClient:
+    """asyncio counterpart of :func:`request` for issuing many calls concurrently.
+
+    One aiohttp session is shared by every request made through the client,
+    with at most ``limit_per_host`` open connections to each host and
+    ``headers`` sent with each of them. Retries, Retry-After and the
+    per-provider rate limiter behave exactly as in :func:`request`. Use it
+    as an async context manager so the pool is closed when done.
+    """
+
+    def __init__(self, limit_per_host=HTTP_POOL_SIZE, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 read_timeout=HTTP_READ_TIMEOUT, retries=HTTP_MAX_RETRIES, headers=None):
+        self.limit_per_host = limit_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.headers = headers
+        self._session = None
+
+    async def __aenter__(self):
+        import aiohttp
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=self.limit_per_host),
+            timeout=aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout),
+            headers=self.headers,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _send(self, method, url, max_bytes, **kwargs):
+        async with self._session.request(method, url, **kwargs) as response:
+            if max_bytes is None:
+                content = await response.read()
+            else:
+                # Stop reading once the cap is reached instead of buffering a huge body
+                chunks, size = [], 0
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    chunks.append(chunk[:max_bytes - size])
+                    size += len(chunks[-1])
+                    if size >= max_bytes:
+                        break
+                content = b''.join(chunks)
+            encoding = response.get_encoding() if response.charset else None
+            return AsyncResponse(response.status, response.headers, content, encoding)
+
+    async def request(self, method, url, retries=None, retry_statuses=RETRY_STATUSES, idempotent=True,
+                      provider=None, tokens=0, max_bytes=None, **kwargs):
+        """Send a request, retrying like :func:`request`; at most ``max_bytes`` of the body are read."""
+        import aiohttp
+        from rate_limit import get_limiter
+        from tracing import current_span
+        retries = self.retries if retries is None else retries
+        span = current_span()
+        retryable_errors = (aiohttp.ClientConnectionError, asyncio.TimeoutError) if idempotent else (aiohttp.ClientConnectorError,)
+        if not idempotent:
+            retry_statuses = retry_statuses & {429}
+        limiter = get_limiter(provider) if provider else None
+        for attempt in range(retries + 1):
+            if span is not None and attempt:
+                span.add(retries=1)
+            try:
+                if limiter is not None:
+                    # The limiter blocks; wait for it on a worker thread so the event loop keeps running
+                    waited = await asyncio.to_thread(limiter.acquire, 1, tokens)
+                    if span is not None and waited:
+                        span.add(queue_wait=round(waited, 4))
+                try:
+                    result = await self._send(method, url, max_bytes, **kwargs)
+                finally:
+                    if limiter is not None:
+                        limiter.release()
+            except retryable_errors:
+                if attempt == retries:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            if result.status_code in retry_statuses and attempt < retries:
+                delay = retry_after_delay(result.headers)
+                delay = backoff_delay(attempt) if delay is None else delay
+                if limiter is not None and result.status_code == 429:
+                    # Hold back every caller of this provider, not just this one
+                    limiter.pause(delay)
+                else:
+                    await asyncio.sleep(delay)
+                continue
+            if span is not None:
+                span.set(status=result.status_code)
+                span.add(response_bytes=len(result.content))
+            return result
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
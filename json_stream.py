@@ -0,0 +1,289 @@
+import json
+import re
+
+_LITERALS = {
+    'true': 'true', 'True': 'true', 'TRUE': 'true',
+    'false': 'false', 'False': 'false', 'FALSE': 'false',
+    'null': 'null', 'None': 'null', 'NULL': 'null', 'NaN': 'null', 'undefined': 'null',
+}
+_BARE_WORD = re.compile(r'[A-Za-z_$][\w$\-]*')
+# Numbers, including the "24 * 60" style products LLMs copy out of prompt templates
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?(?:\s*\*\s*\d+(?:\.\d+)?)*')
+_CLOSERS = {'{': '}', '[': ']'}
+# A comma that starts the next member of an object: it is followed by a key and a colon
+_NEXT_KEY = re.compile(r''',\s*(?:"[^"\n]*"|'[^'\n]*'|[A-Za-z_$][\w$\-]*)\s*:''')
+
+
+def _read_string(text, i):
+    """Read a string literal starting at ``text[i]`` and return it re-encoded as valid JSON."""
+    opener = text[i]
+    if opener == "'":
+        closers = ("'",)
+    elif opener == '“':
+        closers = ('”', '"')
+    else:
+        closers = ('"',)
+    pieces = []
+    j = i + 1
+    while j < len(text):
+        char = text[j]
+        if char == '\\' and j + 1 < len(text):
+            escaped = text[j + 1]
+            pieces.append("'" if escaped == "'" else char + escaped)
+            j += 2
+            continue
+        if char in closers:
+            return '"' + ''.join(pieces) + '"', j + 1, True
+        if char == '"':
+            pieces.append('\\"')
+        elif char == '\n':
+            pieces.append('\\n')
+        elif char == '\r':
+            pieces.append('\\r')
+        elif char == '\t':
+            pieces.append('\\t')
+        else:
+            pieces.append(char)
+        j += 1
+    return '"' + ''.join(pieces) + '"', j, False
+
+
+def _next_significant(text, i):
+    while i < len(text) and text[i].isspace():
+        i += 1
+    return text[i] if i < len(text) else ''
+
+
+def _last_significant(out):
+    for piece in reversed(out):
+        stripped = piece.rstrip()
+        if stripped:
+            return stripped[-1]
+    return ''
+
+
+def _read_unquoted(text, i):
+    """Read an unquoted object member value starting at ``text[i]``; return it and where it ends.
+
+    The value may contain spaces and commas ("San Francisco, CA, USA"), so it
+    runs to the comma that starts the next key, a closing bracket, a line
+    break or a comment, not to the first comma.
+    """
+    j = i
+    while j < len(text) and text[j] not in '}]\n':
+        if text[j] == ',' and _NEXT_KEY.match(text, j):
+            break
+        if text.startswith(('//', '/*'), j) and (j == i or text[j - 1].isspace()):
+            break
+        j += 1
+    return text[i:j].strip().rstrip(',').rstrip(), j
+
+
+def _json_number(number):
+    """Spell a number the way JSON requires: no plus sign and digits on both sides of the point."""
+    sign, digits = ('-', number[1:]) if number.startswith('-') else ('', number.lstrip('+'))
+    if digits.startswith('.'):
+        digits = '0' + digits
+    return sign + re.sub(r'\.(?=[eE]|$)', '.0', digits)
+
+
+def _drop_trailing_comma(out):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ',':
+        out.pop()
+
+
+def repair_json(text):
+    """Fix the defects LLMs commonly put in JSON without touching the contents of strings.
+
+    Handles code fences, comments, trailing commas, single or curly quotes,
+    raw newlines inside strings, unquoted keys and values, Python literals
+    and simple ``a * b`` arithmetic.
+    """
+    out = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char in '"\'“':
+            literal, i, _ = _read_string(text, i)
+            out.append(literal)
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = len(text) if end == -1 else end
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = len(text) if end == -1 else end + 2
+        elif text.startswith('```', i):
+            match = re.compile(r'```[A-Za-z]*').match(text, i)
+            i = match.end()
+        elif char in '}]':
+            _drop_trailing_comma(out)
+            out.append(char)
+            i += 1
+        elif char.isdigit() or (char in '-+.' and _NUMBER.match(text, i)):
+            match = _NUMBER.match(text, i)
+            number = match.group(0)
+            if _last_significant(out) == ':':
+                value, end = _read_unquoted(text, i)
+                if value != number.strip():
+                    # Not just a number, e.g. "+1 415 555 0100" or "1.5M"
+                    out.append(json.dumps(value))
+                    i = end
+                    continue
+            if '*' in number:
+                product = 1
+                for factor in number.split('*'):
+                    product *= float(factor)
+                number = str(int(product)) if product.is_integer() else str(product)
+            out.append(_json_number(number))
+            i = match.end()
+        elif char.isalpha() or char in '_$':
+            match = _BARE_WORD.match(text, i)
+            word = match.group(0)
+            if _last_significant(out) == ':':
+                value, i = _read_unquoted(text, i)
+                out.append(_LITERALS[word] if value == word and word in _LITERALS else json.dumps(value))
+                continue
+            i = match.end()
+            if _next_significant(text, i) == ':':
+                out.append(json.dumps(word))
+            elif word in _LITERALS:
+                out.append(_LITERALS[word])
+            else:
+                # An unquoted value runs to the next separator
+                match = re.compile(r'[^,}\]\n]*').match(text, i)
+                out.append(json.dumps((word + match.group(0)).strip()))
+                i = match.end()
+        else:
+            out.append(char)
+            i += 1
+    return ''.join(out)
+
+
+def _close_truncated(text):
+    """Close the strings, objects and arrays left open by a response that was cut off."""
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in '}]' and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    # A dangling key or separator cannot be completed, so drop it
+    text = re.sub(r'(?:,\s*"(?:[^"\\]|\\.)*"\s*:?|[,:])\s*$', '', text)
+    text = re.sub(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*:\s*$', r'\1', text)
+    text = re.sub(r',\s*$', '', text)
+    return text + ''.join(reversed(stack))
+
+
+def parse_json(text):
+    """Parse ``text`` as JSON, repairing it only if it is not already valid."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(repair_json(text))
+
+
+class JSONObjectStream:
+    """Pulls complete top-level JSON objects out of text that arrives in pieces.
+
+    LLMs wrap their JSON in prose, code fences or an enclosing array; only the
+    outermost ``{...}`` objects are returned, as soon as their closing brace
+    has been seen, so callers can render results before the response ends.
+    Objects that do not parse even after repair, and empty ones, are skipped
+    rather than failing the whole stream.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._start = None
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text):
+        """Add more text and return the objects completed by it."""
+        self._buffer += text
+        objects = []
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                if self._depth:
+                    self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif char == '}' and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    objects.extend(self._parse(buffer[self._start:i + 1]))
+                    self._start = None
+        self._pos = len(buffer)
+        # Drop text that can no longer be part of an object
+        if self._start is None:
+            self._buffer, self._pos = "", 0
+        elif self._start:
+            self._buffer = buffer[self._start:]
+            self._pos -= self._start
+            self._start = 0
+        return objects
+
+    def close(self):
+        """Salvage the object left unterminated when the stream ended, if it can be repaired."""
+        if self._start is None:
+            return []
+        tail = self._buffer[self._start:]
+        self._buffer, self._pos, self._depth, self._start = "", 0, 0, None
+        self._in_string = self._escaped = False
+        try:
+            obj = json.loads(_close_truncated(repair_json(tail)))
+        except json.JSONDecodeError:
+            return []
+        # Trailing garbage ending in "{" closes to an empty object, which is no record
+        return [obj] if isinstance(obj, dict) and obj else []
+
+    def _parse(self, text):
+        try:
+            obj = parse_json(text)
+        except json.JSONDecodeError:
+            return []
+        return [obj] if isinstance(obj, dict) and obj else []
+
+
+def iter_json_objects(chunks, salvage_tail=True):
+    """Yield each complete top-level JSON object found in an iterable of text chunks."""
+    stream = JSONObjectStream()
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+    if salvage_tail:
+        yield from stream.close()
+
+
+def parse_json_object(text):
+    """Return the first JSON object in ``text``, or None if there is none."""
+    for obj in iter_json_objects([text]):
+        return obj
+    return None
@@ -0,0 +1,17 @@
+from crawler import site_context
+from llm import complete, stream_complete
+
+def knowledge_base_prompt(company_url, context=""):
+    if not context:
+        return f"Create a detailed knowledge base for the company with the URL {company_url}. Include the company name, year founded, headquarters, relevant information, products and solutions, use cases, key features, and any other pertinent details."
+    # Grounded on the crawled site so the model condenses real content instead of recalling it
+    return f"Create a detailed knowledge base for the company with the URL {company_url} from the website content below. Include the company name, year founded, headquarters, relevant information, products and solutions, use cases, key features, and any other pertinent details. Use only facts stated in the content and leave out anything it does not cover.\n\nWebsite content:\n{context}"
+
+# Define the function to create a knowledge base
+def create_knowledge_base(company_url):
+    knowledge_base = complete(knowledge_base_prompt(company_url, site_context(company_url))).strip()
+    return knowledge_base
+
+# Yield the knowledge base text as it is generated
+def stream_knowledge_base(company_url):
+    return stream_complete(knowledge_base_prompt(company_url, site_context(company_url)))
@@ -0,0 +1,150 @@
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+# Sections handed to each call prompt
+KB_TOP_K = int(os.getenv('KB_TOP_K', '3'))
+# Target size of a knowledge base section, in characters
+KB_SECTION_CHARS = int(os.getenv('KB_SECTION_CHARS', '700'))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Terms every sales call needs covered, whoever the lead is
+CALL_QUERY = "products solutions offerings services use cases benefits key features customers pricing"
+# Weight of CALL_QUERY against the lead's own terms; it only orders sections the lead does not tell apart
+KB_CALL_QUERY_WEIGHT = float(os.getenv('KB_CALL_QUERY_WEIGHT', '0.2'))
+
+_STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or our that the their this to was we were will with
+you your they them who what which how can also more most into over such than then these those about
+""".split())
+_HEADING = re.compile(r"^\s*(#{1,6}\s+.+|\*\*[^*]+\*\*:?|[A-Z][A-Za-z0-9 &/,'-]{2,60}:)\s*$")
+
+
+def tokenize(text):
+    return [word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in _STOPWORDS and len(word) > 1]
+
+def chunk_knowledge_base(text, max_chars=KB_SECTION_CHARS):
+    """Split a knowledge base into sections of roughly ``max_chars``.
+
+    Markdown headings and blank lines delimit blocks; consecutive blocks are
+    merged until a section would grow past ``max_chars``, and a heading
+    always starts a new section so it stays with its body.
+    """
+    blocks = []
+    for paragraph in re.split(r"\n\s*\n", text.strip()):
+        lines = paragraph.strip().splitlines()
+        current = []
+        for line in lines:
+            if _HEADING.match(line) and current:
+                blocks.append("\n".join(current))
+                current = []
+            current.append(line)
+        if current:
+            blocks.append("\n".join(current))
+
+    sections = []
+    for block in blocks:
+        starts_section = bool(_HEADING.match(block.splitlines()[0]))
+        if sections and not starts_section and len(sections[-1]) + len(block) + 2 <= max_chars:
+            sections[-1] += "\n\n" + block
+        elif sections and starts_section and len(sections[-1]) < max_chars // 4 and _HEADING.match(sections[-1]):
+            # A heading with nothing under it yet belongs to the next block
+            sections[-1] += "\n" + block
+        else:
+            sections.append(block)
+    return sections
+
+
+class KnowledgeIndex:
+    """BM25 index over the sections of one knowledge base.
+
+    Built once per saved knowledge base and queried for every call, so each
+    prompt carries only the sections relevant to the lead instead of the
+    whole document. Sections are ranked by the lead's terms; CALL_QUERY adds
+    a small, fixed share on top so it only breaks ties.
+    """
+
+    def __init__(self, text, max_chars=KB_SECTION_CHARS):
+        self.sections = chunk_knowledge_base(text, max_chars) if text and text.strip() else []
+        self._lengths = []
+        self._postings = {}
+        for i, section in enumerate(self.sections):
+            terms = Counter(tokenize(section))
+            self._lengths.append(sum(terms.values()))
+            for term, count in terms.items():
+                self._postings.setdefault(term, []).append((i, count))
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        self._call_scores = self.scores(CALL_QUERY)
+
+    def scores(self, query):
+        n = len(self.sections)
+        scores = [0.0] * n
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, count in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[i] / (self._average_length or 1))
+                scores[i] += idf * count * (BM25_K1 + 1) / (count + norm)
+        return scores
+
+    def search(self, query, k=KB_TOP_K, call_weight=KB_CALL_QUERY_WEIGHT):
+        """Indices of the ``k`` best sections for ``query``, best first."""
+        scores = [score + call_weight * call for score, call in zip(self.scores(query), self._call_scores)]
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [i for i in ranked[:k] if scores[i] > 0]
+
+    def relevant_text(self, query, k=KB_TOP_K):
+        """The opening section plus the ``k`` best matches for ``query``, in document order."""
+        if len(self.sections) <= k + 1:
+            return "\n\n".join(self.sections)
+        # The opening section names the company and its offering; every call needs it
+        chosen = sorted({0, *self.search(query, k)})
+        return "\n\n".join(self.sections[i] for i in chosen)
+
+
+@lru_cache(maxsize=8)
+def get_knowledge_index(text):
+    return KnowledgeIndex(text)
+
+def _employees(size):
+    """Headcount a size string describes: the midpoint of a range such as "50-200", "10k+" as 10000."""
+    numbers = []
+    for match in re.finditer(r"(\d[\d,]*(?:\.\d+)?)\s*([kK])?", str(size or "")):
+        number = float(match.group(1).replace(",", ""))
+        numbers.append(number * 1000 if match.group(2) else number)
+        if len(numbers) == 2:
+            break
+    return int(sum(numbers) / len(numbers)) if numbers else None
+
+def _segment(size):
+    employees = _employees(size)
+    if employees is None:
+        return ""
+    if employees < 50:
+        return "startup small business smb founders"
+    if employees < 1000:
+        return "mid-market growing teams scale"
+    return "enterprise large organizations security compliance integration"
+
+def lead_query(company_name, lead=None):
+    """Search terms describing a lead: its name, size segment, location and funding stage.
+
+    CALL_QUERY is not part of it; :meth:`KnowledgeIndex.search` weighs it in separately.
+    """
+    lead = lead or {}
+    parts = [
+        company_name,
+        str(lead.get("Size") or ""),
+        _segment(lead.get("Size")),
+        str(lead.get("Head Office Location") or ""),
+        str(lead.get("Funding") or ""),
+    ]
+    return " ".join(part for part in parts if part)
+
+def relevant_knowledge(knowledge_base, company_name, lead=None, k=KB_TOP_K):
+    return get_knowledge_index(knowledge_base).relevant_text(lead_query(company_name, lead), k)
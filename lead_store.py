@@ -0,0 +1,614 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from experiments.models import Company, SalesContact, format_funding
+
+LEAD_DB_PATH = os.getenv('LEAD_DB_PATH', 'salesbuddy.db')
+
+# Columns shown in the Step 3 table, in display order
+LEAD_COLUMNS = [
+    "Name", "Size", "Funding", "Year Founded", "Head Office Location", "Sales Email", "Sales Phone", "Notes"
+]
+
+# One column per question asked by bland.fetch_call_analysis, the summary excepted
+CALL_ANSWER_COLUMNS = ["contact_name", "contact_email", "meeting_time", "buying_intent"]
+
+_COMPANY_SUFFIXES = re.compile(
+    r"\b(incorporated|inc|llc|l\.l\.c|ltd|limited|corp|corporation|co|company|gmbh|ag|sa|plc|pty|bv|srl|oy|ab)\b\.?$"
+)
+# Mailbox providers shared by unrelated companies, so useless for matching leads
+FREE_MAIL_DOMAINS = {"gmail.com", "googlemail.com", "yahoo.com", "hotmail.com", "outlook.com", "live.com", "aol.com", "icloud.com", "proton.me", "protonmail.com"}
+# Sort keys accepted by LeadStore.page_companies, mapped to SQL expressions
+LEAD_SORT_KEYS = {
+    "name": "name_key",
+    "size": "CAST(size AS INTEGER)",
+    "funding": "funding",
+    "founded": "founded",
+    "head_office": "head_office",
+    "updated_at": "updated_at",
+}
+# SQLite caps the number of bound parameters per statement
+_MAX_PARAMS = 900
+
+def normalize_name(name):
+    """Key used to recognise the same company under different spellings."""
+    key = re.sub(r"[^\w\s]", " ", str(name or "").lower())
+    key = re.sub(r"\s+", " ", key).strip()
+    while True:
+        stripped = _COMPANY_SUFFIXES.sub("", key).strip()
+        if stripped == key or not stripped:
+            return key
+        key = stripped
+
+def normalize_domain(url_or_email):
+    value = str(url_or_email or "").strip().lower()
+    if not value:
+        return ""
+    if "@" in value and "/" not in value:
+        value = value.rsplit("@", 1)[1]
+    elif "//" not in value:
+        value = "//" + value
+    host = urlsplit(value).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+def normalize_phone(phone):
+    """Key used to match leads on their phone number; empty for short and placeholder numbers."""
+    digits = re.sub(r"\D", "", str(phone or ""))
+    if len(digits) < 7 or _is_placeholder_phone(digits):
+        return ""
+    return digits
+
+def _is_placeholder_phone(digits):
+    # Numbers like 123-456-7890, 000-000-0000 or 555-0100 that scraped pages and LLMs fill in
+    local = digits[1:] if len(digits) == 11 and digits[0] == "1" else digits
+    if len(set(local)) == 1 or local in "01234567890" or local in "9876543210":
+        return True
+    if len(local) == 10:
+        return local[:3] == "555" or local[3:6] == "555"
+    return len(local) == 7 and local[:3] == "555"
+
+def _same_company(name_key, other_key):
+    """Whether two normalised names can be one company, e.g. "acme" and "acme robotics"."""
+    words, other_words = name_key.split(), other_key.split()
+    shorter = min(len(words), len(other_words))
+    return shorter > 0 and words[:shorter] == other_words[:shorter]
+
+def _chunks(values, size=_MAX_PARAMS):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+class LeadStore:
+    """Embedded SQLite store for leads, the calls made to them and the meetings booked.
+
+    Leads are deduplicated on a normalised company name and matched on
+    domain and phone as well, all of which are indexed so lookups stay fast
+    for very large lead lists. A domain or phone match only merges
+    companies whose names agree, and the merged name is kept as an alias
+    of the lead so it can still be looked up. The database file is shared by every session
+    and process, so reps see each other's leads.
+    """
+
+    def __init__(self, path=LEAD_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS leads (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    name_key TEXT NOT NULL UNIQUE,
+                    domain TEXT NOT NULL DEFAULT '',
+                    phone_key TEXT NOT NULL DEFAULT '',
+                    linkedin TEXT NOT NULL DEFAULT '',
+                    url TEXT NOT NULL DEFAULT '',
+                    size TEXT NOT NULL DEFAULT '',
+                    funding INTEGER,
+                    founded INTEGER,
+                    head_office TEXT NOT NULL DEFAULT '',
+                    sales_email TEXT NOT NULL DEFAULT '',
+                    sales_phone TEXT NOT NULL DEFAULT '',
+                    notes TEXT NOT NULL DEFAULT '',
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS leads_domain ON leads (domain) WHERE domain != '';
+                CREATE INDEX IF NOT EXISTS leads_phone_key ON leads (phone_key) WHERE phone_key != '';
+                CREATE INDEX IF NOT EXISTS leads_updated_at ON leads (updated_at);
+
+                CREATE TABLE IF NOT EXISTS lead_aliases (
+                    name_key TEXT PRIMARY KEY,
+                    lead_id INTEGER NOT NULL REFERENCES leads (id)
+                );
+
+                CREATE TABLE IF NOT EXISTS calls (
+                    call_id TEXT PRIMARY KEY,
+                    lead_id INTEGER REFERENCES leads (id),
+                    status TEXT NOT NULL,
+                    summary TEXT NOT NULL DEFAULT '',
+                    analysis TEXT,
+                    started_at REAL NOT NULL,
+                    finished_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS calls_lead_id ON calls (lead_id);
+
+                CREATE TABLE IF NOT EXISTS analysis_jobs (
+                    call_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    details TEXT NOT NULL DEFAULT '{}',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT NOT NULL DEFAULT '',
+                    enqueued_at REAL NOT NULL,
+                    next_attempt_at REAL NOT NULL,
+                    lease_owner TEXT NOT NULL DEFAULT '',
+                    locked_until REAL NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS analysis_jobs_due ON analysis_jobs (state, next_attempt_at);
+
+                CREATE TABLE IF NOT EXISTS meetings (
+                    id INTEGER PRIMARY KEY,
+                    lead_id INTEGER REFERENCES leads (id),
+                    call_id TEXT,
+                    event_id TEXT,
+                    html_link TEXT NOT NULL DEFAULT '',
+                    start_time TEXT NOT NULL DEFAULT '',
+                    event TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS meetings_lead_id ON meetings (lead_id);
+
+                CREATE TABLE IF NOT EXISTS searches (
+                    prompt TEXT PRIMARY KEY,
+                    runs INTEGER NOT NULL DEFAULT 1,
+                    searched_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS searches_searched_at ON searches (searched_at);
+
+                CREATE TABLE IF NOT EXISTS call_slots (
+                    id INTEGER PRIMARY KEY,
+                    call_id TEXT NOT NULL DEFAULT '',
+                    acquired_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS call_slots_call_id ON call_slots (call_id);
+            """)
+            # Databases created before the analysis answers had their own columns
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(calls)")}
+            for column in CALL_ANSWER_COLUMNS:
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE calls ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+            # Databases created before running analysis jobs held a lease
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(analysis_jobs)")}
+            if 'lease_owner' not in columns:
+                conn.execute("ALTER TABLE analysis_jobs ADD COLUMN lease_owner TEXT NOT NULL DEFAULT ''")
+                conn.execute("ALTER TABLE analysis_jobs ADD COLUMN locked_until REAL NOT NULL DEFAULT 0")
+
+    def _connect(self):
+        # sqlite3 connections cannot be shared between threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    # Leads
+
+    def _lead_for_key(self, conn, name_key):
+        row = conn.execute("""
+            SELECT id FROM leads WHERE name_key = ?
+            UNION ALL SELECT lead_id FROM lead_aliases WHERE name_key = ?
+        """, (name_key, name_key)).fetchone()
+        return None if row is None else row[0]
+
+    def _match(self, conn, name_key, domain, phone_key):
+        lead_id = self._lead_for_key(conn, name_key)
+        if lead_id is not None:
+            return lead_id
+        # Shared domains and switchboard numbers are common, so they only merge companies whose names agree
+        for column, value in (('domain', domain), ('phone_key', phone_key)):
+            if not value:
+                continue
+            for row in conn.execute(f"SELECT id, name_key FROM leads WHERE {column} = ?", (value,)):
+                if _same_company(name_key, row['name_key']):
+                    conn.execute("INSERT OR IGNORE INTO lead_aliases (name_key, lead_id) VALUES (?, ?)",
+                                 (name_key, row['id']))
+                    return row['id']
+        return None
+
+    def _rows_for_keys(self, conn, keys, columns="*"):
+        """Lead rows for the given name keys, found by name or alias, keyed by the name key asked for."""
+        rows = {}
+        for chunk in _chunks(list(keys)):
+            placeholders = ', '.join('?' for _ in chunk)
+            for row in conn.execute(f"""
+                SELECT name_key AS match_key, {columns} FROM leads WHERE name_key IN ({placeholders})
+                UNION ALL
+                SELECT lead_aliases.name_key, {', '.join(f'leads.{c.strip()}' for c in columns.split(','))}
+                FROM lead_aliases JOIN leads ON leads.id = lead_aliases.lead_id
+                WHERE lead_aliases.name_key IN ({placeholders})
+            """, chunk + chunk):
+                rows.setdefault(row['match_key'], row)
+        return rows
+
+    def upsert_company(self, company):
+        """Insert a Company or merge it into the lead it duplicates; returns the lead id.
+
+        Fields already known are only overwritten by non-empty new values.
+        """
+        with self._connect() as conn:
+            return self._upsert(conn, company, time.time())
+
+    def upsert_companies(self, companies, notes=None):
+        """Upsert many Companies in one transaction, e.g. an imported lead list; returns the lead ids.
+
+        ``notes`` optionally gives each company's Notes; empty ones leave the stored Notes alone.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            lead_ids = [self._upsert(conn, company, now) for company in companies]
+            if notes is not None:
+                conn.executemany("UPDATE leads SET notes = ? WHERE id = ?",
+                                 [(note, lead_id) for lead_id, note in zip(lead_ids, notes) if note])
+            return lead_ids
+
+    def _upsert(self, conn, company, now):
+        name_key = normalize_name(company.name)
+        domain = normalize_domain(company.url)
+        if not domain:
+            email_domain = normalize_domain(company.sales_dept.email)
+            domain = "" if email_domain in FREE_MAIL_DOMAINS else email_domain
+        phone_key = normalize_phone(company.sales_dept.phone)
+        values = {
+            'linkedin': company.linkedin,
+            'url': company.url,
+            'size': company.size,
+            'funding': company.funding,
+            'founded': company.founded,
+            'head_office': company.head_office,
+            'sales_email': company.sales_dept.email,
+            'sales_phone': company.sales_dept.phone,
+            'domain': domain,
+            'phone_key': phone_key,
+        }
+        lead_id = self._match(conn, name_key, domain, phone_key)
+        if lead_id is None:
+            cursor = conn.execute(f"""
+                INSERT INTO leads (name, name_key, {', '.join(values)}, created_at, updated_at)
+                VALUES (?, ?, {', '.join('?' for _ in values)}, ?, ?)
+            """, (company.name, name_key, *values.values(), now, now))
+            return cursor.lastrowid
+        updates = {k: v for k, v in values.items() if v not in (None, '')}
+        assignments = ', '.join(f"{column} = ?" for column in updates)
+        conn.execute(
+            f"UPDATE leads SET {assignments + ', ' if assignments else ''}updated_at = ? WHERE id = ?",
+            (*updates.values(), now, lead_id)
+        )
+        return lead_id
+
+    def find_known(self, names):
+        """Return the stored Company for each of ``names`` that is already a lead, keyed by the given name."""
+        keys = {normalize_name(name): name for name in names}
+        with self._connect() as conn:
+            rows = self._rows_for_keys(conn, keys)
+        return {keys[key]: self._company(row) for key, row in rows.items()}
+
+    def get_company(self, lead_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM leads WHERE id = ?", (lead_id,)).fetchone()
+        return None if row is None else self._company(row)
+
+    def lead_id(self, name):
+        with self._connect() as conn:
+            return self._lead_for_key(conn, normalize_name(name))
+
+    def lead_revisions(self, names):
+        """``(lead id, updated_at)`` of each of ``names`` that is a lead, keyed by the given name."""
+        keys = {normalize_name(name): name for name in names}
+        with self._connect() as conn:
+            rows = self._rows_for_keys(conn, keys, "id, updated_at")
+        return {keys[key]: (row['id'], row['updated_at']) for key, row in rows.items()}
+
+    def update_notes(self, name, notes):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE leads SET notes = ?, updated_at = ? WHERE id = ?",
+                (notes or '', time.time(), self._lead_for_key(conn, normalize_name(name)))
+            )
+
+    def count_leads(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0]
+
+    def query_leads(self, names=None, search=None, limit=None, offset=0):
+        """Return leads as a Step 3 table, most recently updated first.
+
+        ``names`` restricts the result to those companies, in the given order,
+        and a company merged into another lead is listed under the name asked
+        for; ``search`` matches a prefix of the normalised company name.
+        """
+        with self._connect() as conn:
+            if names is not None:
+                keys = {normalize_name(name): name for name in names}
+                rows_by_key = self._rows_for_keys(conn, keys)
+                rows = [(rows_by_key[key], None if rows_by_key[key]['name_key'] == key else keys[key])
+                        for key in keys if key in rows_by_key]
+            else:
+                sql = "SELECT * FROM leads"
+                params = []
+                if search:
+                    # A range on the unique name_key index instead of a LIKE scan
+                    prefix = normalize_name(search)
+                    sql += " WHERE name_key >= ? AND name_key < ?"
+                    params += [prefix, prefix + '\uffff']
+                sql += " ORDER BY updated_at DESC"
+                if limit is not None:
+                    sql += " LIMIT ? OFFSET ?"
+                    params += [limit, offset]
+                rows = [(row, None) for row in conn.execute(sql, params)]
+        return pd.DataFrame([self._row(row, name) for row, name in rows], columns=LEAD_COLUMNS)
+
+    def page_companies(self, search=None, order_by='updated_at', descending=True, limit=25, offset=0, lead_ids=None):
+        """Return one page of stored leads as Company objects and the number of leads matching ``search``.
+
+        Sorting and paging happen in SQLite, so only the requested page is
+        ever loaded however many leads there are. ``lead_ids`` restricts the
+        page to those leads, e.g. the ones one lead search found.
+        """
+        conditions, params = [], []
+        if search:
+            prefix = normalize_name(search)
+            conditions.append("name_key >= ? AND name_key < ?")
+            params += [prefix, prefix + '\uffff']
+        if lead_ids is not None:
+            lead_ids = list(lead_ids)[:_MAX_PARAMS]
+            conditions.append(f"id IN ({', '.join('?' for _ in lead_ids)})")
+            params += lead_ids
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = f"{LEAD_SORT_KEYS[order_by]} {'DESC' if descending else 'ASC'}"
+        with self._connect() as conn:
+            matching = conn.execute(f"SELECT COUNT(*) FROM leads{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM leads{where} ORDER BY {order}, id DESC LIMIT ? OFFSET ?", [*params, limit, offset]
+            ).fetchall()
+        return [self._company(row) for row in rows], matching
+
+    @staticmethod
+    def _row(row, name=None):
+        return [
+            name or row['name'],
+            row['size'],
+            format_funding(row['funding']),
+            row['founded'] or "",
+            row['head_office'],
+            row['sales_email'],
+            row['sales_phone'],
+            row['notes'],
+        ]
+
+    @staticmethod
+    def _company(row):
+        return Company(
+            name=row['name'],
+            linkedin=row['linkedin'],
+            url=row['url'],
+            size=row['size'],
+            funding=row['funding'],
+            founded=row['founded'],
+            head_office=row['head_office'],
+            sales_dept=SalesContact(email=row['sales_email'], phone=row['sales_phone']),
+        )
+
+    # Calls and meetings
+
+    def record_call(self, call_id, company_name, status='in call'):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO calls (call_id, lead_id, status, started_at) VALUES (?, ?, ?, ?)",
+                (call_id, self.lead_id(company_name), status, time.time())
+            )
+
+    def finish_call(self, call_id, status, analysis=None, summary=''):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE calls SET status = ?, analysis = ?, summary = ?, finished_at = ? WHERE call_id = ?",
+                (status, None if analysis is None else json.dumps(analysis), summary or '', time.time(), call_id)
+            )
+            conn.execute("DELETE FROM call_slots WHERE call_id = ?", (call_id,))
+
+    def save_analysis(self, call_id, analysis, status='completed'):
+        """Store a call's analysis with every answer in its own column and copy the summary into Notes.
+
+        An analysis carrying an ``error`` marks the call as failed and leaves Notes alone.
+        """
+        answers = [] if 'error' in analysis else [str(answer or '') for answer in analysis.get('answers') or []]
+        answers += [''] * (len(CALL_ANSWER_COLUMNS) + 1 - len(answers))
+        summary = answers[len(CALL_ANSWER_COLUMNS)]
+        status = 'failed' if 'error' in analysis else status
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(f"""
+                INSERT INTO calls (call_id, status, summary, analysis, started_at, finished_at,
+                                   {', '.join(CALL_ANSWER_COLUMNS)})
+                VALUES (?, ?, ?, ?, ?, ?, {', '.join('?' * len(CALL_ANSWER_COLUMNS))})
+                ON CONFLICT(call_id) DO UPDATE SET
+                    status = excluded.status, summary = excluded.summary, analysis = excluded.analysis,
+                    finished_at = excluded.finished_at,
+                    {', '.join(f'{column} = excluded.{column}' for column in CALL_ANSWER_COLUMNS)}
+            """, (call_id, status, summary, json.dumps(analysis), now, now, *answers[:len(CALL_ANSWER_COLUMNS)]))
+            conn.execute("DELETE FROM call_slots WHERE call_id = ?", (call_id,))
+            if status != 'failed':
+                conn.execute("""
+                    UPDATE leads SET notes = ?, updated_at = ?
+                    WHERE id = (SELECT lead_id FROM calls WHERE call_id = ?)
+                """, (summary, now, call_id))
+
+    # Live-call slots, shared by every process dialing through this store
+
+    def acquire_call_slot(self, limit, ttl):
+        """Take one of ``limit`` live-call slots and return its id, or None when all are taken.
+
+        Slots older than ``ttl`` seconds belong to calls that never reported
+        back and are reclaimed.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            # Counted and taken under the write lock, so two processes cannot both take the last slot
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM call_slots WHERE acquired_at < ?", (now - ttl,))
+            if conn.execute("SELECT COUNT(*) FROM call_slots").fetchone()[0] >= limit:
+                return None
+            return conn.execute("INSERT INTO call_slots (acquired_at) VALUES (?)", (now,)).lastrowid
+
+    def bind_call_slot(self, slot_id, call_id):
+        """Tie a slot to the call placed with it; the slot is freed when the call is finished."""
+        with self._connect() as conn:
+            conn.execute("UPDATE call_slots SET call_id = ? WHERE id = ?", (call_id, slot_id))
+
+    def release_call_slot(self, slot_id=None, call_id=None):
+        with self._connect() as conn:
+            if slot_id is not None:
+                conn.execute("DELETE FROM call_slots WHERE id = ?", (slot_id,))
+            if call_id:
+                conn.execute("DELETE FROM call_slots WHERE call_id = ?", (call_id,))
+
+    def live_calls(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM call_slots").fetchone()[0]
+
+    def get_call(self, call_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM calls WHERE call_id = ?", (call_id,)).fetchone()
+        return None if row is None else dict(row)
+
+    def calls_for(self, company_name):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM calls WHERE lead_id = ? ORDER BY started_at DESC", (self.lead_id(company_name),)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def record_meeting(self, company_name, event, call_id=None):
+        start = (event.get('start') or {}).get('dateTime', '')
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO meetings (lead_id, call_id, event_id, html_link, start_time, event, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (self.lead_id(company_name), call_id, event.get('id'), event.get('htmlLink', ''), start,
+                  json.dumps(event), time.time()))
+
+    def meeting_for_call(self, call_id):
+        """The Calendar event already booked from ``call_id``, or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT event FROM meetings WHERE call_id = ? ORDER BY id LIMIT 1", (call_id,)).fetchone()
+        return None if row is None else json.loads(row['event'])
+
+    # Lead searches
+
+    def record_search(self, prompt):
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO searches (prompt, searched_at) VALUES (?, ?)
+                ON CONFLICT (prompt) DO UPDATE SET runs = runs + 1, searched_at = excluded.searched_at
+            """, (prompt, time.time()))
+
+    def recent_searches(self, limit=5):
+        """Lead search prompts run before, most recent first."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT prompt FROM searches ORDER BY searched_at DESC LIMIT ?", (limit,)).fetchall()
+        return [row['prompt'] for row in rows]
+
+    # Analysis queue
+
+    def enqueue_analysis(self, call_id, details=None):
+        """Queue a call for analysis; a call whose analysis failed for good is queued afresh."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO analysis_jobs (call_id, details, enqueued_at, next_attempt_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(call_id) DO UPDATE SET
+                    state = 'pending', attempts = 0, details = excluded.details, next_attempt_at = excluded.next_attempt_at
+                WHERE analysis_jobs.state = 'failed'
+            """, (call_id, json.dumps(details or {}), now, now))
+
+    def claim_analysis_jobs(self, limit, owner, lease):
+        """Lease up to ``limit`` due jobs to ``owner`` for ``lease`` seconds and return them, oldest first.
+
+        Due jobs are pending ones whose retry time has come and running ones
+        whose lease ran out because the process holding them died.
+        """
+        now = time.time()
+        due = "(state = 'pending' AND next_attempt_at <= :now) OR (state = 'running' AND locked_until <= :now)"
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT * FROM analysis_jobs WHERE {due} ORDER BY next_attempt_at LIMIT :limit",
+                                {'now': now, 'limit': limit}).fetchall()
+            # Another process may have claimed a row between the SELECT and the UPDATE
+            claimed = [row for row in rows if conn.execute(f"""
+                UPDATE analysis_jobs SET state = 'running', attempts = attempts + 1, lease_owner = :owner,
+                    locked_until = :until
+                WHERE call_id = :call_id AND ({due})
+            """, {'now': now, 'owner': owner, 'until': now + lease, 'call_id': row['call_id']}).rowcount]
+        return [dict(row, attempts=row['attempts'] + 1, details=json.loads(row['details'])) for row in claimed]
+
+    def renew_analysis_leases(self, call_ids, owner, lease):
+        """Extend ``owner``'s leases on ``call_ids``; returns the call IDs it still holds."""
+        held = set()
+        with self._connect() as conn:
+            for call_id in call_ids:
+                if conn.execute("""
+                    UPDATE analysis_jobs SET locked_until = ?
+                    WHERE call_id = ? AND state = 'running' AND lease_owner = ?
+                """, (time.time() + lease, call_id, owner)).rowcount:
+                    held.add(call_id)
+        return held
+
+    def retry_analysis_job(self, call_id, error, delay, owner):
+        with self._connect() as conn:
+            conn.execute("""
+                UPDATE analysis_jobs SET state = 'pending', last_error = ?, next_attempt_at = ?
+                WHERE call_id = ? AND state = 'running' AND lease_owner = ?
+            """, (error, time.time() + delay, call_id, owner))
+
+    def finish_analysis_job(self, call_id, owner, state='done', error=''):
+        with self._connect() as conn:
+            conn.execute("""
+                UPDATE analysis_jobs SET state = ?, last_error = ?
+                WHERE call_id = ? AND state = 'running' AND lease_owner = ?
+            """, (state, error, call_id, owner))
+
+    def next_analysis_due(self):
+        """When the next job becomes claimable: a retry falling due or a lease running out."""
+        with self._connect() as conn:
+            row = conn.execute("""
+                SELECT MIN(CASE state WHEN 'pending' THEN next_attempt_at ELSE locked_until END)
+                FROM analysis_jobs WHERE state IN ('pending', 'running')
+            """).fetchone()
+        return row[0]
+
+    def analysis_queue_depth(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM analysis_jobs WHERE state IN ('pending', 'running')").fetchone()[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_lead_store():
+    """Process-wide LeadStore on LEAD_DB_PATH."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LeadStore()
+        return _store
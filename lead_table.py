@@ -0,0 +1,178 @@
+import math
+import os
+
+from experiments.models import Company, SalesContact, parse_funding, parse_year
+from lead_store import LEAD_COLUMNS
+
+# Rows shown per page of the Step 3 grid
+LEAD_PAGE_SIZE = int(os.getenv('LEAD_PAGE_SIZE', '50'))
+# File formats lead lists can be imported from and exported to, by extension
+LEAD_FILE_FORMATS = {'.parquet': 'parquet', '.pq': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow'}
+
+
+class LeadTable:
+    """The Step 3 lead list with a name index and page slicing.
+
+    Rows stay in an Arrow table, memory-mapped when the list was loaded
+    from a file, and only the current page or a looked-up row is turned
+    into Python objects. Notes edited in the session are kept beside the
+    table rather than written into it, so the cost of an interaction does
+    not grow with the number of leads.
+    """
+
+    def __init__(self, data):
+        self.table = data if _is_arrow(data) else _to_arrow(data)
+        self._positions = {name: i for i, name in enumerate(self.table.column("Name").to_pylist())}
+        self._notes = {}
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def position(self, name):
+        return self._positions.get(name)
+
+    def row(self, name):
+        """The lead named ``name`` as a dict of its columns, or None."""
+        position = self._positions.get(name)
+        if position is None:
+            return None
+        row = self.table.slice(position, 1).to_pylist()[0]
+        row["Notes"] = self._notes.get(name, row["Notes"])
+        return row
+
+    def set_notes(self, name, notes):
+        if name in self._positions:
+            self._notes[name] = notes
+
+    def column(self, name):
+        """Every value of column ``name``, in order; Notes include the edits made in this session."""
+        values = self.table.column(name).to_pylist()
+        if name == "Notes" and self._notes:
+            values = [self._notes.get(lead, notes) for lead, notes in zip(self.table.column("Name").to_pylist(), values)]
+        return values
+
+    def to_arrow(self):
+        """The whole list as an Arrow table, with the session's Notes edits applied."""
+        if not self._notes:
+            return self.table
+        import pyarrow as pa
+        return self.table.set_column(self.table.column_names.index("Notes"), "Notes", pa.array(self.column("Notes"), pa.string()))
+
+    def page_count(self, page_size=LEAD_PAGE_SIZE):
+        return max(1, math.ceil(len(self) / page_size))
+
+    def page_of(self, name, page_size=LEAD_PAGE_SIZE):
+        """Zero-based page holding ``name``, or None if it is not in the table."""
+        position = self._positions.get(name)
+        return None if position is None else position // page_size
+
+    def page(self, number, page_size=LEAD_PAGE_SIZE):
+        """Rows of zero-based page ``number`` as a DataFrame; only those rows are converted."""
+        start = min(max(number, 0), self.page_count(page_size) - 1) * page_size
+        page = self.table.slice(start, page_size).to_pandas()
+        if self._notes:
+            page["Notes"] = [self._notes.get(name, notes) for name, notes in zip(page["Name"], page["Notes"])]
+        return page
+
+
+def _is_arrow(data):
+    return type(data).__module__.startswith("pyarrow")
+
+def _to_arrow(df):
+    """A Step 3 DataFrame as an Arrow table of text columns."""
+    import pyarrow as pa
+    df = df.reset_index(drop=True)
+    return pa.table({column: pa.array(["" if value is None else str(value) for value in df[column]], pa.string())
+                     if column in df.columns else pa.array([""] * len(df), pa.string())
+                     for column in LEAD_COLUMNS})
+
+
+def lead_file_format(filename):
+    fmt = LEAD_FILE_FORMATS.get(os.path.splitext(str(filename))[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported lead file {filename!r}; use one of {', '.join(sorted(LEAD_FILE_FORMATS))}")
+    return fmt
+
+def read_lead_file(source, filename=None):
+    """Load a Parquet or Arrow IPC lead list as a Step 3 Arrow table.
+
+    ``source`` is a path, which is memory-mapped rather than read into
+    memory, or an uploaded file or bytes, whose buffer is used without
+    copying. Columns are matched by their Step 3 names; missing ones are
+    left empty and unknown ones ignored. Text columns without nulls are
+    kept as they are, so a memory-mapped file stays mapped instead of
+    being copied.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    if isinstance(source, (str, os.PathLike)):
+        fmt = lead_file_format(filename or source)
+        if fmt == 'arrow':
+            table = pa.ipc.open_file(pa.memory_map(str(source))).read_all()
+        else:
+            table = pq.read_table(str(source), memory_map=True)
+    else:
+        fmt = lead_file_format(filename or getattr(source, 'name', ''))
+        buffer = pa.py_buffer(source.getbuffer() if hasattr(source, 'getbuffer') else source)
+        if fmt == 'arrow':
+            table = pa.ipc.open_file(pa.BufferReader(buffer)).read_all()
+        else:
+            table = pq.read_table(pa.BufferReader(buffer))
+
+    if "Name" not in table.column_names:
+        raise ValueError("The lead file has no Name column")
+    columns = []
+    for name in LEAD_COLUMNS:
+        if name not in table.column_names:
+            columns.append(pa.nulls(table.num_rows, pa.string()).fill_null(""))
+            continue
+        column = table.column(name)
+        if not pa.types.is_string(column.type):
+            column = pc.cast(column, pa.string())
+        columns.append(column.fill_null("") if column.null_count else column)
+    table = pa.table(columns, names=LEAD_COLUMNS)
+
+    # Rows without a name are dropped and a repeated name keeps its first row
+    seen = set()
+    keep = []
+    for name in table.column("Name").to_pylist():
+        keep.append(bool(name.strip()) and name not in seen)
+        seen.add(name)
+    return table if all(keep) else table.filter(pa.array(keep))
+
+def write_lead_file(leads, fmt='parquet'):
+    """Serialize a Step 3 Arrow table or DataFrame to Parquet or Arrow IPC bytes."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Every column as text, so mixed int/str cells like Year Founded round-trip
+    table = (leads if _is_arrow(leads) else _to_arrow(leads)).select(LEAD_COLUMNS)
+    sink = pa.BufferOutputStream()
+    if fmt == 'arrow':
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, sink, compression='zstd')
+    return sink.getvalue().to_pybytes()
+
+def lead_companies(table):
+    """Companies for the rows of a Step 3 Arrow table, for storing an imported list.
+
+    Converted one record batch at a time, so a large list is never held as
+    Python objects all at once.
+    """
+    for batch in table.select(LEAD_COLUMNS).to_batches():
+        for row in batch.to_pylist():
+            yield Company(name=row["Name"], size=row["Size"], funding=parse_funding(row["Funding"] or None),
+                          founded=parse_year(row["Year Founded"]), head_office=row["Head Office Location"],
+                          sales_dept=SalesContact(email=row["Sales Email"], phone=row["Sales Phone"]))
+
+def lead_notes(table):
+    """The Notes of every row of a Step 3 Arrow table, in the order of :func:`lead_companies`."""
+    for batch in table.select(["Notes"]).to_batches():
+        yield from batch.column(0).to_pylist()
@@ -0,0 +1,139 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from experiments.models import format_funding, validate_company
+from json_stream import iter_json_objects
+from lead_store import LEAD_COLUMNS, get_lead_store
+from llm import complete, stream_complete
+
+# Number of companies enriched at the same time
+LEAD_ENRICH_WORKERS = int(os.getenv('LEAD_ENRICH_WORKERS', '8'))
+
+def company_names_prompt(prompt):
+    return f"{prompt}\n\nReturn only a JSON array with one object per company, like [{{\"name\": \"Company A\"}}, {{\"name\": \"Company B\"}}], and nothing else besides the JSON text."
+
+def enrichment_prompt(company_name, search_prompt):
+    return f"The company {company_name} came up in a search for: {search_prompt}. Return me the company name, LinkedIn link (only link), company URL (only link), company size (only approximate number), funding (only dollar amount in approx like $260K or $57M or $1.4B), year founded (only year), and head office location (in city/state/country format). Return me contact of their sales dept (email and phone). Return a single JSON object with the keys name, linkedin, url, size, funding, founded, head_office and sales_dept (with email and phone) and nothing else besides the JSON text."
+
+def _company_objects(obj):
+    # Some responses wrap the companies in an object such as {"companies": [...]}
+    if isinstance(obj, dict) and "name" not in obj:
+        for value in obj.values():
+            if isinstance(value, list) and all(isinstance(item, dict) for item in value):
+                return value
+    return [obj] if isinstance(obj, dict) else []
+
+def company_row(company):
+    return [
+        company.name,
+        company.size,
+        format_funding(company.funding),
+        company.founded or "",
+        company.head_office,
+        company.sales_dept.email,
+        company.sales_dept.phone,
+        ""  # Empty Notes column
+    ]
+
+def iter_companies(chunks):
+    """Yield a validated Company for every usable company object in a stream of LLM output.
+
+    Objects that fail validation are skipped and an unterminated final object
+    is salvaged when possible, so one bad entry never costs the whole batch.
+    """
+    for obj in iter_json_objects(chunks):
+        for data in _company_objects(obj):
+            company = validate_company(data)
+            if company is not None:
+                yield company
+
+def leads_dataframe(rows):
+    return pd.DataFrame(rows, columns=LEAD_COLUMNS)
+
+def iter_company_names(prompt):
+    """Yield each distinct candidate company name as soon as the search completion produces it."""
+    seen = set()
+    for obj in iter_json_objects(stream_complete(company_names_prompt(prompt))):
+        for data in _company_objects(obj):
+            name = str(data.get("name") or "").strip()
+            if name and name.lower() not in seen:
+                seen.add(name.lower())
+                yield name
+
+def enrich_company(company_name, search_prompt):
+    """Return the validated Company details for one candidate, or None if the response is unusable."""
+    for obj in iter_json_objects([complete(enrichment_prompt(company_name, search_prompt))]):
+        for data in _company_objects(obj):
+            if not data.get("name"):
+                data["name"] = company_name
+            company = validate_company(data)
+            if company is not None:
+                return company
+    return None
+
+def _enrich_and_store(company_name, search_prompt, store):
+    company = enrich_company(company_name, search_prompt)
+    if company is None:
+        return None
+    # Read back the stored lead so a duplicate resolves to the name already on file
+    return store.get_company(store.upsert_company(company))
+
+def iter_company_details(prompt, on_research=None, max_workers=LEAD_ENRICH_WORKERS, store=None):
+    """Yield a table row for each company as soon as its enrichment finishes.
+
+    Candidate names come from a single structured completion; each one is
+    handed to a bounded worker pool as soon as it streams in, so enrichment
+    overlaps with the search and with the other companies. Companies already
+    in the lead store are returned from it without being researched again,
+    and newly enriched ones are upserted into it. A company whose enrichment
+    fails is left out without affecting the rest.
+    ``on_research`` is called with the candidate names found so far.
+    """
+    store = store or get_lead_store()
+    names = []
+    pending = set()
+    found = False
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lead-enrich')
+    try:
+        for name in iter_company_names(prompt):
+            names.append(name)
+            if on_research is not None:
+                on_research("Researching " + ", ".join(names))
+            known = store.find_known([name]).get(name)
+            if known is not None:
+                found = True
+                yield company_row(known)
+                continue
+            # Carry the caller's context (rate limit priority, current span) into the worker
+            pending.add(pool.submit(contextvars.copy_context().run, _enrich_and_store, name, prompt, store))
+            for future in [future for future in pending if future.done()]:
+                pending.discard(future)
+                row = _finished_row(future)
+                if row is not None:
+                    found = True
+                    yield row
+
+        for future in as_completed(pending):
+            row = _finished_row(future)
+            if row is not None:
+                found = True
+                yield row
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if not found:
+        raise ValueError("No valid company details found in the response")
+
+def _finished_row(future):
+    try:
+        company = future.result()
+    except Exception:
+        return None
+    return None if company is None else company_row(company)
+
+# Define the function to fetch company details
+def fetch_company_details(prompt):
+    return leads_dataframe(list(iter_company_details(prompt)))
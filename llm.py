@@ -0,0 +1,435 @@
+import contextvars
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dotenv import load_dotenv
+
+import http_client
+from http_client import HTTP_CONNECT_TIMEOUT, HTTP_MAX_RETRIES, HTTP_READ_TIMEOUT
+from llm_cache import LLMCache
+from rate_limit import estimate_tokens, get_limiter
+from tracing import span, start_span
+
+# Load environment variables from .env file
+load_dotenv()
+
+together_api_key = os.getenv("TOGETHER_API_KEY")
+TOGETHER_API_URL = os.getenv("TOGETHER_API_URL", "https://api.together.ai/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "meta-llama/Llama-3-8b-chat-hf")
+LLM_CACHE_DISABLED = os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+# Models tried in turn when the one before fails; "model@base_url" sends a model to another endpoint
+LLM_FALLBACK_MODELS = [entry.strip() for entry in os.getenv("LLM_FALLBACK_MODELS", "").split(",") if entry.strip()]
+# A duplicate request is sent once a completion runs longer than this percentile of recent ones
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# Hedge delay used until LLM_HEDGE_MIN_SAMPLES completions have been timed, and the shortest ever used
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "10"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Hedged requests allowed per completion, saved up to LLM_HEDGE_BURST; 0 turns hedging off
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+LLM_HEDGE_BURST = float(os.getenv("LLM_HEDGE_BURST", "5"))
+# Give up on a completion after this many seconds, whatever is still running
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "120"))
+# An attempt whose stream goes quiet for this long is treated as stuck
+LLM_STALL_TIMEOUT = float(os.getenv("LLM_STALL_TIMEOUT", "30"))
+# Retries of a single attempt before the next model is tried
+LLM_ATTEMPT_RETRIES = int(os.getenv("LLM_ATTEMPT_RETRIES", "1"))
+
+_lock = threading.Lock()
+_client = None
+_cache = None
+_dispatcher = None
+
+def get_client():
+    global _client
+    with _lock:
+        if _client is None:
+            # Imported here so pages that never call the LLM do not pay for the SDK
+            from together import Together
+            _client = Together(api_key=together_api_key, base_url=TOGETHER_API_URL, timeout=HTTP_READ_TIMEOUT, max_retries=HTTP_MAX_RETRIES)
+        return _client
+
+def get_cache():
+    global _cache
+    if LLM_CACHE_DISABLED:
+        return None
+    with _lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+def get_dispatcher():
+    global _dispatcher
+    with _lock:
+        if _dispatcher is None:
+            endpoints = [(LLM_MODEL, TOGETHER_API_URL)]
+            for entry in LLM_FALLBACK_MODELS:
+                model, _, url = entry.partition("@")
+                endpoints.append((model, url.rstrip("/") or TOGETHER_API_URL))
+            _dispatcher = CompletionDispatcher(endpoints)
+        return _dispatcher
+
+def chat_completion(messages, model=LLM_MODEL, **params):
+    """Return the completion text for ``messages``, served from the response cache when possible."""
+    cache = get_cache()
+    key = LLMCache.make_key(model, messages, params)
+    with span('together.chat', 'together', model=model, request_bytes=_payload_bytes(messages)) as completion:
+        if cache is not None:
+            cached = cache.get(key)
+            completion.set(cache='miss' if cached is None else 'hit')
+            if cached is not None:
+                return cached
+
+        estimate = estimate_tokens(messages, params.get('max_tokens'))
+        content, usage, served_by = get_dispatcher().complete(messages, model=model, **params)
+        if served_by != model:
+            completion.set(served_by=served_by)
+        _record_usage(completion, usage, content, estimate)
+
+    if cache is not None and content:
+        # A fallback model's answer is no answer from ``model``; it is cached under the model that gave it
+        cache.set(key if served_by == model else LLMCache.make_key(served_by, messages, params), content)
+    return content
+
+def stream_chat_completion(messages, model=LLM_MODEL, **params):
+    """Yield the completion text for ``messages`` piece by piece as tokens arrive.
+
+    A cached completion is yielded in one piece; a fresh one is cached once
+    the stream has been consumed to the end, under the model that answered.
+    """
+    cache = get_cache()
+    key = LLMCache.make_key(model, messages, params)
+    # Not made current: the generator may be resumed from another context
+    completion = start_span('together.chat_stream', 'together', model=model, request_bytes=_payload_bytes(messages))
+    if cache is not None:
+        cached = cache.get(key)
+        completion.set(cache='miss' if cached is None else 'hit')
+        if cached is not None:
+            completion.end()
+            yield cached
+            return
+
+    pieces = []
+    estimate = estimate_tokens(messages, params.get('max_tokens'))
+    # Raced across endpoints like chat_completion until the first token, then read from the winner
+    stream = get_dispatcher().stream(messages, model=model, **params)
+    try:
+        while True:
+            try:
+                delta = next(stream)
+            except StopIteration as result:
+                usage, served_by = result.value
+                break
+            if not pieces:
+                completion.set(first_token_seconds=round(completion.elapsed(), 4))
+            pieces.append(delta)
+            yield delta
+    except GeneratorExit:
+        # The caller stopped reading early; not a failure
+        completion.end()
+        raise
+    except BaseException as e:
+        completion.end(error=e)
+        raise
+    finally:
+        stream.close()
+
+    content = "".join(pieces)
+    if served_by != model:
+        completion.set(served_by=served_by)
+    _record_usage(completion, usage, content, estimate)
+    completion.end()
+    if cache is not None and content:
+        cache.set(key if served_by == model else LLMCache.make_key(served_by, messages, params), content)
+
+def _payload_bytes(messages):
+    return sum(len(str(message.get('content', '')).encode('utf-8')) for message in messages)
+
+def _usage(usage, key):
+    # The SDK reports usage as an object, the REST API as a dict
+    return usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+
+def _approximate_usage(messages, content):
+    prompt_tokens = _payload_bytes(messages) // 4
+    completion_tokens = len(content.encode('utf-8')) // 4
+    return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens, 'total_tokens': prompt_tokens + completion_tokens}
+
+def _record_usage(completion, usage, content, estimate=0):
+    completion.add(response_bytes=len((content or '').encode('utf-8')))
+    if usage is not None:
+        completion.set(prompt_tokens=_usage(usage, 'prompt_tokens'), completion_tokens=_usage(usage, 'completion_tokens'))
+        # Settle the rate limiter's token budget against what the call really used
+        total = _usage(usage, 'total_tokens')
+        if total:
+            get_limiter('together').charge(total - estimate)
+
+def complete(prompt, **params):
+    return chat_completion([{"role": "user", "content": prompt}], **params)
+
+def stream_complete(prompt, **params):
+    return stream_chat_completion([{"role": "user", "content": prompt}], **params)
+
+
+class CompletionDispatcher:
+    """Sends each completion to the first model that answers, hedging the slow ones.
+
+    ``endpoints`` is an ordered list of ``(model, base_url)``. A completion
+    goes to the first; once it has run longer than the hedge percentile of
+    that model's recent completions a duplicate is sent, the first answer
+    wins and the other attempt is cancelled by closing its stream. An
+    attempt that fails, stalls or comes back empty moves the completion on
+    to the next endpoint. Hedges draw on a budget refilled by a fraction of
+    every completion, so they can never add more than that fraction to the
+    number of requests made. :meth:`stream` races the same way until the
+    first token arrives and then reads on from the attempt that sent it.
+    """
+
+    def __init__(self, endpoints, hedge_percentile=LLM_HEDGE_PERCENTILE, hedge_budget=LLM_HEDGE_BUDGET,
+                 hedge_burst=LLM_HEDGE_BURST, deadline=LLM_DEADLINE, window=200):
+        self.endpoints = list(endpoints)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.hedge_burst = hedge_burst
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self._window = window
+        self._latencies = {}
+        self._budget = hedge_burst
+        self._stats = dict.fromkeys(('completions', 'hedges', 'hedge_wins', 'hedges_denied', 'failovers', 'failures'), 0)
+        self._pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix='llm-attempt')
+        self._attempt_ids = itertools.count()
+
+    def hedge_delay(self, model):
+        """Seconds an attempt on ``model`` may run before it is hedged.
+
+        Streams are timed to their first token, under the key ``(model, 'first_token')``.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies.get(model, ()))
+        if len(latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, latencies[int(self.hedge_percentile / 100 * (len(latencies) - 1))])
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'hedge_budget': round(self._budget, 2)}
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _take_hedge(self):
+        with self._lock:
+            if self._budget < 1:
+                self._stats['hedges_denied'] += 1
+                return False
+            self._budget -= 1
+            self._stats['hedges'] += 1
+            return True
+
+    def _candidates(self, model):
+        if model is None or model == self.endpoints[0][0]:
+            return self.endpoints
+        return [(model, self.endpoints[0][1])] + [endpoint for endpoint in self.endpoints if endpoint[0] != model]
+
+    def complete(self, messages, model=None, **params):
+        """Return ``(content, usage, model)`` of the first successful attempt.
+
+        Raises TimeoutError once the deadline passes and RuntimeError when
+        every endpoint has failed.
+        """
+        candidates = self._candidates(model)
+        with self._lock:
+            self._stats['completions'] += 1
+            self._budget = min(self.hedge_burst, self._budget + self.hedge_budget)
+        deadline = time.monotonic() + self.deadline
+        cancel = threading.Event()
+        running = {}
+        errors = []
+
+        def launch(index, hedge=False):
+            model, url = candidates[index]
+            # Carry the caller's context (rate limit priority, current span) into the worker
+            future = self._pool.submit(contextvars.copy_context().run, self._attempt, model, url, messages, params, cancel, hedge)
+            running[future] = (model, hedge)
+
+        launch(0)
+        primary, primary_started, hedged, next_index = 0, time.monotonic(), False, 1
+        try:
+            while running:
+                now = time.monotonic()
+                if now >= deadline:
+                    self._count('failures')
+                    raise TimeoutError(f"No completion within {self.deadline:g}s from {', '.join(m for m, _ in candidates)}")
+                timeout = deadline - now
+                if not hedged and self.hedge_budget > 0:
+                    timeout = min(timeout, max(0.0, primary_started + self.hedge_delay(candidates[primary][0]) - now))
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    model, hedge = running.pop(future)
+                    try:
+                        content, usage, elapsed = future.result()
+                    except Exception as e:
+                        errors.append(f"{model}: {e}")
+                        continue
+                    with self._lock:
+                        self._latencies.setdefault(model, deque(maxlen=self._window)).append(elapsed)
+                        self._stats['hedge_wins'] += hedge
+                    return content, usage, model
+
+                if not done and not hedged and time.monotonic() < deadline:
+                    hedged = True
+                    if self._take_hedge():
+                        launch(primary, hedge=True)
+                if not running and next_index < len(candidates):
+                    self._count('failovers')
+                    launch(next_index)
+                    primary, primary_started, hedged, next_index = next_index, time.monotonic(), False, next_index + 1
+        finally:
+            # Losing and abandoned attempts stop at their next chunk and close their connection
+            cancel.set()
+        self._count('failures')
+        raise RuntimeError(f"Every model failed: {'; '.join(errors)}")
+
+    def stream(self, messages, model=None, **params):
+        """Yield the completion's text as it arrives; returns ``(usage, model)`` when done.
+
+        Until the first token the attempts race as in :meth:`complete`: a
+        slow one is hedged and a failed or stalled one moves on to the next
+        endpoint. The first attempt to send a token wins, the others are
+        cancelled and the rest of the text comes from it alone; if it fails
+        after that the error is raised, as its text has already been handed
+        out. The deadline covers the whole stream.
+        """
+        candidates = self._candidates(model)
+        with self._lock:
+            self._stats['completions'] += 1
+            self._budget = min(self.hedge_burst, self._budget + self.hedge_budget)
+        started = time.monotonic()
+        deadline = started + self.deadline
+        # (attempt id, text) for every token, (attempt id, None) once an attempt has ended
+        events = queue.Queue()
+        attempts = {}
+        errors = []
+
+        def launch(index, hedge=False):
+            attempt_id, (model, url), cancel = next(self._attempt_ids), candidates[index], threading.Event()
+            future = self._pool.submit(contextvars.copy_context().run, self._attempt, model, url, messages, params, cancel,
+                                       hedge, lambda delta: events.put((attempt_id, delta)))
+            future.add_done_callback(lambda _: events.put((attempt_id, None)))
+            attempts[attempt_id] = (future, model, hedge, cancel)
+
+        launch(0)
+        primary, primary_started, hedged, next_index = 0, started, False, 1
+        winner = None
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= deadline:
+                    self._count('failures')
+                    raise TimeoutError(f"No completion within {self.deadline:g}s from {', '.join(m for m, _ in candidates)}")
+                timeout = deadline - now
+                if winner is None and not hedged and self.hedge_budget > 0:
+                    hedge_at = primary_started + self.hedge_delay((candidates[primary][0], 'first_token'))
+                    timeout = min(timeout, max(0.0, hedge_at - now))
+                try:
+                    attempt_id, delta = events.get(timeout=timeout)
+                except queue.Empty:
+                    if winner is None and not hedged and time.monotonic() < deadline:
+                        hedged = True
+                        if self._take_hedge():
+                            launch(primary, hedge=True)
+                    continue
+
+                if winner is not None:
+                    if attempt_id != winner:
+                        continue
+                    if delta is not None:
+                        yield delta
+                        continue
+                    future, model = attempts[winner][:2]
+                    result = future.result()
+                    if result is None:
+                        raise RuntimeError(f"{model}: stream cancelled")
+                    return result[1], model
+
+                if delta is not None:
+                    # First token: this attempt wins and every other one is abandoned
+                    winner = attempt_id
+                    _, model, hedge, _ = attempts[winner]
+                    for other_id, (_, _, _, cancel) in attempts.items():
+                        if other_id != winner:
+                            cancel.set()
+                    with self._lock:
+                        self._latencies.setdefault((model, 'first_token'), deque(maxlen=self._window)).append(time.monotonic() - started)
+                        self._stats['hedge_wins'] += hedge
+                    yield delta
+                    continue
+
+                future, model, _, _ = attempts.pop(attempt_id)
+                try:
+                    future.result()
+                    errors.append(f"{model}: ended without a token")
+                except Exception as e:
+                    errors.append(f"{model}: {e}")
+                if attempts:
+                    # Another attempt (a hedge) is still racing
+                    continue
+                if next_index >= len(candidates):
+                    self._count('failures')
+                    raise RuntimeError(f"Every model failed: {'; '.join(errors)}")
+                self._count('failovers')
+                launch(next_index)
+                primary, primary_started, hedged, next_index = next_index, time.monotonic(), False, next_index + 1
+        finally:
+            # Losing attempts, and the winner if the caller stopped reading, close their connection
+            for _, _, _, cancel in attempts.values():
+                cancel.set()
+
+    def _attempt(self, model, url, messages, params, cancel, hedge, on_delta=None):
+        # Streamed so that an attempt that lost the race can be abandoned mid-completion
+        payload = {**params, 'model': model, 'messages': messages, 'stream': True}
+        headers = {"Authorization": f"Bearer {together_api_key}", "Content-Type": "application/json"}
+        estimate = estimate_tokens(messages, params.get('max_tokens'))
+        started = time.monotonic()
+        with span('together.attempt', 'together', model=model, hedge=hedge) as attempt:
+            response = http_client.post(f"{url}/chat/completions", json=payload, headers=headers, stream=True,
+                                        provider='together', tokens=estimate, retries=LLM_ATTEMPT_RETRIES,
+                                        timeout=(HTTP_CONNECT_TIMEOUT, LLM_STALL_TIMEOUT))
+            try:
+                if response.status_code != 200:
+                    raise RuntimeError(f"status {response.status_code}: {response.text[:200]}")
+                pieces = []
+                usage = None
+                for line in response.iter_lines(decode_unicode=True):
+                    if cancel.is_set():
+                        attempt.set(cancelled=True)
+                        # Hand back the part of the estimate the abandoned stream never used
+                        get_limiter('together').charge(_approximate_usage(messages, "".join(pieces))['total_tokens'] - estimate)
+                        return None
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    usage = chunk.get('usage') or usage
+                    delta = ((chunk.get('choices') or [{}])[0].get('delta') or {}).get('content')
+                    if delta:
+                        pieces.append(delta)
+                        if on_delta is not None:
+                            on_delta(delta)
+            finally:
+                response.close()
+            content = "".join(pieces)
+            if not content:
+                raise ValueError("empty completion")
+            attempt.add(response_bytes=len(content.encode('utf-8')))
+        # Endpoints that do not report usage on streams still need the rate limiter settled
+        return content, usage or _approximate_usage(messages, content), time.monotonic() - started
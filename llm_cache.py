@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join('.cache', 'llm_cache.sqlite'))
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+# Hit/miss counters and access times are written in one batch at most this often, not on every hit
+LLM_CACHE_FLUSH_INTERVAL = float(os.getenv('LLM_CACHE_FLUSH_INTERVAL', '5'))
+
+
+class LLMCache:
+    """Disk-backed cache of LLM completions shared by every session and process.
+
+    Entries are keyed on the model, messages and sampling parameters, expire
+    after ``ttl`` seconds and are evicted least-recently-used first once the
+    stored responses exceed ``max_bytes``. Hit and miss counters live in the
+    same SQLite file so they add up across processes. A hit is a single read:
+    its counter and access time are buffered and written with the next
+    ``set`` or at most every ``flush_interval`` seconds, and the total size
+    is kept as a running counter instead of summed on every write.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES,
+                 flush_interval=LLM_CACHE_FLUSH_INTERVAL):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._pending_lock = threading.Lock()
+        self._counts = Counter()
+        self._accessed = {}
+        self._flushed_at = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_created_at ON entries (created_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            # Running total of entries.size; summed once for a cache file written before it was kept
+            conn.execute("""
+                INSERT OR IGNORE INTO stats (name, value) VALUES ('bytes', (SELECT COALESCE(SUM(size), 0) FROM entries))
+            """)
+
+    def _connect(self):
+        # sqlite3 connections cannot be shared between threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(model, messages, params=None):
+        payload = json.dumps({'model': model, 'messages': messages, 'params': params or {}}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _note(self, name, key=None, now=None):
+        with self._pending_lock:
+            self._counts[name] += 1
+            if key is not None:
+                self._accessed[key] = now
+            due = time.monotonic() - self._flushed_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    def _take_pending(self):
+        with self._pending_lock:
+            counts, self._counts = self._counts, Counter()
+            accessed, self._accessed = self._accessed, {}
+            self._flushed_at = time.monotonic()
+        return counts, accessed
+
+    def _write_pending(self, conn, counts, accessed):
+        conn.executemany("""
+            INSERT INTO stats (name, value) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+        """, counts.items())
+        conn.executemany("UPDATE entries SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                         [(accessed_at, key) for key, accessed_at in accessed.items()])
+
+    def flush(self):
+        """Write the buffered hit/miss counters and access times."""
+        counts, accessed = self._take_pending()
+        if counts or accessed:
+            with self._connect() as conn:
+                self._write_pending(conn, counts, accessed)
+
+    def get(self, key):
+        now = time.time()
+        row = self._connect().execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        # An expired entry is a miss; the next set() deletes it
+        if row is None or now - row[1] > self.ttl:
+            self._note('misses')
+            return None
+        self._note('hits', key, now)
+        return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        counts, accessed = self._take_pending()
+        with self._connect() as conn:
+            # Access times go in first so eviction sees the latest hits
+            self._write_pending(conn, counts, accessed)
+            replaced = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute("""
+                INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (key, value, size, now, now))
+            self._add_bytes(conn, size - (replaced[0] if replaced else 0))
+            self._evict(conn, now)
+
+    def _add_bytes(self, conn, delta):
+        conn.execute("UPDATE stats SET value = value + ? WHERE name = 'bytes'", (delta,))
+
+    def _evict(self, conn, now):
+        expired = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries WHERE created_at < ?", (now - self.ttl,)).fetchone()[0]
+        if expired:
+            conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl,))
+            self._add_bytes(conn, -expired)
+        total = conn.execute("SELECT value FROM stats WHERE name = 'bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = freed = 0
+        while total - freed > self.max_bytes:
+            oldest = conn.execute("SELECT key, size FROM entries ORDER BY accessed_at LIMIT 100").fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                if total - freed <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                freed += size
+                evicted += 1
+        self._add_bytes(conn, -freed)
+        conn.execute("""
+            INSERT INTO stats (name, value) VALUES ('evictions', ?)
+            ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+        """, (evicted,))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM stats")
+            conn.execute("INSERT INTO stats (name, value) VALUES ('bytes', 0)")
+        self._take_pending()
+
+    def stats(self):
+        self.flush()
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        size = counters.get('bytes', 0)
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'evictions': counters.get('evictions', 0),
+            'entries': entries,
+            'bytes': size,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        }
@@ -0,0 +1,316 @@
+import json
+import os
+import re
+from datetime import datetime, time as dt_time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from timezones import DEFAULT_TIMEZONE
+
+# Below this confidence the structured answers are handed to the LLM instead
+MEETING_CONFIDENCE_THRESHOLD = float(os.getenv('MEETING_CONFIDENCE_THRESHOLD', '0.8'))
+MEETING_DURATION_MINUTES = int(os.getenv('MEETING_DURATION_MINUTES', '30'))
+
+# Order of the questions asked by bland.fetch_call_analysis
+NAME, EMAIL, MEETING_TIME, BUYING_INTENT, SUMMARY = range(5)
+
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+WEEKDAYS = {
+    'monday': 0, 'mon': 0, 'tuesday': 1, 'tue': 1, 'tues': 1, 'wednesday': 2, 'wed': 2,
+    'thursday': 3, 'thu': 3, 'thur': 3, 'thurs': 3, 'friday': 4, 'fri': 4,
+    'saturday': 5, 'sat': 5, 'sunday': 6, 'sun': 6,
+}
+MONTHS = {
+    'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'mar': 3, 'april': 4, 'apr': 4,
+    'may': 5, 'june': 6, 'jun': 6, 'july': 7, 'jul': 7, 'august': 8, 'aug': 8,
+    'september': 9, 'sep': 9, 'sept': 9, 'october': 10, 'oct': 10, 'november': 11, 'nov': 11,
+    'december': 12, 'dec': 12,
+}
+TIMEZONE_ABBREVIATIONS = {
+    'pt': 'America/Los_Angeles', 'pst': 'America/Los_Angeles', 'pdt': 'America/Los_Angeles', 'pacific': 'America/Los_Angeles',
+    'mt': 'America/Denver', 'mst': 'America/Denver', 'mdt': 'America/Denver', 'mountain': 'America/Denver',
+    'ct': 'America/Chicago', 'cst': 'America/Chicago', 'cdt': 'America/Chicago', 'central': 'America/Chicago',
+    'et': 'America/New_York', 'est': 'America/New_York', 'edt': 'America/New_York', 'eastern': 'America/New_York',
+    'gmt': 'UTC', 'utc': 'UTC', 'bst': 'Europe/London', 'cet': 'Europe/Berlin', 'cest': 'Europe/Berlin',
+    'ist': 'Asia/Kolkata',
+}
+# Vague times of day map to a typical slot with reduced confidence
+PARTS_OF_DAY = {'morning': (10, 0), 'afternoon': (14, 0), 'evening': (17, 0), 'noon': (12, 0), 'midday': (12, 0)}
+
+_WEEKDAY_NAMES = '|'.join(sorted(WEEKDAYS, key=len, reverse=True))
+_MONTH_NAMES = '|'.join(sorted(MONTHS, key=len, reverse=True))
+_ORDINAL = r'(?:st|nd|rd|th)?'
+
+_TZ_RE = re.compile(r'\b(' + '|'.join(TIMEZONE_ABBREVIATIONS) + r')\b(?:\s+time)?')
+_ISO_DATE_RE = re.compile(r'\b(\d{4})-(\d{1,2})-(\d{1,2})\b')
+_MONTH_DAY_RE = re.compile(rf'\b({_MONTH_NAMES})\.?\s+(\d{{1,2}}){_ORDINAL}\b(?:,?\s*(\d{{4}}))?')
+_DAY_MONTH_RE = re.compile(rf'\b(\d{{1,2}}){_ORDINAL}\s+(?:of\s+)?({_MONTH_NAMES})\b\.?(?:,?\s*(\d{{4}}))?')
+_NUMERIC_DATE_RE = re.compile(r'\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b')
+# Words that make a bare "3/4" a date rather than a fraction, right before it
+_DATE_CONTEXT_RE = re.compile(rf'\b(?:on|meeting|meet|date|scheduled(?:\s+for)?|{_WEEKDAY_NAMES})\s*[:,]?\s*(?:the\s+)?$')
+_IN_DAYS_RE = re.compile(r'\bin\s+(\d{1,2}|a|one|two|three)\s+(day|week)s?\b')
+_WEEKDAY_RE = re.compile(rf'\b(?:(this|next|coming)\s+)?({_WEEKDAY_NAMES})\b')
+_TIME_12H_RE = re.compile(r'\b(\d{1,2})(?::(\d{2}))?\s*([ap])\.?\s?m\b\.?')
+_TIME_24H_RE = re.compile(r'\b([01]?\d|2[0-3]):([0-5]\d)\b')
+_BARE_HOUR_RE = re.compile(r'\bat\s+(\d{1,2})(?::(\d{2}))?\b(?!\s*/)')
+_PART_OF_DAY_RE = re.compile(r'\b(' + '|'.join(PARTS_OF_DAY) + r')\b')
+_NUMBER_WORDS = {'a': 1, 'one': 1, 'two': 2, 'three': 3}
+
+
+def _build_date(year, month, day):
+    try:
+        return datetime(year, month, day).date()
+    except ValueError:
+        return None
+
+def _upcoming(reference_date, month, day, year=None):
+    """The date for a month/day, rolled into next year when it has already passed."""
+    if year is not None:
+        return _build_date(year, month, day)
+    candidate = _build_date(reference_date.year, month, day)
+    if candidate is not None and candidate < reference_date - timedelta(days=7):
+        candidate = _build_date(reference_date.year + 1, month, day)
+    return candidate
+
+def _calendar_date(text, reference_date):
+    """A date written out in full: ISO, with a month name, or numeric with a year."""
+    match = _ISO_DATE_RE.search(text)
+    if match:
+        return _build_date(*map(int, match.groups())), 1.0
+    match = _MONTH_DAY_RE.search(text)
+    if match:
+        year = int(match.group(3)) if match.group(3) else None
+        return _upcoming(reference_date, MONTHS[match.group(1)], int(match.group(2)), year), 1.0
+    match = _DAY_MONTH_RE.search(text)
+    if match:
+        year = int(match.group(3)) if match.group(3) else None
+        return _upcoming(reference_date, MONTHS[match.group(2)], int(match.group(1)), year), 1.0
+    return _numeric_date(text, reference_date, with_year=True)
+
+def _numeric_date(text, reference_date, with_year):
+    """A US month/day date such as 3/4 or 3/4/2025.
+
+    Without a year a fraction ("1/2 of the team") or a ratio ("24/7") reads
+    the same, so a bare month/day only counts right after "on", "meeting" or
+    "date", and slashed numbers that are no valid date are skipped.
+    """
+    for match in _NUMERIC_DATE_RE.finditer(text):
+        month, day, year = match.groups()
+        if (year is not None) != with_year:
+            continue
+        if year is None and not _DATE_CONTEXT_RE.search(text, 0, match.start()):
+            continue
+        if year is not None:
+            year = int(year) + (2000 if len(year) == 2 else 0)
+        date = _upcoming(reference_date, int(month), int(day), year)
+        if date is not None:
+            # Slightly less certain than a spelled-out month
+            return date, 0.9
+    return None, 0.0
+
+def _relative_date(text, reference_date):
+    """A date given relative to the call: tomorrow, a weekday, in two days, next week."""
+    if 'day after tomorrow' in text:
+        return reference_date + timedelta(days=2), 1.0
+    if re.search(r'\b(tomorrow|tmrw)\b', text):
+        return reference_date + timedelta(days=1), 1.0
+    if re.search(r'\b(today|tonight|this afternoon|this morning|this evening)\b', text):
+        return reference_date, 1.0
+    match = _WEEKDAY_RE.search(text)
+    if match:
+        modifier, name = match.groups()
+        weekday = WEEKDAYS[name]
+        days_ahead = (weekday - reference_date.weekday()) % 7
+        if modifier == 'next':
+            # "next Friday" is read as Friday of the following week
+            monday = reference_date - timedelta(days=reference_date.weekday())
+            return monday + timedelta(days=7 + weekday), 0.85
+        return reference_date + timedelta(days=days_ahead or 7), 0.95
+    match = _IN_DAYS_RE.search(text)
+    if match:
+        count, unit = match.groups()
+        count = _NUMBER_WORDS.get(count) or int(count)
+        days = count * (7 if unit == 'week' else 1)
+        return reference_date + timedelta(days=days), 0.9 if unit == 'day' else 0.5
+    if re.search(r'\bnext week\b', text):
+        monday = reference_date - timedelta(days=reference_date.weekday())
+        return monday + timedelta(days=7), 0.4
+    return None, 0.0
+
+def _parse_date(text, reference_date):
+    """Return ``(date, confidence)`` for the date mentioned in ``text``.
+
+    Full dates win, then relative phrases and weekdays, and only then a bare
+    month/day. A date that falls on another weekday than one named in the
+    same text is kept with a confidence below the LLM threshold.
+    """
+    date, confidence = _calendar_date(text, reference_date)
+    if date is None:
+        date, confidence = _relative_date(text, reference_date)
+    numeric, _ = _numeric_date(text, reference_date, with_year=False)
+    if date is None:
+        date, confidence = numeric, 0.9 if numeric else 0.0
+    elif numeric is not None and numeric != date:
+        confidence = min(confidence, 0.5)
+    match = _WEEKDAY_RE.search(text)
+    if date is not None and match and date.weekday() != WEEKDAYS[match.group(2)]:
+        confidence = min(confidence, 0.5)
+    return date, confidence
+
+def _parse_time(text):
+    """Return ``(time, confidence)`` for the first time of day mentioned in ``text``."""
+    match = _TIME_12H_RE.search(text)
+    if match:
+        hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+        if 1 <= hour <= 12 and minute < 60:
+            hour = hour % 12 + (12 if meridiem == 'p' else 0)
+            return dt_time(hour, minute), 1.0
+    match = _TIME_24H_RE.search(text)
+    if match:
+        return dt_time(int(match.group(1)), int(match.group(2))), 0.95
+    match = _BARE_HOUR_RE.search(text)
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2) or 0)
+        if 1 <= hour <= 12 and minute < 60:
+            # No am/pm given: assume business hours, 8-11 in the morning, 12-7 afternoon
+            hour = hour + 12 if hour < 8 else hour
+            return dt_time(hour, minute), 0.8
+    match = _PART_OF_DAY_RE.search(text)
+    if match:
+        hour, minute = PARTS_OF_DAY[match.group(1)]
+        return dt_time(hour, minute), 1.0 if match.group(1) in ('noon', 'midday') else 0.5
+    return None, 0.0
+
+def parse_meeting_time(text, reference, time_zone=DEFAULT_TIMEZONE):
+    """Resolve a spoken meeting time like "next Tuesday at 2pm PT" to a datetime.
+
+    Relative dates are anchored to ``reference``, the moment the call took
+    place; times without a zone are read in ``time_zone``, the lead's local
+    zone. Returns ``(start, confidence)`` where ``start`` is timezone-aware
+    and ``confidence`` falls between 0 and 1; ``start`` is None when nothing
+    usable was found.
+    """
+    if not text:
+        return None, 0.0
+    text = text.lower()
+    match = _TZ_RE.search(text)
+    zone = ZoneInfo(TIMEZONE_ABBREVIATIONS[match.group(1)] if match else time_zone)
+    if reference.tzinfo is None:
+        reference = reference.replace(tzinfo=zone)
+    local_reference = reference.astimezone(zone)
+
+    date, date_confidence = _parse_date(text, local_reference.date())
+    time_of_day, time_confidence = _parse_time(text)
+    if date is None and time_of_day is None:
+        return None, 0.0
+    if date is None:
+        # A bare time is the next occurrence of that time
+        date = local_reference.date()
+        if datetime.combine(date, time_of_day, zone) <= local_reference:
+            date += timedelta(days=1)
+        date_confidence = 0.4
+    if time_of_day is None:
+        time_of_day, time_confidence = dt_time(10, 0), 0.4
+
+    start = datetime.combine(date, time_of_day, zone)
+    confidence = min(date_confidence, time_confidence)
+    if start <= reference:
+        confidence = 0.0
+    return start, confidence
+
+def valid_email(text):
+    match = EMAIL_PATTERN.search(text or '')
+    return match.group(0).rstrip('.').lower() if match else ''
+
+def _answer(answers, index):
+    if index < len(answers) and answers[index] is not None:
+        return str(answers[index]).strip()
+    return ''
+
+def build_event(start, time_zone, summary='', description='', attendee_email='',
+                duration_minutes=MEETING_DURATION_MINUTES):
+    """A Calendar ``events.insert`` body in the same shape the LLM is asked to produce."""
+    end = start + timedelta(minutes=duration_minutes)
+    event = {
+        'summary': summary,
+        'description': description,
+        'start': {'dateTime': start.isoformat(), 'timeZone': time_zone},
+        'end': {'dateTime': end.isoformat(), 'timeZone': time_zone},
+        'attendees': [{'email': attendee_email}] if attendee_email else [],
+        'reminders': {
+            'useDefault': False,
+            'overrides': [
+                {'method': 'email', 'minutes': 24 * 60},
+                {'method': 'popup', 'minutes': 10},
+            ],
+        },
+    }
+    return event
+
+def event_from_answers(answers, call_time, time_zone=DEFAULT_TIMEZONE, company_name=''):
+    """Build a meeting from the structured Bland answers without an LLM.
+
+    Returns ``(event, confidence)``; ``event`` is None when no meeting time
+    could be resolved.
+    """
+    meeting_time = _answer(answers, MEETING_TIME)
+    call_summary = _answer(answers, SUMMARY)
+    start, confidence = parse_meeting_time(meeting_time, call_time, time_zone)
+    if start is None:
+        start, confidence = parse_meeting_time(call_summary, call_time, time_zone)
+        confidence *= 0.9
+    if start is None:
+        return None, 0.0
+
+    email = valid_email(_answer(answers, EMAIL)) or valid_email(call_summary)
+    if not email:
+        # Without an attendee the invite never reaches the lead
+        confidence *= 0.7
+    contact = _answer(answers, NAME)
+    title = f"Meeting with {contact}" if contact else "Sales meeting"
+    if company_name:
+        title = f"{title} ({company_name})"
+    description = call_summary
+    buying_intent = _answer(answers, BUYING_INTENT)
+    if buying_intent:
+        description = f"{description}\n\nBuying intent: {buying_intent}".strip()
+    event = build_event(start, start.tzinfo.key, title, description, email)
+    return event, confidence
+
+def extract_meeting(analysis, call_time, time_zone=DEFAULT_TIMEZONE, company_name='',
+                    threshold=MEETING_CONFIDENCE_THRESHOLD):
+    """Return the Calendar event for a finished call and how it was extracted.
+
+    The structured answers are parsed locally first; only when the result is
+    below ``threshold`` is the call summary sent to the LLM, anchored to the
+    call time and the lead's timezone. Returns ``(event, source)`` with
+    ``source`` either ``'answers'`` or ``'llm'``.
+    """
+    answers = (analysis or {}).get('answers') or []
+    event, confidence = event_from_answers(answers, call_time, time_zone, company_name)
+    if event is not None and confidence >= threshold:
+        return event, 'answers'
+
+    from scheduling import extract_event_details_with_ai
+
+    summary = _answer(answers, SUMMARY) or ' '.join(str(answer) for answer in answers if answer)
+    return extract_event_details_with_ai(summary, reference_time=call_time, time_zone=time_zone), 'llm'
+
+def meeting_for_lead(store, company_name, summary, time_zone=DEFAULT_TIMEZONE):
+    """Extract the meeting for a lead from its latest analysed call, else from ``summary``.
+
+    Returns ``(event, call_id)``; ``call_id`` is None when only the notes were used.
+    """
+    for call in store.calls_for(company_name):
+        if not call['analysis']:
+            continue
+        analysis = json.loads(call['analysis'])
+        if 'error' in analysis:
+            continue
+        call_time = datetime.fromtimestamp(call['started_at'], timezone.utc)
+        event, _ = extract_meeting(analysis, call_time, time_zone, company_name)
+        return event, call['call_id']
+
+    from scheduling import extract_event_details_with_ai
+
+    return extract_event_details_with_ai(summary, time_zone=time_zone), None
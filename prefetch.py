@@ -0,0 +1,197 @@
+import contextvars
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from rate_limit import BATCH, priority
+from tracing import span
+
+# Background threads shared by every session's prefetching
+PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', '4'))
+# Run the rep's latest lead search again ahead of Step 3; off by default, it spends search and LLM quota on a guess
+PREFETCH_LAST_SEARCH = os.getenv('PREFETCH_LAST_SEARCH', '').lower() in ('1', 'true', 'yes')
+# Saved leads whose call task is built ahead of time, most recently updated first
+PREFETCH_TASK_LEADS = int(os.getenv('PREFETCH_TASK_LEADS', '200'))
+PREFETCH_DISABLED = os.getenv('PREFETCH_DISABLED', '').lower() in ('1', 'true', 'yes')
+
+_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='prefetch')
+_warm_lock = threading.Lock()
+_warmed = False
+
+def knowledge_base_version(knowledge_base):
+    return hashlib.sha256(knowledge_base.encode('utf-8')).hexdigest()
+
+def warm_clients():
+    """Import the Step 3 modules and open the API clients once per process."""
+    global _warmed
+    with _warm_lock:
+        if _warmed:
+            return
+        _warmed = True
+    import http_client
+    from bland import BLAND_API_URL
+    from llm import get_cache, get_client
+    # Step 3's modules, so its first rerun does not pay for importing them
+    import dialer
+    import lead_table
+    import leads
+    with span('prefetch.warm', 'prefetch'):
+        get_client()
+        get_cache()
+        # A first request puts a live keep-alive connection in the pool; its answer does not matter
+        try:
+            http_client.get_session(BLAND_API_URL).head(BLAND_API_URL, timeout=http_client.HTTP_TIMEOUT)
+        except Exception:
+            pass
+
+
+class Prefetcher:
+    """Work started for one session while its rep reads the knowledge base in Step 2.
+
+    Everything runs at batch priority on a shared pool, so it never holds up
+    a rep's own calls. The API clients are warmed and the call task of every
+    saved or found lead is built, keyed by lead id and knowledge base version
+    and served only while the stored lead is unchanged. With
+    PREFETCH_LAST_SEARCH the rep's latest lead search is run again too. All
+    of it belongs to the knowledge base it was started for: starting on a
+    different one cancels what is running and drops the rest.
+    """
+
+    def __init__(self, store=None, pool=None):
+        self._store = store
+        self._pool = pool or _pool
+        self._lock = threading.Lock()
+        self._version = None
+        self._knowledge_base = None
+        self._stop = threading.Event()
+        self._futures = []
+        self._searches = {}
+        self._tasks = {}
+
+    def start(self, knowledge_base):
+        """Prefetch for ``knowledge_base``; returns False if that is already under way."""
+        version = knowledge_base_version(knowledge_base)
+        with self._lock:
+            if version == self._version:
+                return False
+            self._invalidate()
+            self._version = version
+            self._knowledge_base = knowledge_base
+            stop = self._stop
+        if PREFETCH_DISABLED:
+            return True
+
+        self._submit(warm_clients)
+        self._submit(self._build_saved_tasks, version, stop)
+        for prompt in self._get_store().recent_searches(1) if PREFETCH_LAST_SEARCH else []:
+            future = self._submit(self._search, prompt, version, stop)
+            with self._lock:
+                if self._version == version:
+                    self._searches[prompt] = future
+        return True
+
+    def invalidate(self):
+        """Cancel everything in progress and forget every prefetched result."""
+        with self._lock:
+            self._invalidate()
+            self._version = None
+            self._knowledge_base = None
+
+    def _invalidate(self):
+        self._stop.set()
+        self._stop = threading.Event()
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+        self._searches = {}
+        self._tasks = {}
+
+    def search_result(self, prompt):
+        """Names of the leads a finished speculative search for ``prompt`` found, or None."""
+        with self._lock:
+            future = self._searches.get(prompt)
+        if future is None or not future.done() or future.cancelled() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def ready_search(self):
+        """``(prompt, names)`` of the prefetched search if its results are ready, or None."""
+        with self._lock:
+            prompts = list(self._searches)
+        for prompt in prompts:
+            names = self.search_result(prompt)
+            if names:
+                return prompt, names
+        return None
+
+    def call_task(self, company_name, knowledge_base, lead=None):
+        """Same as :func:`bland.build_call_task`, served from the prebuilt tasks when possible."""
+        from bland import build_call_task
+        version = knowledge_base_version(knowledge_base)
+        with self._lock:
+            prebuilt = bool(self._tasks) and version == self._version
+        if prebuilt:
+            revision = self._get_store().lead_revisions([company_name]).get(company_name)
+            if revision is not None:
+                lead_id, updated_at = revision
+                with self._lock:
+                    entry = self._tasks.get((lead_id, version))
+                # A lead updated after its task was built may have new details; build it afresh
+                if entry is not None and entry[0] == updated_at:
+                    return entry[1]
+        return build_call_task(company_name, knowledge_base, lead)
+
+    def _get_store(self):
+        if self._store is None:
+            from lead_store import get_lead_store
+            self._store = get_lead_store()
+        return self._store
+
+    def _submit(self, fn, *args):
+        # Carry the caller's context (current span) into the worker
+        future = self._pool.submit(contextvars.copy_context().run, fn, *args)
+        with self._lock:
+            self._futures = [f for f in self._futures if not f.done()] + [future]
+        return future
+
+    def _build_tasks(self, names, version, stop):
+        from bland import build_call_task
+        from lead_store import normalize_name
+        store = self._get_store()
+        with self._lock:
+            knowledge_base = self._knowledge_base
+        # Revisions are read before the leads, so a lead updated in between is rebuilt rather than served stale
+        revisions = {normalize_name(name): revision for name, revision in store.lead_revisions(names).items()}
+        for lead in store.query_leads(names=names).to_dict('records'):
+            if stop.is_set():
+                return
+            revision = revisions.get(normalize_name(lead["Name"]))
+            if revision is None:
+                continue
+            lead_id, updated_at = revision
+            task = build_call_task(lead["Name"], knowledge_base, lead)
+            with self._lock:
+                if self._version != version:
+                    return
+                self._tasks[(lead_id, version)] = (updated_at, task)
+
+    def _build_saved_tasks(self, version, stop):
+        with priority(BATCH), span('prefetch.tasks', 'prefetch'):
+            names = list(self._get_store().query_leads(limit=PREFETCH_TASK_LEADS)["Name"])
+            self._build_tasks(names, version, stop)
+
+    def _search(self, prompt, version, stop):
+        from leads import iter_company_details
+        names = []
+        with priority(BATCH), span('prefetch.search', 'prefetch', prompt_chars=len(prompt)):
+            companies = iter_company_details(prompt, store=self._get_store())
+            try:
+                for row in companies:
+                    if stop.is_set():
+                        return None
+                    names.append(row[0])
+                    self._build_tasks([row[0]], version, stop)
+            finally:
+                companies.close()
+        return names
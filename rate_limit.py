@@ -0,0 +1,260 @@
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-provider limits; 0 disables a limit
+TOGETHER_REQUESTS_PER_MINUTE = float(os.getenv('TOGETHER_REQUESTS_PER_MINUTE', '600'))
+TOGETHER_TOKENS_PER_MINUTE = float(os.getenv('TOGETHER_TOKENS_PER_MINUTE', '180000'))
+BLAND_REQUESTS_PER_MINUTE = float(os.getenv('BLAND_REQUESTS_PER_MINUTE', '120'))
+GOOGLE_REQUESTS_PER_MINUTE = float(os.getenv('GOOGLE_REQUESTS_PER_MINUTE', '300'))
+# Bland's concurrent-call allowance for the account, shared by every campaign, session and process
+BLAND_MAX_CONCURRENT_CALLS = int(os.getenv('BLAND_MAX_CONCURRENT_CALLS', '5'))
+# A call slot whose call never reported back is reclaimed after this many seconds
+BLAND_CALL_SLOT_TTL = float(os.getenv('BLAND_CALL_SLOT_TTL', '3600'))
+# How often a caller waiting for a call slot checks whether one has freed up
+BLAND_CALL_SLOT_POLL = float(os.getenv('BLAND_CALL_SLOT_POLL', '1'))
+# Seconds of a provider's rate that may be spent in one burst
+RATE_LIMIT_BURST_SECONDS = float(os.getenv('RATE_LIMIT_BURST_SECONDS', '5'))
+# Completion tokens assumed for an LLM call that sets no max_tokens, until its usage is known
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.getenv('LLM_COMPLETION_TOKEN_ESTIMATE', '512'))
+
+# Priority classes; lower values are served first
+INTERACTIVE, BATCH = 0, 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+_priority = contextvars.ContextVar('rate_limit_priority', default=INTERACTIVE)
+
+
+class TokenBucket:
+    """Refills at ``rate`` per second up to ``capacity``; may be overdrawn by large costs."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until ``amount`` can be taken; a cost above capacity only waits for a full bucket."""
+        self._refill(now)
+        shortfall = min(amount, self.capacity) - self.level
+        return max(0.0, shortfall / self.rate)
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+
+class ProviderLimiter:
+    """Admits requests to one provider at its sustainable rate, highest priority first.
+
+    Every request takes one unit (or ``weight`` units for a batch) from the
+    request bucket and, for LLM calls, its estimated tokens from the token
+    bucket. Callers queue in priority order and only the head of the queue
+    is admitted, so a steady stream of batch work can never delay an
+    interactive request by more than the time one slot takes to free up.
+    A 429 from the provider pauses admission for the advised delay.
+    """
+
+    def __init__(self, name, requests_per_minute=0, tokens_per_minute=0, burst_seconds=RATE_LIMIT_BURST_SECONDS):
+        self.name = name
+        self._requests = self._bucket(requests_per_minute, burst_seconds)
+        self._tokens = self._bucket(tokens_per_minute, burst_seconds)
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._order = itertools.count()
+        self._paused_until = 0.0
+        self._granted = dict.fromkeys(PRIORITY_NAMES, 0)
+        self._waited = dict.fromkeys(PRIORITY_NAMES, 0.0)
+        self._max_wait = 0.0
+        self._max_depth = 0
+        self._rate_limited = 0
+        self._in_flight = 0
+
+    @staticmethod
+    def _bucket(per_minute, burst_seconds):
+        if not per_minute:
+            return None
+        rate = per_minute / 60
+        return TokenBucket(rate, max(1.0, rate * burst_seconds))
+
+    def _delay(self, weight, tokens, now):
+        delays = [self._paused_until - now]
+        if self._requests is not None:
+            delays.append(self._requests.wait_time(weight, now))
+        if self._tokens is not None and tokens:
+            delays.append(self._tokens.wait_time(tokens, now))
+        return max(0.0, *delays)
+
+    def acquire(self, weight=1, tokens=0, priority=None):
+        """Block until the request may be sent; returns the seconds spent waiting."""
+        priority = _priority.get() if priority is None else priority
+        start = time.monotonic()
+        entry = (priority, next(self._order))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            self._max_depth = max(self._max_depth, len(self._waiting))
+            try:
+                while True:
+                    if self._waiting[0] == entry:
+                        delay = self._delay(weight, tokens, time.monotonic())
+                        if delay <= 0:
+                            break
+                    else:
+                        delay = None
+                    self._cond.wait(delay)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+            now = time.monotonic()
+            if self._requests is not None:
+                self._requests.take(weight, now)
+            if self._tokens is not None and tokens:
+                self._tokens.take(tokens, now)
+            waited = now - start
+            self._granted[priority] = self._granted.get(priority, 0) + 1
+            self._waited[priority] = self._waited.get(priority, 0.0) + waited
+            self._max_wait = max(self._max_wait, waited)
+            self._in_flight += 1
+        return waited
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+
+    def charge(self, tokens):
+        """Correct the token bucket once a call's real usage is known; negative amounts refund."""
+        if self._tokens is None or not tokens:
+            return
+        with self._cond:
+            self._tokens.take(tokens, time.monotonic())
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Admit nothing for ``seconds``, e.g. after the provider answered 429."""
+        with self._cond:
+            self._rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self):
+        with self._cond:
+            depth = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+            for priority, _ in self._waiting:
+                depth[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            granted = sum(self._granted.values())
+            return {
+                'queued': depth,
+                'max_queued': self._max_depth,
+                'in_flight': self._in_flight,
+                'granted': {PRIORITY_NAMES.get(p, str(p)): n for p, n in self._granted.items()},
+                'mean_wait': sum(self._waited.values()) / granted if granted else 0.0,
+                'max_wait': self._max_wait,
+                'rate_limited': self._rate_limited,
+                'tokens_available': None if self._tokens is None else self._tokens.level,
+            }
+
+
+_limiters = {}
+_lock = threading.Lock()
+
+def _create_limiter(provider):
+    if provider == 'together':
+        return ProviderLimiter(provider, TOGETHER_REQUESTS_PER_MINUTE, TOGETHER_TOKENS_PER_MINUTE)
+    if provider == 'bland':
+        return ProviderLimiter(provider, BLAND_REQUESTS_PER_MINUTE)
+    if provider == 'google':
+        return ProviderLimiter(provider, GOOGLE_REQUESTS_PER_MINUTE)
+    raise ValueError(f"Unknown provider {provider!r}")
+
+def get_limiter(provider):
+    with _lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limiter = _limiters[provider] = _create_limiter(provider)
+            if len(_limiters) == 1:
+                from tracing import get_tracer
+                get_tracer().add_collector(prometheus)
+        return limiter
+
+@contextmanager
+def priority(level):
+    """Run the enclosed block's outbound calls at ``level`` (INTERACTIVE or BATCH)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+@contextmanager
+def throttle(provider, weight=1, tokens=0):
+    """Hold a slot with ``provider`` for the enclosed request, waiting for one if needed."""
+    from tracing import current_span
+    limiter = get_limiter(provider)
+    waited = limiter.acquire(weight, tokens)
+    span = current_span()
+    if span is not None and waited:
+        span.add(queue_wait=round(waited, 4))
+    try:
+        yield limiter
+    finally:
+        limiter.release()
+
+def acquire_call_slot(store, limit=None, timeout=None, cancelled=None):
+    """Block until one of the account's live-call slots is free and return its id.
+
+    Slots are kept in the lead ``store`` so the cap holds across processes.
+    Bind the slot to the call once it is placed; the store frees it when
+    the call is finished. Returns None if ``cancelled`` is set while
+    waiting and raises TimeoutError after ``timeout`` seconds.
+    """
+    limit = BLAND_MAX_CONCURRENT_CALLS if limit is None else limit
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        slot_id = store.acquire_call_slot(limit, BLAND_CALL_SLOT_TTL)
+        if slot_id is not None:
+            return slot_id
+        delay = BLAND_CALL_SLOT_POLL
+        if deadline is not None:
+            delay = min(delay, deadline - time.monotonic())
+            if delay <= 0:
+                raise TimeoutError(f"All {limit} call slots stayed in use")
+        if cancelled is None:
+            time.sleep(delay)
+        elif cancelled.wait(delay):
+            return None
+
+def estimate_tokens(messages, max_tokens=None):
+    """Rough token cost of a chat completion: about four characters per prompt token plus the completion."""
+    prompt = sum(len(str(message.get('content', ''))) for message in messages) // 4
+    return prompt + (max_tokens or LLM_COMPLETION_TOKEN_ESTIMATE)
+
+def metrics():
+    with _lock:
+        limiters = dict(_limiters)
+    return {name: limiter.stats() for name, limiter in sorted(limiters.items())}
+
+def prometheus():
+    lines = []
+    stats = metrics()
+    lines.append('# TYPE salesbuddy_rate_limit_queue_depth gauge')
+    for name, s in stats.items():
+        lines += [f'salesbuddy_rate_limit_queue_depth{{provider="{name}",priority="{p}"}} {n}'
+                  for p, n in s['queued'].items()]
+    lines.append('# TYPE salesbuddy_rate_limit_in_flight gauge')
+    lines += [f'salesbuddy_rate_limit_in_flight{{provider="{name}"}} {s["in_flight"]}' for name, s in stats.items()]
+    lines.append('# TYPE salesbuddy_rate_limit_granted_total counter')
+    for name, s in stats.items():
+        lines += [f'salesbuddy_rate_limit_granted_total{{provider="{name}",priority="{p}"}} {n}'
+                  for p, n in s['granted'].items()]
+    lines.append('# TYPE salesbuddy_rate_limit_throttled_total counter')
+    lines += [f'salesbuddy_rate_limit_throttled_total{{provider="{name}"}} {s["rate_limited"]}' for name, s in stats.items()]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,203 @@
+import base64
+import hashlib
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from dotenv import load_dotenv
+
+from calendar_index import event_timestamp, get_calendar_index
+from google_calendar import get_calendar
+from http_client import HTTP_MAX_RETRIES
+from json_stream import parse_json_object
+from llm import LLM_MODEL, get_dispatcher
+from rate_limit import estimate_tokens, get_limiter, throttle
+from timezones import DEFAULT_TIMEZONE
+from tracing import span
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Google accepts at most 50 requests in one Calendar batch
+CALENDAR_BATCH_SIZE = int(os.getenv('CALENDAR_BATCH_SIZE', '50'))
+MEETING_EXTRACT_WORKERS = int(os.getenv('MEETING_EXTRACT_WORKERS', '8'))
+
+def extract_event_details_with_ai(summary, reference_time=None, time_zone=DEFAULT_TIMEZONE):
+    # Relative dates in the summary ("next Tuesday") are resolved against the call itself
+    zone = ZoneInfo(time_zone)
+    reference_time = (reference_time or datetime.now(zone)).astimezone(zone)
+    offset = reference_time.strftime('%z')
+    offset = f"{offset[:3]}:{offset[3:]}"
+    prompt = f"Extract event details from the following summary and generate a JSON in the exact format as specified below, return nothing but the JSON. :\n\nSummary: {summary}\n\n" \
+             f"The call took place on {reference_time:%A, %B %d, %Y} at {reference_time:%H:%M} ({time_zone}). " \
+             "Resolve relative dates such as \"tomorrow\" or \"next Friday\" against that date.\n\n" \
+             "JSON Format:\n" \
+             "{\n" \
+             "  \"summary\": \"Event Title\",\n" \
+             "  \"location\": \"Event Location\",\n" \
+             "  \"description\": \"Event Description\",\n" \
+             "  \"start\": {\n" \
+             f"    \"dateTime\": \"YYYY-MM-DDTHH:MM:SS{offset}\",\n" \
+             f"    \"timeZone\": \"{time_zone}\"\n" \
+             "  },\n" \
+             "  \"end\": {\n" \
+             f"    \"dateTime\": \"YYYY-MM-DDTHH:MM:SS{offset}\",\n" \
+             f"    \"timeZone\": \"{time_zone}\"\n" \
+             "  },\n" \
+             "  \"attendees\": [\n" \
+             "    {\n" \
+             "      \"email\": \"attendee@example.com\"\n" \
+             "    }\n" \
+             "  ],\n" \
+             "  \"reminders\": {\n" \
+             "    \"useDefault\": false,\n" \
+             "    \"overrides\": [\n" \
+             "      {\n" \
+             "        \"method\": \"email\",\n" \
+             "        \"minutes\": 1440\n" \
+             "      },\n" \
+             "      {\n" \
+             "        \"method\": \"popup\",\n" \
+             "        \"minutes\": 10\n" \
+             "      }\n" \
+             "    ]\n" \
+             "  }\n" \
+             "}\n Ensure again you are returning only the JSON and nothing else."
+
+    messages = [{"role": "user", "content": prompt}]
+
+    estimate = estimate_tokens(messages)
+    with span('together.event_extraction', 'together', model=LLM_MODEL) as extraction:
+        # Hedged and failed over like every other completion, but never cached: the summary is one call's
+        try:
+            content, usage, model = get_dispatcher().complete(messages, model=LLM_MODEL)
+        except Exception as e:
+            raise Exception(f"API request failed: {e}")
+        if model != LLM_MODEL:
+            extraction.set(served_by=model)
+
+        try:
+            usage = usage or {}
+            extraction.set(prompt_tokens=usage.get('prompt_tokens'), completion_tokens=usage.get('completion_tokens'))
+            if usage.get('total_tokens'):
+                get_limiter('together').charge(usage['total_tokens'] - estimate)
+            event_details_message = content.strip()
+
+            # Pull the event object out of the message, repairing common JSON defects
+            event_details = parse_json_object(event_details_message)
+            if event_details is None:
+                raise ValueError("No JSON content found in the response message")
+        except (json.JSONDecodeError, KeyError, ValueError) as e:
+            raise Exception(f"Error parsing JSON response: {e}")
+
+    return event_details
+
+def event_id_for_call(call_id):
+    """A Calendar event ID derived from the call, so booking the same call twice is refused by Google."""
+    # Calendar IDs take the base32hex alphabet in lower case
+    digest = base64.b32hexencode(hashlib.sha256(str(call_id).encode('utf-8')).digest()).decode('ascii')
+    return 'sb' + digest.rstrip('=').lower()
+
+def create_event(service, event_details):
+    # googleapiclient retries 429/5xx responses with exponential backoff
+    with span('google.events.insert', 'google'), throttle('google'):
+        request = service.events().insert(calendarId='primary', body=event_details)
+        return request.execute(http=get_calendar().http(), num_retries=HTTP_MAX_RETRIES)
+
+def schedule_meetings(service, leads, store=None, index=None, max_workers=MEETING_EXTRACT_WORKERS,
+                      batch_size=CALENDAR_BATCH_SIZE):
+    """Book meetings for many leads with a handful of Calendar round trips.
+
+    ``leads`` yields ``(company_name, notes, head_office_location)``. Events
+    are extracted concurrently while the free/busy index catches up with one
+    incremental sync; every event is then checked against the index and the
+    other events of the run, and the survivors are inserted through Calendar
+    batch requests. Returns one result dict per lead with its ``status``
+    (``scheduled``, ``conflict``, ``failed`` or ``skipped``), ``event`` and ``error``.
+    """
+    from lead_store import get_lead_store
+    from meeting_extraction import meeting_for_lead
+    from timezones import timezone_for_location
+
+    store = store or get_lead_store()
+    index = index or get_calendar_index()
+
+    def extract(lead):
+        company_name, notes, location = lead
+        result = {'company': company_name, 'status': 'failed', 'event': None, 'call_id': None, 'error': ''}
+        if not notes and not store.calls_for(company_name):
+            result['status'] = 'skipped'
+            result['error'] = 'no call notes'
+            return result
+        try:
+            event, call_id = meeting_for_lead(store, company_name, notes, timezone_for_location(location))
+            booked = store.meeting_for_call(call_id) if call_id else None
+            if booked is not None:
+                # Booked by an earlier run, e.g. one that was interrupted before it finished
+                result.update(event=booked, call_id=call_id, status='scheduled')
+                return result
+            if call_id:
+                event['id'] = event_id_for_call(call_id)
+            result.update(event=event, call_id=call_id, status='extracted',
+                          start=event_timestamp(event['start']), end=event_timestamp(event['end']))
+        except Exception as e:
+            result['error'] = f"Could not extract meeting: {e}"
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='meeting-extract') as pool:
+        futures = [pool.submit(extract, lead) for lead in leads]
+        index.sync(service, http=get_calendar().http())
+        results = [future.result() for future in futures]
+
+    accepted = []
+    for result in sorted((r for r in results if r['status'] == 'extracted'), key=lambda r: r['start']):
+        # The event itself is in the index when an earlier run inserted it but stopped before recording it
+        clashes = [c['summary'] for c in index.conflicts(result['event']['start'], result['event']['end'])
+                   if c['id'] != result['event'].get('id')]
+        clashes += [a['event']['summary'] for a in accepted if a['start'] < result['end'] and a['end'] > result['start']]
+        if clashes:
+            result['status'] = 'conflict'
+            result['error'] = f"Overlaps {', '.join(repr(c) for c in clashes)}"
+        else:
+            accepted.append(result)
+
+    def on_inserted(request_id, response, exception):
+        result = accepted[int(request_id)]
+        if exception is not None and getattr(getattr(exception, 'resp', None), 'status', None) == 409:
+            # The deterministic ID already exists: the meeting was inserted before, so record that event
+            try:
+                response = service.events().get(calendarId=index.calendar_id, eventId=result['event']['id']).execute(
+                    http=get_calendar().http(), num_retries=HTTP_MAX_RETRIES)
+                exception = None
+            except Exception as e:
+                exception = e
+        if exception is not None:
+            result['status'] = 'failed'
+            result['error'] = str(exception)
+            return
+        result['status'] = 'scheduled'
+        result['event'] = response
+        index.apply([response])
+        store.record_meeting(result['company'], response, result['call_id'])
+
+    for start in range(0, len(accepted), batch_size):
+        batch = service.new_batch_http_request(callback=on_inserted)
+        for i in range(start, min(start + batch_size, len(accepted))):
+            batch.add(service.events().insert(calendarId=index.calendar_id, body=accepted[i]['event']), request_id=str(i))
+        try:
+            # Google counts every request inside a batch against the quota
+            events = min(batch_size, len(accepted) - start)
+            with span('google.events.batch_insert', 'google', events=events), throttle('google', weight=events):
+                batch.execute(http=get_calendar().http())
+        except Exception as e:
+            for result in accepted[start:start + batch_size]:
+                if result['status'] == 'extracted':
+                    result['status'] = 'failed'
+                    result['error'] = f"Batch request failed: {e}"
+
+    for result in results:
+        result.pop('start', None)
+        result.pop('end', None)
+    return results
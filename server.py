@@ -0,0 +1,189 @@
+"""asyncio web backend for templates/index.html.
+
+    python server.py
+
+``POST /get_companies`` runs the same lead search as the Streamlit app and
+streams every company back as one line of JSON as soon as it is enriched.
+``GET /companies`` answers the DataTables grid with one server-side sorted
+and paged slice of the leads one of those searches found. A single process serves many reps: the
+event loop only shuttles bytes, searches run on a bounded worker pool and
+no handler holds more than one page or one company in memory.
+"""
+import asyncio
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from experiments.models import format_funding
+
+load_dotenv()
+
+SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '8080'))
+# Lead searches running at once; further searches wait for a free worker
+SERVER_SEARCH_WORKERS = int(os.getenv('SERVER_SEARCH_WORKERS', '16'))
+# Largest page the grid may request
+SERVER_MAX_PAGE_SIZE = int(os.getenv('SERVER_MAX_PAGE_SIZE', '100'))
+# Searches whose results the grid can still page through; the oldest are forgotten first
+SERVER_MAX_SEARCHES = int(os.getenv('SERVER_MAX_SEARCHES', '1000'))
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# DataTables column names and the lead store sort key behind each sortable one
+GRID_SORT_KEYS = {
+    'name': 'name',
+    'size': 'size',
+    'funding': 'funding',
+    'year_founded': 'founded',
+    'head_office_location': 'head_office',
+}
+
+_search_pool = ThreadPoolExecutor(max_workers=SERVER_SEARCH_WORKERS, thread_name_prefix='lead-search')
+# SQLite reads are quick but blocking; keep them off the event loop
+_store_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='lead-store')
+# Search id -> ids of the leads it found, in the order found; only touched on the event loop
+_searches = OrderedDict()
+
+
+def company_json(company):
+    """The JSON shape static/js/script.js renders for one company."""
+    return {
+        'name': company.name,
+        'linkedin': company.linkedin,
+        'url': company.url,
+        'size': company.size,
+        'funding': format_funding(company.funding),
+        'year_founded': company.founded or "",
+        'head_office_location': company.head_office,
+        'sales_contact': {'email': company.sales_dept.email, 'phone': company.sales_dept.phone},
+    }
+
+def _produce(prompt, loop, queue, stop):
+    """Run a lead search on a worker thread, handing each company to the event loop as it is found."""
+    from lead_store import get_lead_store
+    from leads import iter_company_details
+
+    store = get_lead_store()
+    companies = iter_company_details(prompt, store=store)
+    try:
+        for row in companies:
+            if stop.is_set():
+                break
+            company = store.find_known([row[0]]).get(row[0])
+            if company is not None:
+                loop.call_soon_threadsafe(queue.put_nowait, (store.lead_id(row[0]), company_json(company)))
+    except ValueError as e:
+        loop.call_soon_threadsafe(queue.put_nowait, (None, {'error': str(e)}))
+    except Exception as e:
+        loop.call_soon_threadsafe(queue.put_nowait, (None, {'error': f"Lead search failed: {e}"}))
+    finally:
+        companies.close()
+        loop.call_soon_threadsafe(queue.put_nowait, None)
+
+
+async def index(request):
+    from aiohttp import web
+    return web.FileResponse(os.path.join(ROOT, 'templates', 'index.html'))
+
+async def get_companies(request):
+    """Stream the companies found for ``input_prompt`` as newline-delimited JSON.
+
+    The first line is ``{"search_id": id}``, the id ``GET /companies`` pages
+    the results by. Every further line is a company object, except an
+    ``error`` object if the search fails and a closing ``{"done": true, "count": n}``.
+    """
+    from aiohttp import web
+
+    if request.content_type == 'application/json':
+        prompt = (await request.json()).get('input_prompt', '')
+    else:
+        prompt = (await request.post()).get('input_prompt', '')
+    prompt = str(prompt).strip()
+    if not prompt:
+        return web.json_response({'error': 'input_prompt is required'}, status=400)
+
+    response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson', 'Cache-Control': 'no-cache'})
+    await response.prepare(request)
+    search_id = uuid.uuid4().hex
+    found = _searches[search_id] = {}
+    while len(_searches) > SERVER_MAX_SEARCHES:
+        _searches.popitem(last=False)
+    await response.write((json.dumps({'search_id': search_id}) + '\n').encode())
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    _search_pool.submit(_produce, prompt, loop, queue, stop)
+    count = 0
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            lead_id, item = item
+            if lead_id is not None:
+                found[lead_id] = None
+            count += 'error' not in item
+            await response.write((json.dumps(item) + '\n').encode())
+        await response.write((json.dumps({'done': True, 'count': count}) + '\n').encode())
+    finally:
+        # A rep who navigated away should not keep a search worker busy
+        stop.set()
+    await response.write_eof()
+    return response
+
+async def companies(request):
+    """One page of the leads search ``search_id`` found, in the DataTables server-side processing format."""
+    from aiohttp import web
+    from lead_store import get_lead_store
+
+    query = request.query
+    try:
+        draw = int(query.get('draw', 0))
+        start = max(0, int(query.get('start', 0)))
+        length = int(query.get('length', 25))
+    except ValueError:
+        return web.json_response({'error': 'draw, start and length must be integers'}, status=400)
+    length = SERVER_MAX_PAGE_SIZE if length < 0 else min(length, SERVER_MAX_PAGE_SIZE)
+    order_by, descending = 'updated_at', True
+    column = query.get(f"columns[{query.get('order[0][column]', '')}][data]")
+    if column in GRID_SORT_KEYS:
+        order_by, descending = GRID_SORT_KEYS[column], query.get('order[0][dir]') == 'desc'
+
+    # Before its first search, or once the search is forgotten, a rep's grid is empty
+    lead_ids = list(_searches.get(query.get('search_id', ''), ()))
+    page, matching = [], 0
+    if lead_ids:
+        store = get_lead_store()
+        page, matching = await asyncio.get_running_loop().run_in_executor(
+            _store_pool,
+            lambda: store.page_companies(query.get('search[value]') or None, order_by, descending, length, start, lead_ids))
+    return web.json_response({
+        'draw': draw,
+        'recordsTotal': len(lead_ids),
+        'recordsFiltered': matching,
+        'data': [company_json(company) for company in page],
+    })
+
+
+def create_app():
+    from aiohttp import web
+    app = web.Application()
+    app.router.add_get('/', index)
+    app.router.add_post('/get_companies', get_companies)
+    app.router.add_get('/companies', companies)
+    app.router.add_static('/static/', os.path.join(ROOT, 'static'))
+    return app
+
+def main():
+    from aiohttp import web
+    web.run_app(create_app(), host=SERVER_HOST, port=SERVER_PORT)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,118 @@
 $(document).ready(function() {
-    $('#output').hide();
-    $('#company-table').DataTable();
+    const text = $.fn.dataTable.render.text();
 
-    $('#input-form').submit(function(e) {
-        e.preventDefault();
-        
-        const inputPrompt = $('#input_prompt').val();
+    // The link comes from LLM output: only http(s) URLs become anchors, built as DOM nodes, never as markup
+    function linkHtml(link) {
+        let url;
+        try {
+            url = new URL(link);
+        } catch (err) {
+            return $('<span>').text(link || '').prop('outerHTML');
+        }
+        if (url.protocol !== 'http:' && url.protocol !== 'https:') {
+            return $('<span>').text(link).prop('outerHTML');
+        }
+        return $('<a>').attr({ href: url.href, target: '_blank', rel: 'noopener noreferrer' }).text(link).prop('outerHTML');
+    }
 
-        $.post('/get_companies', { input_prompt: inputPrompt }, function(data) {
-            console.log("Response Data:", data);  // Debugging line
-            const outputBody = $('#output-body');
-            outputBody.empty();
+    // The grid pages through the leads of the latest search only
+    let searchId = '';
 
-            data.forEach(company => {
-                const row = `<tr>
-                    <td>${company.name}</td>
-                    <td><a href="${company.linkedin}" target="_blank">${company.linkedin}</a></td>
-                    <td>${company.size}</td>
-                    <td>${company.funding}</td>
-                    <td>${company.year_founded}</td>
-                    <td>${company.head_office_location}</td>
-                    <td>Email: ${company.sales_contact.email}<br>Phone: ${company.sales_contact.phone}</td>
-                </tr>`;
-                outputBody.append(row);
-            });
+    const table = $('#company-table').DataTable({
+        serverSide: true,
+        processing: true,
+        ajax: {
+            url: '/companies',
+            data: function(params) { params.search_id = searchId; }
+        },
+        order: [],  // Most recently found leads first until a column is sorted
+        columns: [
+            { data: 'name', render: text },
+            {
+                data: 'linkedin',
+                orderable: false,
+                render: function(link, type) {
+                    if (type !== 'display') return link || '';
+                    return linkHtml(link);
+                }
+            },
+            { data: 'size', render: text },
+            { data: 'funding', render: text },
+            { data: 'year_founded', render: text },
+            { data: 'head_office_location', render: text },
+            {
+                data: 'sales_contact',
+                orderable: false,
+                render: function(contact) {
+                    const escape = value => $('<div>').text(value || '').html();
+                    return `Email: ${escape(contact.email)}<br>Phone: ${escape(contact.phone)}`;
+                }
+            }
+        ]
+    });
+
+    // Redraw at most twice a second while companies stream in
+    let redrawPending = false;
+    function scheduleRedraw() {
+        if (redrawPending) return;
+        redrawPending = true;
+        setTimeout(function() {
+            redrawPending = false;
+            table.ajax.reload(null, false);
+        }, 500);
+    }
 
-            $('#output').show();
-            $('#company-table').DataTable().draw();
-        }).fail(function(jqXHR, textStatus, errorThrown) {
-            console.log("Request Failed:", textStatus, errorThrown);  // Debugging line
-        });
+    function handleLine(line, status) {
+        if (!line.trim()) return;
+        const item = JSON.parse(line);
+        if (item.search_id) {
+            searchId = item.search_id;
+            table.ajax.reload(null, true);
+        } else if (item.error) {
+            status.text(item.error);
+        } else if (item.done) {
+            status.text(`Found ${item.count} companies.`);
+        } else {
+            status.text(`Found ${item.name}...`);
+            scheduleRedraw();
+        }
+    }
+
+    $('#input-form').submit(async function(e) {
+        e.preventDefault();
+
+        const status = $('#search-status');
+        const button = $(this).find('button');
+        status.text('Searching...');
+        button.prop('disabled', true);
+        try {
+            const response = await fetch('/get_companies', {
+                method: 'POST',
+                body: new URLSearchParams({ input_prompt: $('#input_prompt').val() })
+            });
+            if (!response.ok) {
+                status.text((await response.json()).error || `Request failed (${response.status})`);
+                return;
+            }
+            // Newline-delimited JSON: handle each company as soon as its line is complete
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.forEach(line => handleLine(line, status));
+            }
+            handleLine(buffer, status);
+            table.ajax.reload(null, false);
+        } catch (err) {
+            console.log("Request Failed:", err);
+            status.text('Request failed.');
+        } finally {
+            button.prop('disabled', false);
+        }
     });
 });
@@ -0,0 +1,82 @@
+import json
+import threading
+
+import pytest
+
+from analysis_queue import AnalysisQueue
+from lead_store import LeadStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LeadStore(str(tmp_path / 'leads.sqlite'))
+
+
+def run_queue(store, analyze, call_id, **kwargs):
+    """Queue ``call_id`` and return what its on_complete callback got."""
+    done = threading.Event()
+    results = []
+    queue = AnalysisQueue(store, analyze=analyze, workers=2, retry_delay=0.01, lease=5, **kwargs)
+    try:
+        queue.enqueue(call_id, {'status': 'completed'}, on_complete=lambda *args: (results.append(args), done.set()))
+        assert done.wait(5)
+    finally:
+        queue.stop()
+    return results
+
+
+def test_failed_analysis_is_retried_until_it_succeeds(store):
+    store.record_call('call-1', 'Acme')
+    attempts = []
+
+    def flaky(call_id):
+        attempts.append(call_id)
+        if len(attempts) < 3:
+            raise ConnectionError('Bland is down')
+        return {'answers': ['Ada', 'ada@acme.com', '', 'high', 'Wants a demo']}
+
+    results = run_queue(store, flaky, 'call-1', max_attempts=3)
+    assert len(attempts) == 3
+    assert results == [('call-1', {'answers': ['Ada', 'ada@acme.com', '', 'high', 'Wants a demo']})]
+    call = store.get_call('call-1')
+    assert (call['status'], call['contact_name'], call['summary']) == ('completed', 'Ada', 'Wants a demo')
+    assert store.analysis_queue_depth() == 0
+
+
+def test_analysis_failing_every_attempt_is_stored_as_failed(store):
+    store.record_call('call-1', 'Acme')
+    results = run_queue(store, lambda call_id: {'error': 'no transcript'}, 'call-1', max_attempts=2)
+    assert results == [('call-1', {'error': 'no transcript'})]
+    assert store.get_call('call-1')['status'] == 'failed'
+    assert store.analysis_queue_depth() == 0
+
+
+def test_stored_analysis_is_not_fetched_again(store):
+    store.save_analysis('call-1', {'answers': ['', '', '', '', 'Done']})
+    results = []
+    queue = AnalysisQueue(store, analyze=pytest.fail)
+    try:
+        queue.enqueue('call-1', on_complete=lambda *args: results.append(args))
+    finally:
+        queue.stop()
+    assert results == [('call-1', {'answers': ['', '', '', '', 'Done']})]
+    assert store.analysis_queue_depth() == 0
+
+
+def test_job_abandoned_by_a_dead_process_is_taken_over(store):
+    store.enqueue_analysis('call-1', {'status': 'completed'})
+    assert [job['call_id'] for job in store.claim_analysis_jobs(1, 'dead', lease=0)] == ['call-1']
+    # Its lease has lapsed, so the dead owner can no longer renew or finish it once it is taken over
+    results = run_queue(store, lambda call_id: {'answers': ['', '', '', '', 'Recovered']}, 'call-1')
+    assert results[0][1]['answers'][-1] == 'Recovered'
+    assert store.renew_analysis_leases(['call-1'], 'dead', 60) == set()
+    assert json.loads(store.get_call('call-1')['analysis'])['answers'][-1] == 'Recovered'
+
+
+def test_live_lease_is_not_claimed_twice(store):
+    store.enqueue_analysis('call-1')
+    assert len(store.claim_analysis_jobs(5, 'first', lease=60)) == 1
+    assert store.claim_analysis_jobs(5, 'second', lease=60) == []
+    assert store.renew_analysis_leases(['call-1'], 'first', 60) == {'call-1'}
+    store.retry_analysis_job('call-1', 'boom', delay=0, owner='second')
+    assert store.claim_analysis_jobs(5, 'second', lease=60) == []
@@ -0,0 +1,90 @@
+import bland
+import call_tracker
+import leads
+import lead_store
+import pytest
+
+from batch import ANALYSED, CALLED, DIALING, FOUND, BatchPipeline, Checkpoint
+from lead_store import LEAD_COLUMNS, LeadStore
+
+
+def lead(name, phone='+1 415 867 5309'):
+    return dict(zip(LEAD_COLUMNS, [name, '11-50', '', '', 'New York', '', phone, '']))
+
+
+class Stubs:
+    """Stands in for the lead search and Bland, recording what the pipeline asked for."""
+
+    def __init__(self, monkeypatch, found):
+        self.found = found
+        self.searched, self.dialed, self.analysed = [], [], []
+        self.fail_analysis = set()
+        monkeypatch.setattr(call_tracker, 'CALL_POLL_INTERVAL', 0)
+        monkeypatch.setattr(leads, 'iter_company_details', self.search)
+        monkeypatch.setattr(bland, 'build_call_task', lambda name, knowledge_base, row: f"Call {name}")
+        monkeypatch.setattr(bland, 'place_call', self.place_call)
+        monkeypatch.setattr(bland, 'get_call_details', lambda call_id: {'status': 'completed'})
+        monkeypatch.setattr(bland, 'is_call_finished', lambda details: True)
+        monkeypatch.setattr(bland, 'fetch_call_analysis', self.analyse)
+
+    def search(self, prompt):
+        self.searched.append(prompt)
+        return [[row[column] for column in LEAD_COLUMNS] for row in self.found.get(prompt, [])]
+
+    def place_call(self, store, name, phone, task, **kwargs):
+        self.dialed.append(name)
+        store.record_call(f"call-{name}", name)
+        return {'status': 'success', 'call_id': f"call-{name}"}
+
+    def analyse(self, call_id):
+        self.analysed.append(call_id)
+        if call_id in self.fail_analysis:
+            raise KeyboardInterrupt
+        return {'answers': ['Ada', '', '', 'high', f"Spoke to {call_id}"]}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = LeadStore(str(tmp_path / 'leads.sqlite'))
+    monkeypatch.setattr(lead_store, 'get_lead_store', lambda: store)
+    return store
+
+
+def pipeline(checkpoint):
+    return BatchPipeline('Our product', checkpoint, dial_workers=1, analysis_workers=1)
+
+
+def test_interrupted_run_resumes_without_searching_or_dialing_again(tmp_path, monkeypatch, store):
+    stubs = Stubs(monkeypatch, {'fintech in NYC': [lead('Acme'), lead('Globex')], 'no phones': [lead('Initech', phone='')]})
+    stubs.fail_analysis = {'call-Globex'}
+    checkpoint = Checkpoint(str(tmp_path / 'checkpoint.sqlite'))
+    with pytest.raises(KeyboardInterrupt):
+        pipeline(checkpoint).run(['fintech in NYC', 'no phones'])
+    assert checkpoint.counts().get(CALLED) == 1
+
+    stubs.fail_analysis = set()
+    counts = pipeline(Checkpoint(str(tmp_path / 'checkpoint.sqlite'))).run(['fintech in NYC', 'no phones'])
+    assert counts == {'done': 2, 'skipped': 1}
+    # The checkpointed prompt is not searched again; the other one may have been cut off mid-search
+    assert stubs.searched.count('fintech in NYC') == 1
+    assert stubs.dialed == ['Acme', 'Globex']
+    assert stubs.analysed == ['call-Acme', 'call-Globex', 'call-Globex']
+    assert store.get_call('call-Globex')['summary'] == 'Spoke to call-Globex'
+
+
+def test_resume_picks_up_every_stage(tmp_path, monkeypatch, store):
+    stubs = Stubs(monkeypatch, {})
+    checkpoint = Checkpoint(str(tmp_path / 'checkpoint.sqlite'))
+    checkpoint.finish_prompt('fintech in NYC', 5)
+    for name, state, call_id in [('Found', FOUND, None), ('Placed', DIALING, 'call-Placed'), ('Unsure', DIALING, None),
+                                 ('Called', CALLED, 'call-Called'), ('Analysed', ANALYSED, 'call-Analysed')]:
+        checkpoint.add_lead(lead(name))
+        checkpoint.set_state(lead(name), state, call_id=call_id)
+    store.save_analysis('call-Analysed', {'answers': ['', '', '', '', 'Already stored']})
+
+    counts = pipeline(checkpoint).run(['fintech in NYC'])
+    assert counts == {'done': 4, 'failed': 1}
+    assert stubs.searched == []
+    # A lead that may or may not have been dialed is never dialed twice
+    assert stubs.dialed == ['Found']
+    assert sorted(stubs.analysed) == ['call-Called', 'call-Found', 'call-Placed']
@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from calendar_index import CalendarIndex
+
+
+def event(event_id, start, end, **fields):
+    return {'id': event_id, 'start': {'dateTime': start}, 'end': {'dateTime': end}, **fields}
+
+
+class FakeCalendar:
+    """Answers events().list() from canned pages, keyed by the sync token asked for."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self.requests.append(params)
+        return self
+
+    def execute(self, http=None, num_retries=0):
+        params = self.requests[-1]
+        response = self.pages[(params.get('syncToken'), params.get('pageToken'))]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def index(tmp_path):
+    return CalendarIndex(str(tmp_path / 'calendar.sqlite'))
+
+
+def at(hour, minute=0):
+    return datetime(2026, 10, 20, hour, minute, tzinfo=timezone.utc)
+
+
+def test_full_sync_then_incremental_changes(index):
+    service = FakeCalendar({
+        (None, None): {'items': [event('a', '2026-10-20T09:00:00Z', '2026-10-20T10:00:00Z')], 'nextPageToken': 'p2'},
+        (None, 'p2'): {'items': [event('b', '2026-10-20T13:00:00+02:00', '2026-10-20T14:00:00+02:00'),
+                                 event('free', '2026-10-20T15:00:00Z', '2026-10-20T16:00:00Z', transparency='transparent')],
+                       'nextSyncToken': 't1'},
+        ('t1', None): {'items': [{'id': 'a', 'status': 'cancelled'},
+                                 event('c', '2026-10-20T16:30:00Z', '2026-10-20T17:00:00Z')],
+                       'nextSyncToken': 't2'},
+    })
+    assert index.sync(service) == 3
+    assert index.sync_token() == 't1'
+    assert 'timeMin' in service.requests[0]
+    assert [busy['id'] for busy in index.conflicts(at(9, 30), at(12))] == ['a', 'b']
+    assert index.is_free(at(15), at(16))
+
+    assert index.sync(service) == 2
+    assert service.requests[-1]['syncToken'] == 't1'
+    assert index.sync_token() == 't2'
+    assert [busy['id'] for busy in index.conflicts(at(9), at(17))] == ['b', 'c']
+
+
+def test_expired_sync_token_starts_over(index):
+    service = FakeCalendar({
+        (None, None): {'items': [event('a', '2026-10-20T09:00:00Z', '2026-10-20T10:00:00Z')], 'nextSyncToken': 't1'},
+        ('t1', None): HttpError(httplib2.Response({'status': 410}), b'Sync token is no longer valid'),
+    })
+    index.sync(service)
+    index.apply([event('stale', '2026-10-20T11:00:00Z', '2026-10-20T12:00:00Z')])
+    assert index.sync(service) == 1
+    assert [busy['id'] for busy in index.conflicts(at(0), at(23))] == ['a']
+    assert index.sync_token() == 't1'
+
+
+def test_all_day_events_block_the_whole_day(index):
+    index.apply([{'id': 'offsite', 'start': {'date': '2026-10-20'}, 'end': {'date': '2026-10-21'}}])
+    assert not index.is_free(at(12), at(13))
+    assert index.is_free(datetime(2026, 10, 21, 9, tzinfo=timezone.utc), datetime(2026, 10, 21, 10, tzinfo=timezone.utc))
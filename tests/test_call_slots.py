@@ -0,0 +1,79 @@
+import itertools
+import threading
+
+import pytest
+
+import bland
+import rate_limit
+from lead_store import LeadStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LeadStore(str(tmp_path / 'leads.sqlite'))
+
+
+@pytest.fixture
+def placed(monkeypatch):
+    ids = itertools.count()
+    calls = []
+
+    def make_ai_call(phone_number, task, **kwargs):
+        calls.append(phone_number)
+        if phone_number == 'bad':
+            return {'status': 'error', 'message': 'invalid number'}
+        return {'status': 'success', 'call_id': f"call-{next(ids)}"}
+
+    monkeypatch.setattr(bland, 'make_ai_call', make_ai_call)
+    monkeypatch.setattr(rate_limit, 'BLAND_CALL_SLOT_POLL', 0.01)
+    return calls
+
+
+def test_slots_are_shared_between_store_instances(store):
+    other_process = LeadStore(store.path)
+    assert store.acquire_call_slot(2, ttl=60) is not None
+    assert other_process.acquire_call_slot(2, ttl=60) is not None
+    assert store.acquire_call_slot(2, ttl=60) is None
+
+
+def test_stale_slots_are_reclaimed(store):
+    assert store.acquire_call_slot(1, ttl=60) is not None
+    assert store.acquire_call_slot(1, ttl=-1) is not None
+
+
+def test_waiting_for_a_slot_times_out(store, placed):
+    rate_limit.acquire_call_slot(store, limit=1)
+    with pytest.raises(TimeoutError):
+        rate_limit.acquire_call_slot(store, limit=1, timeout=0.05)
+
+
+def test_waiting_for_a_slot_can_be_cancelled(store, placed):
+    rate_limit.acquire_call_slot(store, limit=1)
+    cancelled = threading.Event()
+    cancelled.set()
+    assert rate_limit.acquire_call_slot(store, limit=1, cancelled=cancelled) is None
+
+
+def test_placed_call_holds_its_slot_until_finished(store, placed, monkeypatch):
+    monkeypatch.setattr(rate_limit, 'BLAND_MAX_CONCURRENT_CALLS', 1)
+    response = bland.place_call(store, 'Acme', '+1', 'task')
+    assert store.get_call(response['call_id']) is not None
+    assert store.live_calls() == 1
+    store.save_analysis(response['call_id'], {'answers': ['Jane', '', '', '', 'Booked a demo']})
+    assert store.live_calls() == 0
+
+
+def test_call_that_is_not_placed_frees_its_slot(store, placed):
+    assert bland.place_call(store, 'Acme', 'bad', 'task')['status'] == 'error'
+    assert store.live_calls() == 0
+
+
+def test_second_caller_waits_for_a_free_slot(store, placed, monkeypatch):
+    monkeypatch.setattr(rate_limit, 'BLAND_MAX_CONCURRENT_CALLS', 1)
+    first = bland.place_call(store, 'Acme', '+1', 'task')
+    done = threading.Event()
+    threading.Thread(target=lambda: (bland.place_call(store, 'Globex', '+2', 'task'), done.set()), daemon=True).start()
+    assert not done.wait(0.2)
+    store.release_call_slot(call_id=first['call_id'])
+    assert done.wait(2)
+    assert placed == ['+1', '+2']
@@ -0,0 +1,30 @@
+import json
+
+import call_tracker
+from call_tracker import CallTracker
+from lead_store import LeadStore
+
+
+def unreachable(call_id):
+    raise ConnectionError("Bland is down")
+
+
+def test_unpollable_call_is_finished_as_failed_in_the_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(call_tracker, 'CALL_POLL_INTERVAL', 0.01)
+    monkeypatch.setattr(call_tracker, 'CALL_POLL_MAX_INTERVAL', 0.01)
+    monkeypatch.setattr(call_tracker, 'CALL_POLL_MAX_ERRORS', 3)
+    store = LeadStore(str(tmp_path / 'leads.sqlite'))
+    store.record_call('call-1', 'Acme')
+    tracker = CallTracker(get_details=unreachable, store=store)
+    try:
+        tracker.track('call-1')
+        result = tracker.wait_for('call-1', timeout=5)
+    finally:
+        tracker.stop()
+
+    assert result['status'] == 'failed'
+    assert tracker.pending() == []
+    call = store.get_call('call-1')
+    assert call['status'] == 'failed'
+    assert call['finished_at'] is not None
+    assert 'Bland is down' in json.loads(call['analysis'])['error']
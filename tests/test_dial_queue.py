@@ -0,0 +1,73 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from dial_queue import DialQueue, next_window, parse_windows
+from dialer import CampaignDialer
+
+# A Monday
+MONDAY = datetime(2026, 10, 19, tzinfo=timezone.utc)
+
+
+def at(day, hour, minute=0):
+    return MONDAY + timedelta(days=day, hours=hour, minutes=minute)
+
+
+def test_next_window_skips_closed_windows_and_weekends():
+    windows = parse_windows("09:00-12:00,13:30-17:00")
+    # 12:30 in New York falls between the two windows
+    assert next_window(at(0, 16, 30), "America/New_York", windows) == (at(0, 17, 30), at(0, 21))
+    # Friday evening in London waits for Monday morning, after the clocks went back
+    assert next_window(at(4, 18), "Europe/London", windows)[0] == at(7, 9)
+    assert next_window(at(0, 10), "Europe/London", windows, weekdays=frozenset()) is None
+
+
+def test_open_leads_are_released_by_closing_time():
+    queue = DialQueue("09:00-17:00")
+    now = at(0, 14)  # 16:00 in Berlin, 10:00 in New York, 07:00 in San Francisco
+    for lead, location in [("ny", "New York, NY"), ("berlin", "Berlin, Germany"), ("sf", "San Francisco, CA")]:
+        assert queue.push(lead, location, now=now)
+    assert queue.pop_due(now) == "berlin"
+    assert queue.pop_due(now) == "ny"
+    assert queue.pop_due(now) is None
+    assert queue.release_time("sf")[0] == at(0, 16)
+    assert queue.pop_due(at(0, 16)) == "sf"
+    assert len(queue) == 0
+
+
+def test_lead_whose_window_closed_waits_for_the_next_one():
+    queue = DialQueue("09:00-12:00")
+    queue.push("ny", "New York", now=at(0, 14))
+    assert queue.pop_due(at(0, 17)) is None
+    assert queue.release_time("ny")[0] == at(1, 13)
+    assert queue.pop_expired() == []
+    assert queue.pop_due(at(1, 13)) == "ny"
+
+
+def test_lead_without_a_window_left_is_expired():
+    queue = DialQueue("09:00-12:00")
+    queue.push("ny", "New York", now=at(0, 14))
+    queue.weekdays = frozenset()
+    assert queue.pop_due(at(0, 17)) is None
+    assert len(queue) == 0
+    assert queue.release_time("ny") is None
+    assert queue.pop_expired() == ["ny"]
+    assert queue.pop_expired() == []
+
+
+class StaleQueue(DialQueue):
+    """Queues every lead for a window long past and then allows no more days."""
+
+    def push(self, lead, location, now=None):
+        queued = super().push(lead, location, now=datetime(2020, 1, 6, 15, tzinfo=timezone.utc))
+        self.weekdays = frozenset()
+        return queued
+
+
+def test_dialer_skips_a_lead_with_no_window_left():
+    dialer = CampaignDialer(tracker=None, knowledge_base=None, max_concurrent_calls=1, dial_queue=StaleQueue())
+    dialer.start([("Acme", "+1 415 867 5309", "New York")])
+    deadline = time.monotonic() + 5
+    while dialer.is_running() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert dialer.statuses() == {"Acme": "skipped: no calling window left"}
+    assert not dialer.is_running()
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import dialer
+from dial_queue import DialQueue
+from dialer import CampaignDialer
+
+
+class FakeTracker:
+    """Finishes every call after a short delay and records how many were live at once."""
+
+    def __init__(self):
+        self.live = 0
+        self.max_live = 0
+        self._lock = threading.Lock()
+        self._results = {}
+
+    def track(self, call_id):
+        with self._lock:
+            self.live += 1
+            self.max_live = max(self.max_live, self.live)
+
+    def wait_for(self, call_id, timeout=None):
+        time.sleep(0.05)
+        with self._lock:
+            self.live -= 1
+        return {'analysis': {'answers': ['', '', '', '', f"Summary of {call_id}"]}}
+
+    def pop_result(self, call_id):
+        pass
+
+
+def always_open():
+    return DialQueue("00:00-24:00", weekdays=range(7))
+
+
+def wait_until_finished(campaign):
+    deadline = time.monotonic() + 5
+    while campaign.is_running() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_campaign_dials_every_lead_within_the_line_limit(monkeypatch):
+    dialed = []
+
+    def make_ai_call(phone_number, task, webhook=None):
+        dialed.append(phone_number)
+        if phone_number == 'busy':
+            return {'status': 'error', 'message': 'number busy'}
+        return {'status': 'success', 'call_id': f"call-{phone_number}"}
+
+    monkeypatch.setattr(dialer, 'make_ai_call', make_ai_call)
+    tracker = FakeTracker()
+    campaign = CampaignDialer(tracker, 'Our product', max_concurrent_calls=2, dial_queue=always_open(),
+                              build_task=lambda name, knowledge_base, details: f"Call {name}")
+    campaign.start([(f"Lead {i}", str(i), "New York") for i in range(6)]
+                   + [("No phone", "", "New York"), ("Busy", "busy", "New York")])
+    wait_until_finished(campaign)
+
+    statuses = campaign.statuses()
+    assert [statuses[f"Lead {i}"] for i in range(6)] == ['done'] * 6
+    assert statuses["No phone"] == 'skipped: no phone number'
+    assert statuses["Busy"] == 'failed: call was not placed'
+    assert tracker.max_live == 2
+    assert sorted(dialed) == sorted([str(i) for i in range(6)] + ['busy'])
+    assert campaign.pop_notes()["Lead 3"] == "Summary of call-3"
+    assert campaign.progress() == (8, 8)
+
+
+def test_cancel_stops_queued_leads(monkeypatch):
+    release = threading.Event()
+
+    def make_ai_call(phone_number, task, webhook=None):
+        release.wait(5)
+        return {'status': 'success', 'call_id': f"call-{phone_number}"}
+
+    monkeypatch.setattr(dialer, 'make_ai_call', make_ai_call)
+    campaign = CampaignDialer(FakeTracker(), 'Our product', max_concurrent_calls=1, dial_queue=always_open(),
+                              build_task=lambda name, knowledge_base, details: f"Call {name}")
+    campaign.start([(f"Lead {i}", str(i), "New York") for i in range(3)])
+    time.sleep(0.1)
+    campaign.cancel()
+    release.set()
+    wait_until_finished(campaign)
+    statuses = campaign.statuses()
+    assert statuses["Lead 0"] == 'done'
+    assert statuses["Lead 1"] == statuses["Lead 2"] == 'cancelled'
@@ -0,0 +1,44 @@
+import pytest
+
+from json_stream import iter_json_objects, parse_json
+
+
+@pytest.mark.parametrize("text", [
+    '{name: Acme, head_office: San Francisco, CA, USA, phone: +1 415 555 0100}',
+    '{"name": "Acme", "head_office": San Francisco, CA, USA, "phone": +1 415 555 0100}',
+])
+def test_unquoted_values_with_commas_and_spaces(text):
+    assert list(iter_json_objects([text])) == [
+        {'name': 'Acme', 'head_office': 'San Francisco, CA, USA', 'phone': '+1 415 555 0100'}
+    ]
+
+
+def test_unquoted_value_ends_at_closing_brace():
+    assert parse_json('{"phone": +1 415 555 0100, "size": 20, "funding": 1.5M}') == {
+        'phone': '+1 415 555 0100', 'size': 20, 'funding': '1.5M'
+    }
+
+
+def test_numbers_literals_and_urls_stay_typed():
+    text = '{"minutes": 24 * 60, "public": True, "ceo": None, "url": https://acme.com/about, "tags": [b2b, saas]}'
+    assert parse_json(text) == {
+        'minutes': 1440, 'public': True, 'ceo': None, 'url': 'https://acme.com/about', 'tags': ['b2b', 'saas']
+    }
+
+
+def test_truncated_unquoted_value_is_salvaged():
+    assert list(iter_json_objects(['{"name": "Acme", "head_office": San Fra', 'ncisco, CA'])) == [
+        {'name': 'Acme', 'head_office': 'San Francisco, CA'}
+    ]
+
+
+@pytest.mark.parametrize("tail", [' and then {', '\n{', ' {}'])
+def test_trailing_garbage_is_not_a_record(tail):
+    assert list(iter_json_objects(['{"name": "Acme"}' + tail])) == [{'name': 'Acme'}]
+
+
+def test_numbers_without_a_leading_or_trailing_digit():
+    assert parse_json('{"n": -5, "m": .5, "k": -.5, "p": +.25, "q": 5., "e": .5e2, "s": [-.1, 1.]}') == {
+        'n': -5, 'm': 0.5, 'k': -0.5, 'p': 0.25, 'q': 5.0, 'e': 50.0, 's': [-0.1, 1.0]
+    }
+    assert list(iter_json_objects(['{"n": -5, "m": .5}'])) == [{'n': -5, 'm': 0.5}]
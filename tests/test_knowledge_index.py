@@ -0,0 +1,63 @@
+import pytest
+
+from knowledge_index import CALL_QUERY, KnowledgeIndex, _segment, lead_query
+
+KNOWLEDGE_BASE = """# Acme
+
+Acme sells rocket sleds.
+
+## Products and pricing
+
+Our products, solutions and services: key features, benefits, use cases, pricing for customers.
+
+## Enterprise
+
+Enterprise customers in large organizations get security, compliance and SSO integration.
+
+## Startups
+
+Startup and small business plans for founders, free for the first year.
+
+## Europe
+
+Offices in Berlin serve customers across Germany.
+"""
+
+
+def best_headings(lead, k=2):
+    index = KnowledgeIndex(KNOWLEDGE_BASE, max_chars=120)
+    return [index.sections[i].splitlines()[0] for i in index.search(lead_query("Foo", lead), k)]
+
+
+def test_lead_query_uses_only_lead_columns():
+    query = lead_query("Foo", {"Size": "20", "Head Office Location": "Berlin", "Funding": "Seed", "Industry": "Retail"})
+    assert "Retail" not in query
+    assert CALL_QUERY not in query
+
+
+@pytest.mark.parametrize("lead, expected", [
+    ({"Size": "5000", "Head Office Location": "Austin"}, ["## Enterprise", "## Products and pricing"]),
+    ({"Size": "20", "Head Office Location": "Berlin, Germany"}, ["## Startups", "## Europe"]),
+])
+def test_lead_attributes_decide_the_ranking(lead, expected):
+    assert best_headings(lead) == expected
+
+
+def test_call_query_ranks_sections_without_lead_terms():
+    assert best_headings({}, k=1) == ["## Products and pricing"]
+
+
+@pytest.mark.parametrize("size, segment", [
+    ("20", "startup"),
+    ("11-50", "startup"),
+    ("50-200", "mid-market"),
+    ("201-500", "mid-market"),
+    ("1,000-5,000", "enterprise"),
+    ("501-1,000 employees", "mid-market"),
+    ("10k+", "enterprise"),
+    ("2.5k", "enterprise"),
+    ("", ""),
+    ("unknown", ""),
+])
+def test_size_ranges_map_to_the_right_segment(size, segment):
+    assert _segment(size).split(" ")[0] == segment
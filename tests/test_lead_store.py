@@ -0,0 +1,82 @@
+import pytest
+
+from experiments.models import Company, SalesContact
+from lead_store import LeadStore, normalize_phone
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LeadStore(str(tmp_path / "leads.db"))
+
+
+def _company(name, url="", phone="", email="", size=""):
+    return Company(name=name, url=url, size=size, sales_dept=SalesContact(email=email, phone=phone))
+
+
+@pytest.mark.parametrize("phone", ["123-456-7890", "(555) 555-1234", "+1 415 555 0100", "000-000-0000", "555-0199", "12345"])
+def test_placeholder_and_short_phones_have_no_key(phone):
+    assert normalize_phone(phone) == ""
+
+
+def test_real_phone_keeps_its_digits():
+    assert normalize_phone("+1 (415) 867-5309") == "14158675309"
+
+
+def test_same_name_under_another_spelling_merges(store):
+    first = store.upsert_company(_company("Acme Inc.", size="50"))
+    assert store.upsert_company(_company("ACME, LLC", url="https://acme.com")) == first
+    assert store.count_leads() == 1
+
+
+def test_placeholder_phone_does_not_merge_companies(store):
+    first = store.upsert_company(_company("Acme", phone="123-456-7890"))
+    second = store.upsert_company(_company("Globex", phone="(123) 456-7890"))
+    assert first != second
+    assert list(store.query_leads(names=["Globex"])["Name"]) == ["Globex"]
+
+
+def test_shared_domain_does_not_merge_different_names(store):
+    first = store.upsert_company(_company("Initech", email="sales@holding.com"))
+    second = store.upsert_company(_company("Umbrella", email="info@holding.com"))
+    assert first != second
+    assert store.count_leads() == 2
+
+
+def test_matching_domain_and_name_merges_and_keeps_alias(store):
+    first = store.upsert_company(_company("Acme", url="https://www.acme.com"))
+    assert store.upsert_company(_company("Acme Robotics", url="acme.com/about", size="200")) == first
+    assert store.count_leads() == 1
+    assert store.lead_id("Acme Robotics") == first
+    table = store.query_leads(names=["Acme Robotics", "Acme"])
+    assert list(table["Name"]) == ["Acme Robotics", "Acme"]
+    assert list(table["Size"]) == ["200", "200"]
+    assert set(store.find_known(["Acme Robotics"])) == {"Acme Robotics"}
+    store.update_notes("Acme Robotics", "met at the fair")
+    assert store.query_leads(names=["Acme"])["Notes"][0] == "met at the fair"
+
+
+def test_matching_real_phone_and_name_merges(store):
+    first = store.upsert_company(_company("Hooli", phone="+1 (415) 867-5309"))
+    assert store.upsert_company(_company("Hooli Labs", phone="1-415-867-5309")) == first
+
+
+def test_query_leads_pages_and_searches(store):
+    for i in range(30):
+        store.upsert_company(_company(f"Lead {i:02}", size=str(i)))
+    assert store.count_leads() == 30
+    assert len(store.query_leads(limit=10, offset=25)) == 5
+    assert list(store.query_leads(search="lead 2")["Name"]) == [f"Lead {i}" for i in range(29, 19, -1)]
+
+
+def test_page_companies_sorts_filters_and_counts(store):
+    for i in range(30):
+        store.upsert_company(_company(f"Lead {i:02}", size=str(i)))
+    page, matching = store.page_companies(order_by="size", descending=False, limit=5, offset=5)
+    assert matching == 30
+    assert [company.name for company in page] == [f"Lead {i:02}" for i in range(5, 10)]
+    page, matching = store.page_companies(search="lead 1", order_by="name", limit=3)
+    assert matching == 10
+    assert [company.name for company in page] == ["Lead 19", "Lead 18", "Lead 17"]
+    ids = [store.lead_id("Lead 03"), store.lead_id("Lead 04")]
+    page, matching = store.page_companies(lead_ids=ids, order_by="name", descending=False)
+    assert (matching, [company.name for company in page]) == (2, ["Lead 03", "Lead 04"])
@@ -0,0 +1,51 @@
+import pandas as pd
+import pyarrow as pa
+
+from lead_store import LEAD_COLUMNS
+from lead_table import LeadTable, lead_companies, lead_notes, read_lead_file, write_lead_file
+
+
+def _leads(count):
+    return pd.DataFrame([{column: f"{column} {i}" for column in LEAD_COLUMNS} | {"Name": f"Lead {i}", "Notes": ""}
+                         for i in range(count)])
+
+
+def test_round_trip_keeps_file_columns_without_copying(tmp_path):
+    for fmt in ("parquet", "arrow"):
+        path = tmp_path / f"leads.{fmt}"
+        path.write_bytes(write_lead_file(_leads(120), fmt))
+        table = read_lead_file(str(path))
+        assert isinstance(table, pa.Table)
+        assert table.column_names == LEAD_COLUMNS
+        assert table.num_rows == 120
+
+
+def test_read_fills_missing_columns_and_drops_blank_and_repeated_names(tmp_path):
+    path = tmp_path / "leads.arrow"
+    raw = pa.table({"Name": ["A", None, "", "A", "B"], "Size": [1, 2, 3, 4, None]})
+    with pa.ipc.new_file(str(path), raw.schema) as writer:
+        writer.write_table(raw)
+    table = read_lead_file(str(path))
+    assert table.column("Name").to_pylist() == ["A", "B"]
+    assert table.column("Size").to_pylist() == ["1", ""]
+    assert table.column("Notes").to_pylist() == ["", ""]
+
+
+def test_pages_rows_and_notes_overlay():
+    table = LeadTable(_leads(120))
+    assert table.page_count(50) == 3
+    assert table.page_of("Lead 101", 50) == 2
+    assert list(table.page(2, 50)["Name"]) == [f"Lead {i}" for i in range(100, 120)]
+    table.set_notes("Lead 101", "call back")
+    assert table.row("Lead 101")["Notes"] == "call back"
+    assert table.page(2, 50)["Notes"][1] == "call back"
+    assert table.column("Notes")[101] == "call back"
+    assert table.to_arrow().column("Notes")[101].as_py() == "call back"
+    assert table.row("missing") is None
+
+
+def test_companies_and_notes_line_up():
+    table = pa.Table.from_pandas(_leads(3).assign(Notes=["x", "", "z"]), preserve_index=False)
+    companies = list(lead_companies(table))
+    assert [company.name for company in companies] == ["Lead 0", "Lead 1", "Lead 2"]
+    assert list(lead_notes(table)) == ["x", "", "z"]
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from llm_cache import LLMCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    return now
+
+
+def test_hits_and_misses_add_up_across_instances(tmp_path, clock):
+    path = str(tmp_path / 'cache.sqlite')
+    first, second = LLMCache(path, flush_interval=3600), LLMCache(path, flush_interval=3600)
+    key = LLMCache.make_key('model', [{'role': 'user', 'content': 'hi'}], {'temperature': 0})
+    assert first.get(key) is None
+    first.set(key, 'hello')
+    assert first.get(key) == 'hello'
+    assert second.get(key) == 'hello'
+    assert second.get('missing') is None
+    # Buffered until the next flush, so the other instance has not seen them yet
+    assert first.stats()['hits'] == 1
+    stats = second.stats()
+    assert (stats['hits'], stats['misses'], stats['entries'], stats['bytes']) == (2, 2, 1, 5)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_expired_entry_is_a_miss_and_is_dropped_on_the_next_set(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / 'cache.sqlite'), ttl=60)
+    cache.set('old', 'x' * 10)
+    clock[0] += 61
+    assert cache.get('old') is None
+    cache.set('new', 'y' * 4)
+    stats = cache.stats()
+    assert (stats['misses'], stats['entries'], stats['bytes'], stats['evictions']) == (1, 1, 4, 0)
+
+
+def test_least_recently_used_entries_are_evicted_and_counted(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / 'cache.sqlite'), max_bytes=30, flush_interval=3600)
+    for key in 'abc':
+        cache.set(key, key * 10)
+        clock[0] += 1
+    # A buffered hit still protects "a", because set() writes access times before evicting
+    assert cache.get('a') == 'a' * 10
+    clock[0] += 1
+    cache.set('d', 'd' * 10)
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == ['a' * 10, 'c' * 10, 'd' * 10]
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (3, 30, 1)
+
+
+def test_replacing_an_entry_keeps_the_byte_count(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / 'cache.sqlite'))
+    cache.set('a', 'x' * 10)
+    cache.set('a', 'x' * 3)
+    assert cache.stats()['bytes'] == 3
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'bytes': 0, 'hit_rate': 0.0}
@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import llm
+from llm import CompletionDispatcher
+
+
+class FakeCompletions(BaseHTTPRequestHandler):
+    """Streams "Hello" as server-sent events, behaving according to the requested model."""
+
+    requests = Counter()
+
+    def do_POST(self):
+        model = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['model']
+        FakeCompletions.requests[model] += 1
+        if model == 'fail':
+            self.send_response(500)
+            self.end_headers()
+            return
+        if model == 'slow' or (model == 'slow-once' and FakeCompletions.requests[model] == 1):
+            time.sleep(3)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        try:
+            for piece in ([] if model == 'empty' else ['Hel', 'lo']):
+                chunk = {'choices': [{'delta': {'content': piece}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeCompletions)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def fresh_counts(monkeypatch):
+    FakeCompletions.requests.clear()
+    monkeypatch.setattr(llm, 'LLM_HEDGE_DELAY', 0.3)
+
+
+def read_stream(stream):
+    pieces = []
+    while True:
+        try:
+            pieces.append(next(stream))
+        except StopIteration as result:
+            return ''.join(pieces), result.value
+
+
+@pytest.mark.parametrize('broken', ['fail', 'empty'])
+def test_complete_fails_over_to_next_endpoint(url, broken):
+    dispatcher = CompletionDispatcher([(broken, url), ('ok', url)])
+    content, usage, model = dispatcher.complete([{'role': 'user', 'content': 'hi'}])
+    assert (content, model) == ('Hello', 'ok')
+    assert dispatcher.stats()['failovers'] == 1
+
+
+@pytest.mark.parametrize('broken', ['fail', 'empty'])
+def test_stream_fails_over_to_next_endpoint(url, broken):
+    dispatcher = CompletionDispatcher([(broken, url), ('ok', url)])
+    text, (usage, model) = read_stream(dispatcher.stream([{'role': 'user', 'content': 'hi'}]))
+    assert (text, model) == ('Hello', 'ok')
+    assert usage['total_tokens'] > 0
+
+
+def test_stream_hedges_slow_first_token(url):
+    dispatcher = CompletionDispatcher([('slow-once', url)])
+    started = time.monotonic()
+    text, (_, model) = read_stream(dispatcher.stream([{'role': 'user', 'content': 'hi'}]))
+    assert text == 'Hello'
+    assert time.monotonic() - started < 2
+    stats = dispatcher.stats()
+    assert (stats['hedges'], stats['hedge_wins']) == (1, 1)
+
+
+def test_hedging_respects_budget(url):
+    dispatcher = CompletionDispatcher([('slow-once', url)], hedge_burst=0, hedge_budget=0.1)
+    text, _ = read_stream(dispatcher.stream([{'role': 'user', 'content': 'hi'}]))
+    assert text == 'Hello'
+    assert dispatcher.stats()['hedges_denied'] == 1
+
+
+def test_stream_deadline(url):
+    dispatcher = CompletionDispatcher([('slow', url)], hedge_budget=0, deadline=0.5)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        read_stream(dispatcher.stream([{'role': 'user', 'content': 'hi'}]))
+    assert time.monotonic() - started < 1.5
+
+
+def test_every_endpoint_failing_raises(url):
+    dispatcher = CompletionDispatcher([('fail', url), ('empty', url)])
+    with pytest.raises(RuntimeError, match='Every model failed'):
+        read_stream(dispatcher.stream([{'role': 'user', 'content': 'hi'}]))
+    assert dispatcher.stats()['failures'] == 1
+
+
+def test_stream_chat_completion_uses_dispatcher(url, monkeypatch):
+    monkeypatch.setattr(llm, 'LLM_CACHE_DISABLED', True)
+    monkeypatch.setattr(llm, '_dispatcher', CompletionDispatcher([('fail', url), ('ok', url)]))
+    assert ''.join(llm.stream_chat_completion([{'role': 'user', 'content': 'hi'}], model='fail')) == 'Hello'
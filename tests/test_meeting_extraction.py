@@ -0,0 +1,51 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from meeting_extraction import MEETING_CONFIDENCE_THRESHOLD, event_from_answers, parse_meeting_time
+
+ZONE = 'America/New_York'
+# A Wednesday morning
+CALL_TIME = datetime(2026, 10, 14, 10, 0, tzinfo=ZoneInfo(ZONE))
+
+
+def parse(text):
+    return parse_meeting_time(text, CALL_TIME, ZONE)
+
+
+def test_fraction_after_weekday_is_not_a_date():
+    start, confidence = parse("Jane agreed to a demo Thursday at 2pm. 1/2 of their team is remote.")
+    assert start == datetime(2026, 10, 15, 14, 0, tzinfo=ZoneInfo(ZONE))
+    assert confidence >= MEETING_CONFIDENCE_THRESHOLD
+
+
+def test_fraction_alone_is_not_a_date():
+    assert parse("team is 3/4 remote") == (None, 0.0)
+
+
+def test_ratio_does_not_hide_a_relative_date():
+    start, confidence = parse("24/7 support, call tomorrow at 3pm")
+    assert start == datetime(2026, 10, 15, 15, 0, tzinfo=ZoneInfo(ZONE))
+    assert confidence == 1.0
+
+
+@pytest.mark.parametrize("text", ["meeting on 10/20 at 2pm", "Tuesday 10/20 at 2pm", "10/20/2026 at 2pm"])
+def test_numeric_date_in_date_context(text):
+    start, confidence = parse(text)
+    assert start == datetime(2026, 10, 20, 14, 0, tzinfo=ZoneInfo(ZONE))
+    assert confidence >= MEETING_CONFIDENCE_THRESHOLD
+
+
+@pytest.mark.parametrize("text", ["Thursday 10/20 at 2pm", "Friday, October 17 at 11am"])
+def test_weekday_contradicting_date_goes_to_llm(text):
+    start, confidence = parse(text)
+    assert start is not None
+    assert confidence < MEETING_CONFIDENCE_THRESHOLD
+
+
+def test_summary_fraction_does_not_book_from_answers():
+    answers = ["Jane", "jane@example.com", "", "high",
+               "Jane agreed to a demo Thursday at 2pm. 1/2 of their team is remote."]
+    event, confidence = event_from_answers(answers, CALL_TIME, ZONE)
+    assert event['start']['dateTime'] == '2026-10-15T14:00:00-04:00'
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from rate_limit import BATCH, INTERACTIVE, ProviderLimiter, estimate_tokens, priority
+
+
+def start_waiter(limiter, granted, name, **kwargs):
+    def wait():
+        limiter.acquire(**kwargs)
+        granted.append(name)
+    thread = threading.Thread(target=wait)
+    thread.start()
+    time.sleep(0.02)
+    return thread
+
+
+def test_interactive_request_overtakes_queued_batch_work():
+    # One request per 0.1 s with no burst allowance
+    limiter = ProviderLimiter('test', requests_per_minute=600, burst_seconds=0.1)
+    limiter.acquire()
+    granted = []
+    threads = [start_waiter(limiter, granted, f'batch {i}', priority=BATCH) for i in range(3)]
+    threads.append(start_waiter(limiter, granted, 'interactive', priority=INTERACTIVE))
+    for thread in threads:
+        thread.join(5)
+    assert granted == ['interactive', 'batch 0', 'batch 1', 'batch 2']
+    stats = limiter.stats()
+    assert stats['granted'] == {'interactive': 2, 'batch': 3}
+    assert stats['max_queued'] == 4
+    assert stats['in_flight'] == 5
+
+
+def test_priority_context_sets_the_default_class():
+    limiter = ProviderLimiter('test')
+    with priority(BATCH):
+        limiter.acquire()
+    limiter.acquire()
+    assert limiter.stats()['granted'] == {'interactive': 1, 'batch': 1}
+
+
+def test_refunded_tokens_admit_the_next_request_at_once():
+    # 10 tokens per second, at most 10 in the bucket
+    limiter = ProviderLimiter('test', tokens_per_minute=600, burst_seconds=1)
+    limiter.acquire(tokens=10)
+    granted = []
+    thread = start_waiter(limiter, granted, 'next', tokens=10)
+    assert granted == []
+    # The first call used none of its estimate
+    limiter.charge(-10)
+    thread.join(0.3)
+    assert granted == ['next']
+
+
+def test_underestimated_usage_is_charged_to_later_requests():
+    limiter = ProviderLimiter('test', tokens_per_minute=600, burst_seconds=1)
+    limiter.acquire(tokens=5)
+    limiter.charge(10)
+    assert limiter.stats()['tokens_available'] < -4
+    assert limiter.acquire(tokens=1) > 0.4
+
+
+def test_pause_holds_admission_and_is_counted():
+    limiter = ProviderLimiter('test')
+    limiter.pause(0.2)
+    assert limiter.acquire() >= 0.15
+    limiter.release()
+    stats = limiter.stats()
+    assert (stats['rate_limited'], stats['in_flight']) == (1, 0)
+
+
+def test_estimate_tokens_counts_prompt_and_completion():
+    assert estimate_tokens([{'role': 'user', 'content': 'x' * 400}], max_tokens=50) == 150
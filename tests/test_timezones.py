@@ -0,0 +1,28 @@
+import pytest
+
+from timezones import DEFAULT_TIMEZONE, timezone_for_location
+
+
+@pytest.mark.parametrize("location, expected", [
+    ("San Francisco, CA", "America/Los_Angeles"),
+    ("Austin, Texas, USA", "America/Chicago"),
+    ("Springfield, IL", "America/Chicago"),
+    ("Springfield, IL, USA", "America/Chicago"),
+    ("Somewhere, CA 94105", "America/Los_Angeles"),
+    ("Newark, DE, United States", "America/New_York"),
+    ("Carmel, IN 46032", "America/Indiana/Indianapolis"),
+    ("Stuttgart, DE", "Europe/Berlin"),
+    ("Kochi, IN", "Asia/Kolkata"),
+    ("Kochi, Kerala, India", "Asia/Kolkata"),
+    ("Toronto, CA", "America/Toronto"),
+    ("Mississauga, ON, CA", "America/Toronto"),
+    ("Haifa, Israel", "Asia/Jerusalem"),
+    ("Fremont, CA", "America/Los_Angeles"),
+    ("Cambridge, UK", "Europe/London"),
+    ("Tokyo", "Asia/Tokyo"),
+    ("Texas", "America/Chicago"),
+    ("", DEFAULT_TIMEZONE),
+    ("Atlantis", DEFAULT_TIMEZONE),
+])
+def test_timezone_for_location(location, expected):
+    assert timezone_for_location(location) == expected
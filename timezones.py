@@ -0,0 +1,193 @@
+import os
+import re
+from functools import lru_cache
+
+# Used when a location cannot be resolved
+DEFAULT_TIMEZONE = os.getenv('DEFAULT_TIMEZONE', 'America/Los_Angeles')
+
+CITY_TIMEZONES = {
+    # North America
+    "san francisco": "America/Los_Angeles", "los angeles": "America/Los_Angeles", "san jose": "America/Los_Angeles",
+    "palo alto": "America/Los_Angeles", "mountain view": "America/Los_Angeles", "menlo park": "America/Los_Angeles",
+    "sunnyvale": "America/Los_Angeles", "santa clara": "America/Los_Angeles", "redwood city": "America/Los_Angeles",
+    "san mateo": "America/Los_Angeles", "oakland": "America/Los_Angeles", "berkeley": "America/Los_Angeles",
+    "san diego": "America/Los_Angeles", "irvine": "America/Los_Angeles", "santa monica": "America/Los_Angeles",
+    "seattle": "America/Los_Angeles", "bellevue": "America/Los_Angeles", "redmond": "America/Los_Angeles",
+    "portland": "America/Los_Angeles", "las vegas": "America/Los_Angeles", "vancouver": "America/Vancouver",
+    "sacramento": "America/Los_Angeles", "fremont": "America/Los_Angeles", "cupertino": "America/Los_Angeles",
+    "pasadena": "America/Los_Angeles", "long beach": "America/Los_Angeles", "emeryville": "America/Los_Angeles",
+    "boise": "America/Boise", "colorado springs": "America/Denver", "fort collins": "America/Denver",
+    "phoenix": "America/Phoenix", "scottsdale": "America/Phoenix", "tempe": "America/Phoenix",
+    "denver": "America/Denver", "boulder": "America/Denver", "salt lake city": "America/Denver",
+    "lehi": "America/Denver", "provo": "America/Denver", "calgary": "America/Edmonton", "edmonton": "America/Edmonton",
+    "chicago": "America/Chicago", "austin": "America/Chicago", "dallas": "America/Chicago", "houston": "America/Chicago",
+    "san antonio": "America/Chicago", "minneapolis": "America/Chicago", "kansas city": "America/Chicago",
+    "st. louis": "America/Chicago", "saint louis": "America/Chicago", "nashville": "America/Chicago",
+    "new orleans": "America/Chicago", "milwaukee": "America/Chicago", "winnipeg": "America/Winnipeg",
+    "indianapolis": "America/Indiana/Indianapolis", "little rock": "America/Chicago", "wilmington": "America/New_York",
+    "mexico city": "America/Mexico_City", "guadalajara": "America/Mexico_City", "monterrey": "America/Monterrey",
+    "new york": "America/New_York", "new york city": "America/New_York", "nyc": "America/New_York",
+    "brooklyn": "America/New_York", "boston": "America/New_York", "cambridge, ma": "America/New_York",
+    "washington": "America/New_York", "washington dc": "America/New_York", "washington, d.c.": "America/New_York",
+    "philadelphia": "America/New_York", "pittsburgh": "America/New_York", "atlanta": "America/New_York",
+    "miami": "America/New_York", "orlando": "America/New_York", "tampa": "America/New_York",
+    "charlotte": "America/New_York", "raleigh": "America/New_York", "durham": "America/New_York",
+    "detroit": "America/Detroit", "columbus": "America/New_York", "baltimore": "America/New_York",
+    "toronto": "America/Toronto", "ottawa": "America/Toronto", "montreal": "America/Toronto",
+    "waterloo": "America/Toronto", "halifax": "America/Halifax",
+    # South America
+    "sao paulo": "America/Sao_Paulo", "são paulo": "America/Sao_Paulo", "rio de janeiro": "America/Sao_Paulo",
+    "buenos aires": "America/Argentina/Buenos_Aires", "santiago": "America/Santiago", "bogota": "America/Bogota",
+    "bogotá": "America/Bogota", "lima": "America/Lima", "medellin": "America/Bogota",
+    # Europe
+    "london": "Europe/London", "manchester": "Europe/London", "edinburgh": "Europe/London",
+    "oxford": "Europe/London", "dublin": "Europe/Dublin", "lisbon": "Europe/Lisbon", "porto": "Europe/Lisbon",
+    "paris": "Europe/Paris", "lyon": "Europe/Paris", "berlin": "Europe/Berlin", "munich": "Europe/Berlin",
+    "hamburg": "Europe/Berlin", "frankfurt": "Europe/Berlin", "cologne": "Europe/Berlin", "amsterdam": "Europe/Amsterdam",
+    "rotterdam": "Europe/Amsterdam", "brussels": "Europe/Brussels", "luxembourg": "Europe/Luxembourg",
+    "zurich": "Europe/Zurich", "geneva": "Europe/Zurich", "vienna": "Europe/Vienna", "madrid": "Europe/Madrid",
+    "barcelona": "Europe/Madrid", "milan": "Europe/Rome", "rome": "Europe/Rome", "copenhagen": "Europe/Copenhagen",
+    "stockholm": "Europe/Stockholm", "oslo": "Europe/Oslo", "helsinki": "Europe/Helsinki", "tallinn": "Europe/Tallinn",
+    "warsaw": "Europe/Warsaw", "krakow": "Europe/Warsaw", "prague": "Europe/Prague", "budapest": "Europe/Budapest",
+    "bucharest": "Europe/Bucharest", "athens": "Europe/Athens", "istanbul": "Europe/Istanbul", "kyiv": "Europe/Kyiv",
+    "kiev": "Europe/Kyiv", "moscow": "Europe/Moscow",
+    # Middle East and Africa
+    "tel aviv": "Asia/Jerusalem", "jerusalem": "Asia/Jerusalem", "dubai": "Asia/Dubai", "abu dhabi": "Asia/Dubai",
+    "riyadh": "Asia/Riyadh", "doha": "Asia/Qatar", "cairo": "Africa/Cairo", "lagos": "Africa/Lagos",
+    "nairobi": "Africa/Nairobi", "johannesburg": "Africa/Johannesburg", "cape town": "Africa/Johannesburg",
+    # Asia Pacific
+    "bangalore": "Asia/Kolkata", "bengaluru": "Asia/Kolkata", "mumbai": "Asia/Kolkata", "delhi": "Asia/Kolkata",
+    "new delhi": "Asia/Kolkata", "gurgaon": "Asia/Kolkata", "gurugram": "Asia/Kolkata", "hyderabad": "Asia/Kolkata",
+    "pune": "Asia/Kolkata", "chennai": "Asia/Kolkata", "noida": "Asia/Kolkata", "karachi": "Asia/Karachi",
+    "singapore": "Asia/Singapore", "kuala lumpur": "Asia/Kuala_Lumpur", "jakarta": "Asia/Jakarta",
+    "bangkok": "Asia/Bangkok", "ho chi minh city": "Asia/Ho_Chi_Minh", "hanoi": "Asia/Bangkok", "manila": "Asia/Manila",
+    "hong kong": "Asia/Hong_Kong", "shenzhen": "Asia/Shanghai", "shanghai": "Asia/Shanghai", "beijing": "Asia/Shanghai",
+    "hangzhou": "Asia/Shanghai", "taipei": "Asia/Taipei", "seoul": "Asia/Seoul", "tokyo": "Asia/Tokyo",
+    "osaka": "Asia/Tokyo", "sydney": "Australia/Sydney", "melbourne": "Australia/Melbourne",
+    "brisbane": "Australia/Brisbane", "perth": "Australia/Perth", "adelaide": "Australia/Adelaide",
+    "auckland": "Pacific/Auckland", "wellington": "Pacific/Auckland",
+}
+
+US_STATE_TIMEZONES = {
+    "al": "America/Chicago", "ak": "America/Anchorage", "az": "America/Phoenix", "ar": "America/Chicago",
+    "ca": "America/Los_Angeles", "co": "America/Denver", "ct": "America/New_York", "de": "America/New_York",
+    "dc": "America/New_York", "fl": "America/New_York", "ga": "America/New_York", "hi": "Pacific/Honolulu",
+    "id": "America/Boise", "il": "America/Chicago", "in": "America/Indiana/Indianapolis", "ia": "America/Chicago",
+    "ks": "America/Chicago", "ky": "America/New_York", "la": "America/Chicago", "me": "America/New_York",
+    "md": "America/New_York", "ma": "America/New_York", "mi": "America/Detroit", "mn": "America/Chicago",
+    "ms": "America/Chicago", "mo": "America/Chicago", "mt": "America/Denver", "ne": "America/Chicago",
+    "nv": "America/Los_Angeles", "nh": "America/New_York", "nj": "America/New_York", "nm": "America/Denver",
+    "ny": "America/New_York", "nc": "America/New_York", "nd": "America/Chicago", "oh": "America/New_York",
+    "ok": "America/Chicago", "or": "America/Los_Angeles", "pa": "America/New_York", "ri": "America/New_York",
+    "sc": "America/New_York", "sd": "America/Chicago", "tn": "America/Chicago", "tx": "America/Chicago",
+    "ut": "America/Denver", "vt": "America/New_York", "va": "America/New_York", "wa": "America/Los_Angeles",
+    "wv": "America/New_York", "wi": "America/Chicago", "wy": "America/Denver",
+    "alabama": "America/Chicago", "alaska": "America/Anchorage", "arizona": "America/Phoenix",
+    "arkansas": "America/Chicago", "california": "America/Los_Angeles", "colorado": "America/Denver",
+    "connecticut": "America/New_York", "delaware": "America/New_York", "district of columbia": "America/New_York",
+    "florida": "America/New_York", "georgia": "America/New_York", "hawaii": "Pacific/Honolulu",
+    "idaho": "America/Boise", "illinois": "America/Chicago", "indiana": "America/Indiana/Indianapolis",
+    "iowa": "America/Chicago", "kansas": "America/Chicago", "kentucky": "America/New_York",
+    "louisiana": "America/Chicago", "maine": "America/New_York", "maryland": "America/New_York",
+    "massachusetts": "America/New_York", "michigan": "America/Detroit", "minnesota": "America/Chicago",
+    "mississippi": "America/Chicago", "missouri": "America/Chicago", "montana": "America/Denver",
+    "nebraska": "America/Chicago", "nevada": "America/Los_Angeles", "new hampshire": "America/New_York",
+    "new jersey": "America/New_York", "new mexico": "America/Denver", "new york state": "America/New_York",
+    "north carolina": "America/New_York", "north dakota": "America/Chicago", "ohio": "America/New_York",
+    "oklahoma": "America/Chicago", "oregon": "America/Los_Angeles", "pennsylvania": "America/New_York",
+    "rhode island": "America/New_York", "south carolina": "America/New_York", "south dakota": "America/Chicago",
+    "tennessee": "America/Chicago", "texas": "America/Chicago", "utah": "America/Denver",
+    "vermont": "America/New_York", "virginia": "America/New_York", "washington state": "America/Los_Angeles",
+    "west virginia": "America/New_York", "wisconsin": "America/Chicago", "wyoming": "America/Denver",
+    # Canadian provinces
+    "british columbia": "America/Vancouver", "bc": "America/Vancouver", "alberta": "America/Edmonton",
+    "ontario": "America/Toronto", "on": "America/Toronto", "quebec": "America/Toronto", "qc": "America/Toronto",
+}
+
+COUNTRY_TIMEZONES = {
+    # Large multi-zone countries map to the zone of their main business hub
+    "usa": "America/New_York", "us": "America/New_York", "united states": "America/New_York",
+    "united states of america": "America/New_York", "canada": "America/Toronto", "mexico": "America/Mexico_City",
+    "brazil": "America/Sao_Paulo", "argentina": "America/Argentina/Buenos_Aires", "chile": "America/Santiago",
+    "colombia": "America/Bogota", "peru": "America/Lima",
+    "uk": "Europe/London", "united kingdom": "Europe/London", "england": "Europe/London", "scotland": "Europe/London",
+    "great britain": "Europe/London", "ireland": "Europe/Dublin", "portugal": "Europe/Lisbon", "france": "Europe/Paris",
+    "germany": "Europe/Berlin", "netherlands": "Europe/Amsterdam", "the netherlands": "Europe/Amsterdam",
+    "belgium": "Europe/Brussels", "switzerland": "Europe/Zurich", "austria": "Europe/Vienna", "spain": "Europe/Madrid",
+    "italy": "Europe/Rome", "denmark": "Europe/Copenhagen", "sweden": "Europe/Stockholm", "norway": "Europe/Oslo",
+    "finland": "Europe/Helsinki", "estonia": "Europe/Tallinn", "poland": "Europe/Warsaw",
+    "czech republic": "Europe/Prague", "czechia": "Europe/Prague", "hungary": "Europe/Budapest",
+    "romania": "Europe/Bucharest", "greece": "Europe/Athens", "turkey": "Europe/Istanbul", "ukraine": "Europe/Kyiv",
+    "russia": "Europe/Moscow", "israel": "Asia/Jerusalem", "uae": "Asia/Dubai", "united arab emirates": "Asia/Dubai",
+    "saudi arabia": "Asia/Riyadh", "qatar": "Asia/Qatar", "egypt": "Africa/Cairo", "nigeria": "Africa/Lagos",
+    "kenya": "Africa/Nairobi", "south africa": "Africa/Johannesburg", "india": "Asia/Kolkata",
+    "pakistan": "Asia/Karachi", "singapore": "Asia/Singapore", "malaysia": "Asia/Kuala_Lumpur",
+    "indonesia": "Asia/Jakarta", "thailand": "Asia/Bangkok", "vietnam": "Asia/Ho_Chi_Minh",
+    "philippines": "Asia/Manila", "hong kong": "Asia/Hong_Kong", "china": "Asia/Shanghai", "taiwan": "Asia/Taipei",
+    "south korea": "Asia/Seoul", "korea": "Asia/Seoul", "japan": "Asia/Tokyo", "australia": "Australia/Sydney",
+    "new zealand": "Pacific/Auckland",
+}
+
+# ISO codes of the countries above; a last part like "DE" or "IN" is read as one of these, not a US state.
+# CA, CO, AR, ID and IL are left out: far more leads are in California, Colorado, ... than in those countries
+COUNTRY_CODE_TIMEZONES = {
+    "mx": "America/Mexico_City", "br": "America/Sao_Paulo", "cl": "America/Santiago", "pe": "America/Lima",
+    "uk": "Europe/London", "gb": "Europe/London", "ie": "Europe/Dublin", "pt": "Europe/Lisbon", "fr": "Europe/Paris",
+    "de": "Europe/Berlin", "nl": "Europe/Amsterdam", "be": "Europe/Brussels", "ch": "Europe/Zurich",
+    "at": "Europe/Vienna", "es": "Europe/Madrid", "it": "Europe/Rome", "dk": "Europe/Copenhagen",
+    "se": "Europe/Stockholm", "no": "Europe/Oslo", "fi": "Europe/Helsinki", "ee": "Europe/Tallinn",
+    "pl": "Europe/Warsaw", "cz": "Europe/Prague", "hu": "Europe/Budapest", "ro": "Europe/Bucharest",
+    "gr": "Europe/Athens", "tr": "Europe/Istanbul", "ua": "Europe/Kyiv", "ru": "Europe/Moscow",
+    "ae": "Asia/Dubai", "sa": "Asia/Riyadh", "qa": "Asia/Qatar", "eg": "Africa/Cairo", "ng": "Africa/Lagos",
+    "ke": "Africa/Nairobi", "za": "Africa/Johannesburg", "in": "Asia/Kolkata", "pk": "Asia/Karachi",
+    "sg": "Asia/Singapore", "my": "Asia/Kuala_Lumpur", "th": "Asia/Bangkok",
+    "vn": "Asia/Ho_Chi_Minh", "ph": "Asia/Manila", "hk": "Asia/Hong_Kong", "cn": "Asia/Shanghai", "tw": "Asia/Taipei",
+    "kr": "Asia/Seoul", "jp": "Asia/Tokyo", "au": "Australia/Sydney", "nz": "Pacific/Auckland",
+}
+
+_US_NAMES = {"us", "usa", "u.s", "u.s.a", "united states", "united states of america"}
+# "CA 94105": a state code followed by a ZIP code
+_STATE_ZIP = re.compile(r"([a-z]{2}) \d{5}(?:-\d{4})?")
+
+
+@lru_cache(maxsize=4096)
+def timezone_for_location(location):
+    """Resolve a "city, state, country" style location to an IANA timezone name offline.
+
+    The most specific part that is known wins: city, then US state or
+    Canadian province, then country. Outside the US a trailing two-letter
+    part is a country code, so "Stuttgart, DE" is Germany rather than
+    Delaware; naming the US or giving a ZIP code keeps it a state. Unknown
+    locations get DEFAULT_TIMEZONE.
+    """
+    text = str(location or "").strip().lower()
+    if not text:
+        return DEFAULT_TIMEZONE
+    if text in CITY_TIMEZONES:
+        return CITY_TIMEZONES[text]
+    parts = [re.sub(r"\s+", " ", part).strip(" .") for part in re.split(r"[,/;|()]", text)]
+    parts = [part for part in parts if part]
+    for part in parts:
+        if part in CITY_TIMEZONES:
+            return CITY_TIMEZONES[part]
+    for part in parts[1:]:
+        match = _STATE_ZIP.fullmatch(part)
+        if match and match.group(1) in US_STATE_TIMEZONES:
+            return US_STATE_TIMEZONES[match.group(1)]
+    if not _US_NAMES.intersection(parts):
+        for part in reversed(parts):
+            if len(part) > 2 and part in COUNTRY_TIMEZONES:
+                return COUNTRY_TIMEZONES[part]
+        if len(parts) > 1 and parts[-1] in COUNTRY_CODE_TIMEZONES:
+            return COUNTRY_CODE_TIMEZONES[parts[-1]]
+    # A bare two-letter code is only taken as a state when it is not the first part
+    for part in parts[1:]:
+        if part in US_STATE_TIMEZONES:
+            return US_STATE_TIMEZONES[part]
+    for part in parts:
+        if len(part) > 2 and part in US_STATE_TIMEZONES:
+            return US_STATE_TIMEZONES[part]
+    for part in reversed(parts):
+        if part in COUNTRY_TIMEZONES:
+            return COUNTRY_TIMEZONES[part]
+    return DEFAULT_TIMEZONE
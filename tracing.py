@@ -0,0 +1,274 @@
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Finished spans are appended here as OTLP/JSON lines when set
+TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH')
+# Serve Prometheus metrics on this port when set
+TRACE_METRICS_PORT = os.getenv('TRACE_METRICS_PORT')
+# Recent spans kept in memory for the performance panel
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', '2000'))
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float('inf'))
+
+# Attributes summed per span name and exported as counters
+_COUNTERS = ('retries', 'prompt_tokens', 'completion_tokens', 'request_bytes', 'response_bytes')
+
+_current = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """One timed operation, such as a single LLM completion or Calendar insert."""
+
+    def __init__(self, tracer, name, service, parent=None, attributes=None):
+        self.tracer = tracer
+        self.name = name
+        self.service = service
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, **amounts):
+        for key, amount in amounts.items():
+            self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def end(self, error=None):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.tracer.record(self)
+
+    @property
+    def ok(self):
+        status = self.attributes.get('status')
+        return self.error is None and not (isinstance(status, int) and status >= 400)
+
+    def to_otlp(self):
+        def value(v):
+            if isinstance(v, bool):
+                return {'boolValue': v}
+            if isinstance(v, int):
+                return {'intValue': str(v)}
+            if isinstance(v, float):
+                return {'doubleValue': v}
+            return {'stringValue': str(v)}
+
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 3,  # SPAN_KIND_CLIENT
+            'startTimeUnixNano': str(int(self.start * 1e9)),
+            'endTimeUnixNano': str(int((self.start + self.duration) * 1e9)),
+            'attributes': [{'key': key, 'value': value(v)} for key, v in
+                           [('service', self.service), *self.attributes.items()] if v is not None],
+            'status': {'code': 1} if self.ok else {'code': 2, 'message': self.error or f"status {self.attributes.get('status')}"},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+class _Stats:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.counters = dict.fromkeys(_COUNTERS, 0)
+        self.cache = {'hit': 0, 'miss': 0}
+
+
+class Tracer:
+    """Collects finished spans, aggregates them per name and exports them.
+
+    Every span updates a latency histogram and token, byte and retry
+    counters for its name, and is kept in a bounded buffer of recent spans.
+    Spans are written as OTLP/JSON lines to ``export_path`` and the
+    aggregates can be scraped in the Prometheus text format.
+    """
+
+    def __init__(self, export_path=TRACE_EXPORT_PATH, buffer_size=TRACE_BUFFER_SIZE):
+        self.export_path = export_path
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=buffer_size)
+        self._stats = {}
+        self._collectors = []
+        self._metrics_server = None
+
+    def start_span(self, name, service='', **attributes):
+        return Span(self, name, service, _current.get(), attributes)
+
+    def record(self, span):
+        with self._lock:
+            self._recent.append(span)
+            stats = self._stats.setdefault(span.name, _Stats())
+            stats.count += 1
+            stats.total += span.duration
+            stats.errors += 0 if span.ok else 1
+            stats.buckets[next(i for i, bound in enumerate(LATENCY_BUCKETS) if span.duration <= bound)] += 1
+            for key in _COUNTERS:
+                stats.counters[key] += span.attributes.get(key) or 0
+            if span.attributes.get('cache') in stats.cache:
+                stats.cache[span.attributes['cache']] += 1
+            if self.export_path:
+                self._export(span)
+
+    def _export(self, span):
+        line = json.dumps({'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': 'salesbuddy'}}]},
+            'scopeSpans': [{'scope': {'name': 'salesbuddy.tracing'}, 'spans': [span.to_otlp()]}],
+        }]})
+        with open(self.export_path, 'a') as f:
+            f.write(line + '\n')
+
+    def recent(self, name=None):
+        with self._lock:
+            return [span for span in self._recent if name is None or span.name == name]
+
+    def summary(self):
+        """Per span name: count, errors, mean and percentile latencies of recent spans, counters and cache hit rate."""
+        with self._lock:
+            stats = dict(self._stats)
+            durations = {}
+            for span in self._recent:
+                durations.setdefault(span.name, []).append(span.duration)
+        summary = {}
+        for name, s in sorted(stats.items()):
+            recent = sorted(durations.get(name, []))
+            lookups = s.cache['hit'] + s.cache['miss']
+            summary[name] = {
+                'count': s.count,
+                'errors': s.errors,
+                'mean': s.total / s.count if s.count else 0.0,
+                'p50': recent[int(0.5 * (len(recent) - 1))] if recent else 0.0,
+                'p95': recent[int(0.95 * (len(recent) - 1))] if recent else 0.0,
+                'cache_hit_rate': s.cache['hit'] / lookups if lookups else None,
+                **s.counters,
+            }
+        return summary
+
+    def histogram(self, name):
+        """``(upper bound, count)`` pairs of the latency histogram for ``name``."""
+        with self._lock:
+            stats = self._stats.get(name)
+            return list(zip(LATENCY_BUCKETS, stats.buckets if stats else [0] * len(LATENCY_BUCKETS)))
+
+    def add_collector(self, collector):
+        """Append the Prometheus text returned by ``collector()`` to every scrape."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def prometheus(self):
+        lines = ['# TYPE salesbuddy_span_duration_seconds histogram']
+        with self._lock:
+            stats = dict(self._stats)
+            for name, s in sorted(stats.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, s.buckets):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'salesbuddy_span_duration_seconds_bucket{{name="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'salesbuddy_span_duration_seconds_sum{{name="{name}"}} {s.total}')
+                lines.append(f'salesbuddy_span_duration_seconds_count{{name="{name}"}} {s.count}')
+            lines.append('# TYPE salesbuddy_span_errors_total counter')
+            lines += [f'salesbuddy_span_errors_total{{name="{name}"}} {s.errors}' for name, s in sorted(stats.items())]
+            for key in _COUNTERS:
+                lines.append(f'# TYPE salesbuddy_{key}_total counter')
+                lines += [f'salesbuddy_{key}_total{{name="{name}"}} {s.counters[key]}' for name, s in sorted(stats.items())]
+            lines.append('# TYPE salesbuddy_cache_lookups_total counter')
+            for name, s in sorted(stats.items()):
+                for result, count in s.cache.items():
+                    if count:
+                        lines.append(f'salesbuddy_cache_lookups_total{{name="{name}",result="{result}"}} {count}')
+            collectors = list(self._collectors)
+        return '\n'.join(lines) + '\n' + ''.join(collector() for collector in collectors)
+
+    def start_metrics_server(self, host='0.0.0.0', port=9464):
+        if self._metrics_server is not None:
+            return self._metrics_server
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = tracer.prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._metrics_server.serve_forever, name='trace-metrics', daemon=True).start()
+        return self._metrics_server
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+def get_tracer():
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+            if TRACE_METRICS_PORT:
+                _tracer.start_metrics_server(port=int(TRACE_METRICS_PORT))
+        return _tracer
+
+def current_span():
+    return _current.get()
+
+def start_span(name, service='', **attributes):
+    """Start a span that is not made current, e.g. one spanning a generator's lifetime; call ``end()`` yourself."""
+    return get_tracer().start_span(name, service, **attributes)
+
+@contextmanager
+def span(name, service='', **attributes):
+    """Time the enclosed block as a span, current for the block so nested calls can annotate it."""
+    current = start_span(name, service, **attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+def traced(name, service=''):
+    """Decorator running every call of the function inside a span called ``name``."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, service):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator